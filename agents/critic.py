@@ -1,27 +1,100 @@
-from core.models import generate_text
-from core.prompts import CRITIC_SYSTEM_PROMPT
+import re
+from typing import Dict, Iterator, Optional
 
+from core.context_builder import format_context_message, stage_prompt
+from core.models import agenerate_text, generate_text, stream_text
+from core.prompts import CRITIC_INSTRUCTIONS, SHARED_SYSTEM_PROMPT
+from core.tracing import traced
 
+
+VERDICT_RE = re.compile(r"verdict\W*(sufficient|revise)", re.IGNORECASE)
+
+
+def critic_verdict(critique: str) -> Optional[str]:
+    """
+    "sufficient" / "revise" from the critique's last "Verdict:" line, or None.
+    """
+    matches = VERDICT_RE.findall(critique)
+    return matches[-1].lower() if matches else None
+
+
+def build_critic_prompt(question: str, searcher_summary: str, context_message: Optional[str] = None) -> str:
+    """
+    context_message: the searcher's prompt prefix (question + context), so the
+    critic can check the summary against the context and the LLM server can
+    reuse the evaluated prefix. Without it, only the question is given.
+    """
+    return stage_prompt(
+        context_message or format_context_message(question),
+        f"Searcher agent summary:\n{searcher_summary}",
+        CRITIC_INSTRUCTIONS,
+    )
+
+
+@traced("agent.critic")
 def run_critic_agent(
     question: str,
     searcher_summary: str,
+    context_message: Optional[str] = None,
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
 ) -> str:
     """
     CRITIC agent:
     - Reviews the question and the searcher summary.
     - Points out missing aspects / issues.
     """
-    user_prompt = (
-        f"Question:\n{question}\n\n"
-        f"Searcher agent summary:\n{searcher_summary}\n\n"
-        "Now critique the summary as per your instructions."
+    critique = generate_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_critic_prompt(question, searcher_summary, context_message),
+        temperature=0.2,
+        max_tokens=400,
+        stats=stats,
+        use_cache=use_cache,
     )
 
-    critique = generate_text(
-        system_prompt=CRITIC_SYSTEM_PROMPT,
-        user_prompt=user_prompt,
+    return critique
+
+
+@traced("agent.critic")
+async def arun_critic_agent(
+    question: str,
+    searcher_summary: str,
+    context_message: Optional[str] = None,
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
+) -> str:
+    """
+    Async version of run_critic_agent.
+    """
+    critique = await agenerate_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_critic_prompt(question, searcher_summary, context_message),
         temperature=0.2,
         max_tokens=400,
+        stats=stats,
+        use_cache=use_cache,
     )
 
     return critique
+
+
+@traced("agent.critic")
+def stream_critic_agent(
+    question: str,
+    searcher_summary: str,
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+    context_message: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Same as run_critic_agent, but yields the critique as it is generated.
+    """
+    yield from stream_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_critic_prompt(question, searcher_summary, context_message),
+        temperature=0.2,
+        max_tokens=400,
+        stats=stats,
+        use_cache=use_cache,
+    )
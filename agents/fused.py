@@ -0,0 +1,204 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.context_builder import build_context_message, stage_prompt
+from core.models import agenerate_text, generate_text, stream_text
+from core.prompts import FUSED_INSTRUCTIONS, SHARED_SYSTEM_PROMPT
+from core.tracing import traced
+
+# Section headings of the fused output -> the agent stage they replace
+SECTION_MARKERS = {
+    "SUMMARY:": "searcher",
+    "CRITIQUE:": "critic",
+    "FINAL ANSWER:": "writer",
+}
+# Held back while streaming, so a heading split across pieces (with some
+# markdown around it, e.g. "\n## FINAL ANSWER:") is still recognized
+_MARKER_HOLD = max(len(m) for m in SECTION_MARKERS) + 4
+# Heading decoration: markdown emphasis / heading marks next to a marker
+_DECORATION = "*_# \t"
+
+
+def build_fused_prompt(question: str, retrieved: List[Dict]) -> Tuple[str, Dict]:
+    """
+    Returns (user prompt, context report of build_context).
+    Same prompt prefix as the separate agents (see core.prompts).
+    """
+    context_message, context_report = build_context_message(question, retrieved)
+    return stage_prompt(context_message, FUSED_INSTRUCTIONS), context_report
+
+
+def _split_heading(text: str, pos: int) -> str:
+    """
+    The text before a marker at `pos`, without the heading's own decoration
+    ("## " or an opening "**" on the marker's line) and trailing blank lines.
+    """
+    line_start = text.rfind("\n", 0, pos) + 1
+    if not text[line_start:pos].strip(_DECORATION):
+        pos = line_start
+    return text[:pos].rstrip()
+
+
+def _heading_rest(text: str, final: bool) -> Optional[str]:
+    """
+    The text after a marker, without the rest of the heading: a closing "**"
+    right after the marker and, if nothing else is on the heading's line, the
+    line break and blank lines after it. Body text (bullets, emphasis) is kept.
+    None if more text is needed to decide.
+    """
+    i = 0
+    while i < len(text) and text[i] in "*_:":
+        i += 1
+    j = i
+    while j < len(text) and text[j] in " \t":
+        j += 1
+    if j == len(text):
+        return "" if final else None
+    if text[j] != "\n":
+        return text[j:]
+    rest = text[j:].lstrip("\n")
+    if not rest and not final:
+        return None
+    return rest
+
+
+def route_sections(pieces: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Split a (streamed) fused generation into (stage, text) pieces by its
+    section headings, which are removed with their markdown decoration
+    ("**SUMMARY:**", "## CRITIQUE:"). Text before any heading counts as
+    the summary. A few characters are held back so that a heading split
+    across pieces is still recognized.
+    """
+    stage = "searcher"
+    buffer = ""
+    heading = False  # buffer starts right after a marker
+    for piece in pieces:
+        buffer += piece
+        while True:
+            if heading:
+                rest = _heading_rest(buffer, final=False)
+                if rest is None:
+                    break
+                buffer, heading = rest, False
+            found = [(buffer.find(m), m) for m in SECTION_MARKERS if m in buffer]
+            if not found:
+                break
+            pos, marker = min(found)
+            before = _split_heading(buffer, pos)
+            if before:
+                yield stage, before
+            stage = SECTION_MARKERS[marker]
+            buffer = buffer[pos + len(marker):]
+            heading = True
+
+        if not heading and len(buffer) > _MARKER_HOLD:
+            yield stage, buffer[:-_MARKER_HOLD]
+            buffer = buffer[-_MARKER_HOLD:]
+
+    if heading:
+        buffer = _heading_rest(buffer, final=True)
+    if buffer:
+        yield stage, buffer
+
+
+def fused_final_answer(sections: Dict[str, str]) -> str:
+    """
+    The final answer of routed sections ({"searcher", "critic", "writer"}):
+    the FINAL ANSWER section or, without one, the summary (which is the
+    whole output if it has no headings at all).
+    """
+    return sections["writer"].strip() or sections["searcher"].strip()
+
+
+def parse_fused_output(text: str) -> Dict:
+    """
+    {"summary": str, "critique": str, "final_answer": str}.
+    Without a FINAL ANSWER section, the final answer is the summary (see fused_final_answer).
+    """
+    sections = {"searcher": "", "critic": "", "writer": ""}
+    for stage, piece in route_sections([text]):
+        sections[stage] += piece
+
+    return {
+        "summary": sections["searcher"].strip(),
+        "critique": sections["critic"].strip(),
+        "final_answer": fused_final_answer(sections),
+    }
+
+
+@traced("agent.fused")
+def run_fused_agent(
+    question: str,
+    retrieved: List[Dict],
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
+) -> Dict:
+    """
+    FUSED agent:
+    - One generation that produces the searcher summary, the critique and the
+      final answer, instead of three sequential agent calls.
+    Returns {"summary", "critique", "final_answer", "context"}.
+    """
+    user_prompt, context_report = build_fused_prompt(question, retrieved)
+    output = generate_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=user_prompt,
+        temperature=0.2,
+        max_tokens=1200,
+        stats=stats,
+        use_cache=use_cache,
+    )
+
+    result = parse_fused_output(output)
+    result["context"] = context_report
+    return result
+
+
+@traced("agent.fused")
+async def arun_fused_agent(
+    question: str,
+    retrieved: List[Dict],
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
+) -> Dict:
+    """
+    Async version of run_fused_agent.
+    """
+    user_prompt, context_report = build_fused_prompt(question, retrieved)
+    output = await agenerate_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=user_prompt,
+        temperature=0.2,
+        max_tokens=1200,
+        stats=stats,
+        use_cache=use_cache,
+    )
+
+    result = parse_fused_output(output)
+    result["context"] = context_report
+    return result
+
+
+@traced("agent.fused")
+def stream_fused_agent(
+    question: str,
+    retrieved: List[Dict],
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Same as run_fused_agent, but yields (stage, text_piece) pairs as the
+    sections are generated (stage: "searcher", "critic" or "writer").
+    """
+    user_prompt, context_report = build_fused_prompt(question, retrieved)
+    if stats is not None:
+        stats["context"] = context_report
+
+    yield from route_sections(stream_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=user_prompt,
+        temperature=0.2,
+        max_tokens=1200,
+        stats=stats,
+        use_cache=use_cache,
+    ))
@@ -1,58 +1,173 @@
-from typing import List, Dict
+import asyncio
+from typing import Iterator, List, Dict, Optional
 
-from core.models import generate_text
-from core.prompts import SEARCHER_SYSTEM_PROMPT
-from retrieval.vector_store import LocalVectorStore
+from core.context_builder import build_context_message, stage_prompt
+from core.models import agenerate_text, generate_text, stream_text
+from core.prompts import SEARCHER_INSTRUCTIONS, SHARED_SYSTEM_PROMPT
+from core.tracing import traced
+from retrieval.store_registry import get_vector_store
+from config import SEARCH_MODE
 
+NO_CONTEXT_SUMMARY = "No relevant context found in the index."
 
+
+def search_context(
+    question: str,
+    index_name: str = "default_index",
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+) -> List[Dict]:
+    """
+    Retrieval step of the searcher: relevant chunks (optionally metadata-filtered).
+    """
+    store = get_vector_store(index_name)
+    return store.similarity_search(question, top_k=top_k, filters=filters, mode=search_mode)
+
+
+def build_searcher_prompt(context_message: str) -> str:
+    """
+    context_message: question + packed context (see build_context_message),
+    reused unchanged as the prompt prefix of the critic and writer.
+    """
+    return stage_prompt(context_message, SEARCHER_INSTRUCTIONS)
+
+
+@traced("agent.searcher")
 def run_searcher_agent(
     question: str,
     index_name: str = "default_index",
     top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
+    retrieved: Optional[List[Dict]] = None,
+    context_message: Optional[str] = None,
 ) -> Dict:
     """
     SEARCHER agent:
-    - Uses the vector store to get relevant chunks.
+    - Uses the vector store to get relevant chunks (optionally metadata-filtered).
     - Summarizes them with the LLM.
     Returns a dict with:
     {
         "summary": str,
-        "retrieved_chunks": List[Dict]
+        "retrieved_chunks": List[Dict],
+        "context": Dict,            # prompt context report (tokens saved by merging / budget)
+        "context_message": str,     # shared prompt prefix for the critic / writer (None without context)
     }
+    `stats` receives the generation stats of the LLM call (see stream_text).
+    retrieved / context_message: already retrieved chunks (the search is then
+    skipped) and their prompt prefix (see stream_searcher_agent); "context" is
+    then empty.
     """
-    store = LocalVectorStore(index_name=index_name)
-    retrieved = store.similarity_search(question, top_k=top_k)
+    if retrieved is None:
+        retrieved = search_context(question, index_name, top_k, filters, search_mode)
 
     if not retrieved:
         return {
-            "summary": "No relevant context found in the index.",
+            "summary": NO_CONTEXT_SUMMARY,
             "retrieved_chunks": [],
+            "context": {},
+            "context_message": None,
         }
 
-    context_blocks = []
-    for r in retrieved:
-        src = r["metadata"].get("source", "unknown")
-        cid = r["metadata"].get("chunk_id", -1)
-        context_blocks.append(
-            f"[Source: {src}, Chunk: {cid}]\n{r['text']}"
-        )
+    context_report: Dict = {}
+    if context_message is None:
+        context_message, context_report = build_context_message(question, retrieved)
+    summary = generate_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_searcher_prompt(context_message),
+        temperature=0.2,
+        max_tokens=600,
+        stats=stats,
+        use_cache=use_cache,
+    )
 
-    context_text = "\n\n---\n\n".join(context_blocks)
+    return {
+        "summary": summary,
+        "retrieved_chunks": retrieved,
+        "context": context_report,
+        "context_message": context_message,
+    }
 
-    user_prompt = (
-        f"Question:\n{question}\n\n"
-        f"Context from vector store:\n{context_text}\n\n"
-        "Now produce the requested summary."
-    )
 
-    summary = generate_text(
-        system_prompt=SEARCHER_SYSTEM_PROMPT,
-        user_prompt=user_prompt,
+@traced("agent.searcher")
+async def arun_searcher_agent(
+    question: str,
+    index_name: str = "default_index",
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
+    retrieved: Optional[List[Dict]] = None,
+    context_message: Optional[str] = None,
+) -> Dict:
+    """
+    Async version of run_searcher_agent. Retrieval (query embedding + scoring)
+    is CPU-bound and runs in a worker thread.
+    """
+    if retrieved is None:
+        retrieved = await asyncio.to_thread(search_context, question, index_name, top_k, filters, search_mode)
+
+    if not retrieved:
+        return {
+            "summary": NO_CONTEXT_SUMMARY,
+            "retrieved_chunks": [],
+            "context": {},
+            "context_message": None,
+        }
+
+    context_report: Dict = {}
+    if context_message is None:
+        context_message, context_report = build_context_message(question, retrieved)
+    summary = await agenerate_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_searcher_prompt(context_message),
         temperature=0.2,
         max_tokens=600,
+        stats=stats,
+        use_cache=use_cache,
     )
 
     return {
         "summary": summary,
         "retrieved_chunks": retrieved,
+        "context": context_report,
+        "context_message": context_message,
     }
+
+
+@traced("agent.searcher")
+def stream_searcher_agent(
+    question: str,
+    retrieved: List[Dict],
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+    context_message: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Summarization step of the searcher over already retrieved chunks
+    (see search_context), yielded as it is generated.
+    context_message: the prompt prefix if the caller already built it with
+    build_context_message (to share it with the critic and writer); its
+    context report is then not added to `stats`.
+    """
+    if not retrieved:
+        yield NO_CONTEXT_SUMMARY
+        return
+
+    if context_message is None:
+        context_message, context_report = build_context_message(question, retrieved)
+        if stats is not None:
+            stats["context"] = context_report
+
+    yield from stream_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_searcher_prompt(context_message),
+        temperature=0.2,
+        max_tokens=600,
+        stats=stats,
+        use_cache=use_cache,
+    )
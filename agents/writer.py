@@ -1,28 +1,94 @@
-from core.models import generate_text
-from core.prompts import WRITER_SYSTEM_PROMPT
+from typing import Dict, Iterator, Optional
 
+from core.context_builder import format_context_message, stage_prompt
+from core.models import agenerate_text, generate_text, stream_text
+from core.prompts import SHARED_SYSTEM_PROMPT, WRITER_INSTRUCTIONS
+from core.tracing import traced
 
+
+def build_writer_prompt(
+    question: str,
+    searcher_summary: str,
+    critic_feedback: str,
+    context_message: Optional[str] = None,
+) -> str:
+    """
+    context_message: the searcher's prompt prefix (see build_critic_prompt).
+    """
+    return stage_prompt(
+        context_message or format_context_message(question),
+        f"Searcher agent summary:\n{searcher_summary}",
+        f"Critic agent feedback:\n{critic_feedback}",
+        WRITER_INSTRUCTIONS,
+    )
+
+
+@traced("agent.writer")
 def run_writer_agent(
     question: str,
     searcher_summary: str,
     critic_feedback: str,
+    context_message: Optional[str] = None,
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
 ) -> str:
     """
     WRITER agent:
     - Generates the final structured answer.
     """
-    user_prompt = (
-        f"Question:\n{question}\n\n"
-        f"Searcher agent summary:\n{searcher_summary}\n\n"
-        f"Critic agent feedback:\n{critic_feedback}\n\n"
-        "Now produce the final structured answer as per your instructions."
+    final_answer = generate_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_writer_prompt(question, searcher_summary, critic_feedback, context_message),
+        temperature=0.25,
+        max_tokens=900,
+        stats=stats,
+        use_cache=use_cache,
     )
 
-    final_answer = generate_text(
-        system_prompt=WRITER_SYSTEM_PROMPT,
-        user_prompt=user_prompt,
+    return final_answer
+
+
+@traced("agent.writer")
+async def arun_writer_agent(
+    question: str,
+    searcher_summary: str,
+    critic_feedback: str,
+    context_message: Optional[str] = None,
+    use_cache: bool = True,
+    stats: Optional[Dict] = None,
+) -> str:
+    """
+    Async version of run_writer_agent.
+    """
+    final_answer = await agenerate_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_writer_prompt(question, searcher_summary, critic_feedback, context_message),
         temperature=0.25,
         max_tokens=900,
+        stats=stats,
+        use_cache=use_cache,
     )
 
     return final_answer
+
+
+@traced("agent.writer")
+def stream_writer_agent(
+    question: str,
+    searcher_summary: str,
+    critic_feedback: str,
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+    context_message: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Same as run_writer_agent, but yields the answer as it is generated.
+    """
+    yield from stream_text(
+        system_prompt=SHARED_SYSTEM_PROMPT,
+        user_prompt=build_writer_prompt(question, searcher_summary, critic_feedback, context_message),
+        temperature=0.25,
+        max_tokens=900,
+        stats=stats,
+        use_cache=use_cache,
+    )
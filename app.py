@@ -1,16 +1,29 @@
+import json
 import os
 import shutil
+import tempfile
 import time
-from typing import List
+from typing import Dict, List
 
 import streamlit as st
 
+from core.index_jobs import get_index_job_queue
+from core.pipeline_policy import PIPELINES, check_pipeline
 from core.orchestrator import (
-    build_index_from_pdfs,
-    answer_question_with_rag,
-    multi_agent_answer,
+    stream_answer_with_rag,
+    stream_multi_agent_answer,
+)
+from core.tracing import get_trace, prometheus_text, stage_breakdown, stage_totals
+from core.warmup import get_warmup_status, start_warmup
+from retrieval.store_registry import get_vector_store, invalidate_vector_store
+from retrieval.vector_store import index_exists
+from config import (
+    VECTOR_DB_DIR,
+    SEARCH_MODE,
+    MULTI_AGENT_PIPELINE,
+    WARMUP_ON_STARTUP,
+    INDEX_JOB_POLL_SECONDS,
 )
-from config import VECTOR_DB_DIR
 
 DATA_PDF_DIR = os.path.join("data", "pdfs")
 os.makedirs(DATA_PDF_DIR, exist_ok=True)
@@ -26,8 +39,16 @@ def save_uploaded_pdfs(uploaded_files) -> List[str]:
             continue
         filename = os.path.basename(file.name)
         save_path = os.path.join(DATA_PDF_DIR, filename)
-        with open(save_path, "wb") as f:
-            f.write(file.read())
+        # Written aside and renamed into place, so a queued or running build
+        # reading the previous version of the file never sees a partial one
+        fd, tmp_path = tempfile.mkstemp(dir=DATA_PDF_DIR, prefix=f".{filename}.", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(file.read())
+            os.replace(tmp_path, save_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
         saved_paths.append(save_path)
     return saved_paths
 
@@ -40,10 +61,109 @@ def list_existing_pdfs() -> List[str]:
 
 def clear_index(index_name: str):
     index_dir = os.path.join(VECTOR_DB_DIR, index_name)
+    invalidate_vector_store(index_name)
     if os.path.exists(index_dir):
         shutil.rmtree(index_dir)
 
 
+def format_generation_stats(stats: Dict) -> str:
+    if not stats:
+        return ""
+    if stats.get("cached"):
+        return "served from cache"
+    text = (
+        f"first token {stats['ttft_s']:.2f}s · {stats['tokens']} tokens · "
+        f"{stats['tokens_per_s']:.1f} tok/s · "
+        f"prompt {stats['prompt_tokens']} tokens evaluated in {stats['prompt_eval_s']:.2f}s"
+    )
+    context = stats.get("context")
+    if context:
+        text += (
+            f" · context {context['context_tokens']} tokens "
+            f"({context['tokens_saved']} saved by merging / budget)"
+        )
+    return text
+
+
+def format_index_job(job: Dict) -> str:
+    text = f"Job {job['id']} · {len(job['pdf_paths'])} PDFs · {job['state']}"
+    progress = job.get("progress")
+    if job["state"] == "running" and progress:
+        text += (
+            f" · {progress['documents_done']}/{progress['documents_total']} PDFs, "
+            f"{progress['chunks']} chunks ({progress['chunks_per_s']:.1f} chunks/s)"
+        )
+    elif job["state"] == "done":
+        report = job["report"]
+        text += (
+            f" · {report['added']} added, {report['replaced']} replaced, "
+            f"{report['skipped']} unchanged ({report['chunks']} new chunks in {report['seconds']:.1f}s)"
+        )
+    elif job["state"] == "failed":
+        text += f" · {job['error']}"
+    return text
+
+
+def render_trace(trace_id: str, key: str):
+    trace = get_trace(trace_id) if trace_id else None
+    if trace is None:
+        st.caption("No trace recorded (TRACING_ENABLED is off, or the trace was evicted).")
+        return
+    st.caption(f"Trace `{trace_id}` · {trace['seconds']:.2f}s · share = fraction of the total, inclusive")
+    st.dataframe(stage_totals(trace), hide_index=True, use_container_width=True)
+    st.dataframe(stage_breakdown(trace), hide_index=True, use_container_width=True)
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        "Trace (JSON)",
+        json.dumps(trace, indent=2, default=str),
+        file_name=f"trace_{trace_id}.json",
+        mime="application/json",
+        key=f"trace_json_{key}",
+    )
+    col2.download_button(
+        "Metrics (Prometheus)",
+        prometheus_text(),
+        file_name="autoresearcher_metrics.prom",
+        mime="text/plain",
+        key=f"trace_metrics_{key}",
+    )
+
+
+@st.fragment(run_every=INDEX_JOB_POLL_SECONDS)
+def render_index_jobs(index_name: str):
+    # Reruns on its own every INDEX_JOB_POLL_SECONDS, without rerunning the chat
+    for job in get_index_job_queue().list_jobs(index_name, limit=3):
+        progress = job.get("progress")
+        if job["state"] == "running" and progress and progress["documents_total"]:
+            st.progress(progress["documents_done"] / progress["documents_total"], text=format_index_job(job))
+        else:
+            st.caption(format_index_job(job))
+        if job["state"] == "done" and job["report"].get("trace_id"):
+            with st.expander(f"⏱️ Job {job['id']} stage breakdown"):
+                render_trace(job["report"]["trace_id"], key=f"job_{job['id']}")
+
+
+WARMUP_LABELS = {"embedding": "Embedding model", "llm": "LLM (Ollama)"}
+WARMUP_ICONS = {"pending": "⏳", "loading": "⏳", "ready": "✅", "failed": "❌"}
+
+
+def format_warmup_status(name: str, status: Dict) -> str:
+    text = f"{WARMUP_ICONS[status['state']]} {WARMUP_LABELS[name]}: {status['state']}"
+    if "seconds" in status:
+        text += f" ({status['seconds']:.1f}s)"
+    return text
+
+
+@st.cache_resource(show_spinner=False)
+def warm_up_models():
+    """
+    Started once per server process, whatever the number of sessions and
+    reruns. The models, LLM clients and vector stores themselves are
+    process-wide (core.models, StoreRegistry), so reruns reuse them too.
+    """
+    return start_warmup()
+
+
 def init_session_state():
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []  # [{role, content, mode, index_name}]
@@ -60,6 +180,9 @@ def main():
     )
 
     init_session_state()
+    if WARMUP_ON_STARTUP:
+        # The first question no longer pays the model loads
+        warm_up_models()
 
     # ---------- Custom CSS ----------
     st.markdown(
@@ -207,6 +330,15 @@ def main():
         help="Multi-agent chains 3 roles; Simple RAG = one-step answer.",
     )
 
+    check_pipeline(MULTI_AGENT_PIPELINE)
+    pipeline = st.sidebar.selectbox(
+        "Multi-agent pipeline",
+        PIPELINES,
+        index=PIPELINES.index(MULTI_AGENT_PIPELINE),
+        help="Adaptive skips the critic / writer when not needed; Fused = one generation for all three roles.",
+        disabled=not mode.startswith("Multi-agent"),
+    )
+
     top_k = st.sidebar.slider(
         "Chunks to retrieve (top_k)",
         min_value=3,
@@ -214,12 +346,37 @@ def main():
         value=5,
     )
 
+    search_modes = ["dense", "hybrid", "lexical"]
+    search_mode = st.sidebar.selectbox(
+        "Retrieval mode",
+        search_modes,
+        index=search_modes.index(SEARCH_MODE) if SEARCH_MODE in search_modes else 0,
+        help="Dense = embeddings; Lexical = BM25 keywords; Hybrid = both, fused by rank.",
+    )
+
+    selected_sources = st.sidebar.multiselect(
+        "Restrict to PDFs",
+        # Only open stores that exist: opening one creates its directory
+        options=get_vector_store(index_name).sources() if index_exists(index_name) else [],
+        help="Leave empty to search every PDF in the index.",
+    )
+    filters = {"source": selected_sources} if selected_sources else None
+
     st.sidebar.markdown("---")
     st.sidebar.markdown(
         "💻 **Backend:** Ollama LLM + SentenceTransformers + Local Vector Store"
     )
     st.sidebar.markdown("⚠️ Make sure **Ollama** is running.")
 
+    if WARMUP_ON_STARTUP:
+        st.sidebar.markdown("**Model warm-up**")
+        for name, status in get_warmup_status().items():
+            st.sidebar.caption(format_warmup_status(name, status))
+            if status["state"] == "failed":
+                st.sidebar.caption(status["error"])
+        # Clicking reruns the script, which re-reads the status
+        st.sidebar.button("Refresh status")
+
     # ---------- Main layout: left (docs), right (chat) ----------
     col_docs, col_chat = st.columns([1.4, 2.0])
 
@@ -246,12 +403,13 @@ def main():
             if not uploaded_files:
                 st.warning("Please upload at least one PDF first.")
             else:
-                with st.spinner("Saving PDFs and building index..."):
-                    pdf_paths = save_uploaded_pdfs(uploaded_files)
-                    build_index_from_pdfs(pdf_paths, index_name=index_name)
-                st.success(
-                    f"Index **'{index_name}'** updated with {len(uploaded_files)} file(s)."
-                )
+                # Built in the background (one build per index at a time), so
+                # questions can still be asked meanwhile
+                pdf_paths = save_uploaded_pdfs(uploaded_files)
+                job_id = get_index_job_queue().submit(index_name, pdf_paths)
+                st.info(f"Index **'{index_name}'** build queued (job {job_id}).")
+
+        render_index_jobs(index_name)
 
         st.markdown("---", unsafe_allow_html=True)
         st.markdown(
@@ -271,10 +429,12 @@ def main():
             unsafe_allow_html=True,
         )
         if st.button("Clear This Index"):
-            clear_index(index_name)
-            st.success(
-                f"Index **'{index_name}'** cleared. PDFs stay; only embeddings are removed."
-            )
+            if get_index_job_queue().clear_if_idle(index_name, clear_index):
+                st.success(
+                    f"Index **'{index_name}'** cleared. PDFs stay; only embeddings are removed."
+                )
+            else:
+                st.warning(f"Index **'{index_name}'** is being built; clear it once the build is done.")
 
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -326,46 +486,73 @@ def main():
             with st.chat_message("assistant"):
                 if mode.startswith("Multi-agent"):
                     st.markdown(
-                        f"🧠 *Multi-agent mode* — Searcher + Critic + Writer  \n"
+                        f"🧠 *Multi-agent mode* — Searcher + Critic + Writer ({pipeline})  \n"
                         f"Index: `{index_name}` • top_k = {top_k}"
                     )
-                    with st.spinner("Thinking across agents..."):
-                        t0 = time.time()
-                        result = multi_agent_answer(
-                            question=user_question,
-                            index_name=index_name,
-                            top_k=top_k,
-                        )
-                        t1 = time.time()
-
-                    st.success(f"Done in {t1 - t0:.1f} seconds.")
+                    t0 = time.time()
                     st.markdown("#### ✅ Final Answer")
-                    st.write(result["final_answer"])
-
-                    with st.expander("🔍 Searcher Agent Summary"):
-                        st.write(result["searcher_summary"])
-
-                    with st.expander("🧪 Critic Agent Feedback"):
-                        st.write(result["critic_feedback"])
-
-                    final_text = result["final_answer"]
+                    answer_box = st.empty()
+                    with st.expander("🔍 Searcher Agent Summary", expanded=True):
+                        searcher_box = st.empty()
+                    with st.expander("🧪 Critic Agent Feedback", expanded=True):
+                        critic_box = st.empty()
+
+                    boxes = {"searcher": searcher_box, "critic": critic_box, "writer": answer_box}
+                    texts = {"searcher": "", "critic": "", "writer": ""}
+                    stats: Dict = {}
+                    for stage, piece in stream_multi_agent_answer(
+                        question=user_question,
+                        index_name=index_name,
+                        top_k=top_k,
+                        filters=filters,
+                        search_mode=search_mode,
+                        stats=stats,
+                        pipeline=pipeline,
+                    ):
+                        texts[stage] += piece
+                        boxes[stage].markdown(texts[stage] + "▌")
+                    t1 = time.time()
+
+                    for stage, box in boxes.items():
+                        box.markdown(texts[stage])
+                    st.success(f"Done in {t1 - t0:.1f} seconds.")
+                    caption_lines = [
+                        f"{stage}: {format_generation_stats(stats[stage])}"
+                        for stage in ("searcher", "critic", "writer", "fused")
+                        if stats.get(stage)
+                    ]
+                    if "pipeline" in stats:
+                        timings = " · ".join(f"{k} {v:.2f}s" for k, v in stats["pipeline"]["timings"].items())
+                        caption_lines.append(f"{pipeline} pipeline: {timings}")
+                    st.caption("  \n".join(caption_lines))
+                    with st.expander("⏱️ Stage breakdown"):
+                        render_trace(stats.get("trace_id"), key="answer")
+
+                    final_text = texts["writer"]
 
                 else:
                     st.markdown(
                         f"📄 *Simple RAG mode*  \nIndex: `{index_name}` • top_k = {top_k}"
                     )
-                    with st.spinner("Retrieving chunks and generating answer..."):
-                        t0 = time.time()
-                        answer = answer_question_with_rag(
+                    t0 = time.time()
+                    st.markdown("#### ✅ Answer")
+                    stats = {}
+                    answer = st.write_stream(
+                        stream_answer_with_rag(
                             question=user_question,
                             index_name=index_name,
                             top_k=top_k,
+                            filters=filters,
+                            search_mode=search_mode,
+                            stats=stats,
                         )
-                        t1 = time.time()
+                    )
+                    t1 = time.time()
 
                     st.success(f"Done in {t1 - t0:.1f} seconds.")
-                    st.markdown("#### ✅ Answer")
-                    st.write(answer)
+                    st.caption(format_generation_stats(stats))
+                    with st.expander("⏱️ Stage breakdown"):
+                        render_trace(stats.get("trace_id"), key="answer")
                     final_text = answer
 
             # Store assistant message
@@ -0,0 +1,657 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import numpy as np
+
+from config import ANN_NPROBE
+from retrieval.ann_index import IVFIndex, recall_at_k, top_k_indices
+from retrieval.chunker import chunk_text
+from retrieval.ingest import iter_chunked_pdfs, iter_pdf_chunks, iter_batches
+from retrieval.pdf_loader import load_pdf_text
+from retrieval.quantization import ScalarQuantizer
+from retrieval.bm25 import BM25Index, segment_postings
+
+EMBEDDING_DIM = 384          # all-MiniLM-L6-v2
+NUM_ROWS = 200_000
+NUM_QUERIES = 200
+TOP_K = 5
+MIN_RECALL = 0.9
+
+# Modules whose import must stay cheap, and the heavy dependencies they must
+# not pull in at import time (core.models imports them on first use)
+IMPORT_MODULES = ["core.models", "core.orchestrator", "evaluation"]
+LAZY_IMPORTS = ["torch", "sentence_transformers", "ollama"]
+
+NUM_PDFS = 48
+PAGES_PER_PDF = 30
+WORDS_PER_PAGE = 450
+
+
+def synthetic_embeddings(n: int, dim: int = EMBEDDING_DIM, n_topics: int = 500, seed: int = 0) -> np.ndarray:
+    """
+    Clustered random vectors (chunks of the same paper/topic lie close together),
+    which is closer to real embedding distributions than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, size=n)
+    emb = topics[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+
+
+def bench_ann(num_rows: int = NUM_ROWS, num_queries: int = NUM_QUERIES, top_k: int = TOP_K) -> None:
+    """
+    Compare IVF search against exact brute-force search (the recall baseline).
+    Fails (exit code 1) if recall at the configured ANN_NPROBE is below MIN_RECALL.
+    """
+    emb = synthetic_embeddings(num_rows)
+    queries = synthetic_embeddings(num_queries, seed=1)
+
+    t0 = time.time()
+    index = IVFIndex(index_dir=".")
+    index.train(emb)
+    print(f"[ANN] Trained {index.centroids.shape[0]} lists over {num_rows} rows in {time.time() - t0:.1f} s")
+
+    exact_ids = []
+    t0 = time.time()
+    for q in queries:
+        sims = emb @ q
+        exact_ids.append(top_k_indices(sims, top_k))
+    exact_ms = (time.time() - t0) / num_queries * 1000
+    print(f"[ANN] exact        : {exact_ms:.2f} ms/query")
+
+    default_recall = None
+    for nprobe in sorted({4, 8, 16, 32, 64, ANN_NPROBE}):
+        recalls = []
+        t0 = time.time()
+        for q, ids in zip(queries, exact_ids):
+            candidates = index.candidates(q, nprobe=nprobe)
+            sims = emb[candidates] @ q
+            approx = candidates[top_k_indices(sims, top_k)]
+            recalls.append(recall_at_k(approx, ids))
+        ann_ms = (time.time() - t0) / num_queries * 1000
+        recall = float(np.mean(recalls))
+        status = "OK" if recall >= MIN_RECALL else "LOW"
+        if nprobe == ANN_NPROBE:
+            default_recall = recall
+            status += ", ANN_NPROBE"
+        print(
+            f"[ANN] nprobe={nprobe:<4}: {ann_ms:.2f} ms/query, "
+            f"recall@{top_k}={recall:.3f} [{status}], speedup x{exact_ms / ann_ms:.1f}"
+        )
+
+    if default_recall < MIN_RECALL:
+        raise SystemExit(
+            f"[ANN] recall@{top_k}={default_recall:.3f} at ANN_NPROBE={ANN_NPROBE} is below {MIN_RECALL}"
+        )
+
+
+def _legacy_exact_search(embeddings: np.ndarray, query: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    The original query path: re-normalize the whole matrix, then sort every score.
+    """
+    q = query.reshape(1, -1)
+    a_norm = q / (np.linalg.norm(q, axis=1, keepdims=True) + 1e-10)
+    b_norm = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-10)
+    sims = np.dot(a_norm, b_norm.T)[0]
+    return np.argsort(sims)[::-1][:top_k]
+
+
+def _normalized_exact_search(embeddings: np.ndarray, query: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    The current query path: pre-normalized matrix, one dot product, argpartition top-k.
+    """
+    sims = embeddings @ query
+    return top_k_indices(sims, top_k)
+
+
+def _measure(search_fn, embeddings: np.ndarray, queries: np.ndarray, top_k: int):
+    t0 = time.time()
+    for q in queries:
+        search_fn(embeddings, q, top_k)
+    per_query_ms = (time.time() - t0) / len(queries) * 1000
+
+    tracemalloc.start()
+    search_fn(embeddings, queries[0], top_k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_query_ms, peak
+
+
+def bench_exact(num_rows: int = NUM_ROWS, num_queries: int = NUM_QUERIES, top_k: int = TOP_K) -> None:
+    """
+    Per-query time and peak allocation of the exact search path, before and after
+    storing normalized float32 embeddings and selecting top-k with argpartition.
+    """
+    emb = synthetic_embeddings(num_rows)
+    queries = synthetic_embeddings(num_queries, seed=1)
+    print(f"[EXACT] {num_rows} x {emb.shape[1]} float32 index ({emb.nbytes / 2**20:.1f} MiB)")
+
+    for name, fn in (("before", _legacy_exact_search), ("after", _normalized_exact_search)):
+        per_query_ms, peak = _measure(fn, emb, queries, top_k)
+        print(f"[EXACT] {name:<6}: {per_query_ms:.2f} ms/query, peak alloc {peak / 2**20:.2f} MiB")
+
+
+def write_synthetic_pdfs(
+    out_dir: str,
+    num_pdfs: int = NUM_PDFS,
+    pages_per_pdf: int = PAGES_PER_PDF,
+    words_per_page: int = WORDS_PER_PAGE,
+    seed: int = 0,
+) -> List[str]:
+    """
+    Write small text-only PDFs with PyMuPDF for ingestion benchmarks.
+    """
+    import fitz  # PyMuPDF
+
+    rng = np.random.default_rng(seed)
+    vocab = [f"term{i}" for i in range(5000)]
+    paths = []
+    for d in range(num_pdfs):
+        doc = fitz.open()
+        for _ in range(pages_per_pdf):
+            page = doc.new_page()
+            words = rng.choice(vocab, size=words_per_page)
+            page.insert_textbox(page.rect + (36, 36, -36, -36), " ".join(words), fontsize=7)
+        path = os.path.join(out_dir, f"synthetic_{d:04d}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def bench_ingest(num_pdfs: int = NUM_PDFS) -> None:
+    """
+    Throughput of PDF extraction + chunking, serial vs. process pool.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_synthetic_pdfs(tmp, num_pdfs=num_pdfs)
+        cpu = os.cpu_count() or 1
+        for workers in sorted({1, 2, 4, cpu}):
+            if workers > cpu:
+                continue
+            t0 = time.time()
+            n_chunks = sum(
+                sum(1 for _ in chunks) for _, chunks in iter_chunked_pdfs(paths, workers=workers)
+            )
+            elapsed = time.time() - t0
+            print(
+                f"[INGEST] workers={workers:<3}: {num_pdfs / elapsed:.1f} PDFs/sec, "
+                f"{n_chunks / elapsed:.1f} chunks/sec ({elapsed:.2f} s)"
+            )
+
+
+def bench_stream(pages: int = 1000, batch_size: int = 256) -> None:
+    """
+    Peak Python allocation while chunking one large PDF: whole-document
+    load + chunk_text vs. the streaming page-by-page path (batched like the indexer).
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_pdfs(tmp, num_pdfs=1, pages_per_pdf=pages)[0]
+
+        tracemalloc.start()
+        doc = load_pdf_text(path)
+        n_whole = len(chunk_text(doc["full_text"]))
+        del doc
+        _, whole_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        n_stream = sum(len(batch) for batch in iter_batches(iter_pdf_chunks(path), batch_size))
+        _, stream_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"[STREAM] whole document: {n_whole} chunks, peak alloc {whole_peak / 2**20:.1f} MiB")
+    print(f"[STREAM] streaming     : {n_stream} chunks, peak alloc {stream_peak / 2**20:.1f} MiB")
+
+
+def bench_quant(num_rows: int = NUM_ROWS, num_queries: int = NUM_QUERIES, top_k: int = TOP_K) -> None:
+    """
+    Memory saved vs. recall@k lost for float16 / int8 codes, with and without
+    exact rescoring of a top_k * factor shortlist.
+    """
+    emb = synthetic_embeddings(num_rows)
+    queries = synthetic_embeddings(num_queries, seed=1)
+    exact_ids = [top_k_indices(emb @ q, top_k) for q in queries]
+    print(f"[QUANT] float32 baseline: {emb.nbytes / 2**20:.1f} MiB")
+
+    for mode in ("float16", "int8"):
+        quantizer = ScalarQuantizer(mode, index_dir=".")
+        quantizer.build(emb)
+        saved = 1 - quantizer.nbytes / emb.nbytes
+        for factor in (1, 2, 4, 8):
+            recalls = []
+            t0 = time.time()
+            for q, ids in zip(queries, exact_ids):
+                shortlist = top_k_indices(quantizer.scores(q), top_k * factor)
+                sims = emb[shortlist] @ q
+                recalls.append(recall_at_k(shortlist[top_k_indices(sims, top_k)], ids))
+            per_query_ms = (time.time() - t0) / num_queries * 1000
+            label = "no rescoring" if factor == 1 else f"rescore x{factor}"
+            print(
+                f"[QUANT] {mode:<7} {quantizer.nbytes / 2**20:7.1f} MiB (-{saved:.0%}), "
+                f"{label:<12}: recall@{top_k}={np.mean(recalls):.3f}, {per_query_ms:.2f} ms/query"
+            )
+
+
+def synthetic_texts(n: int, words_per_text: int = 120, vocab_size: int = 50_000, seed: int = 0) -> List[str]:
+    """
+    Texts with a Zipf-like word distribution (a few very common terms, a long tail).
+    """
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.3, size=(n, words_per_text)), vocab_size)
+    return [" ".join(f"term{r}" for r in row) for row in ranks]
+
+
+def bench_lexical(num_rows: int = NUM_ROWS, num_queries: int = NUM_QUERIES, top_k: int = TOP_K) -> None:
+    """
+    BM25 lookup over posting lists vs. a dense exact scan over the same number of rows.
+    """
+    texts = synthetic_texts(num_rows)
+    t0 = time.time()
+    bm25 = BM25Index()
+    bm25.add_segment(segment_postings(texts), offset=0)
+    print(f"[LEXICAL] Built BM25 over {num_rows} texts in {time.time() - t0:.1f} s ({len(bm25.postings)} terms)")
+
+    rng = np.random.default_rng(1)
+    # Queries mix mid-frequency and rare terms, like "C2f module pruning"
+    queries = [" ".join(f"term{r}" for r in rng.integers(20, 5000, size=3)) for _ in range(num_queries)]
+
+    t0 = time.time()
+    for q in queries:
+        bm25.search(q, top_k)
+    lexical_ms = (time.time() - t0) / num_queries * 1000
+
+    emb = synthetic_embeddings(num_rows)
+    query_embs = synthetic_embeddings(num_queries, seed=1)
+    t0 = time.time()
+    for q in query_embs:
+        top_k_indices(emb @ q, top_k)
+    dense_ms = (time.time() - t0) / num_queries * 1000
+
+    print(f"[LEXICAL] bm25 : {lexical_ms:.2f} ms/query")
+    print(f"[LEXICAL] dense: {dense_ms:.2f} ms/query")
+
+
+class FakeOllamaServer:
+    """
+    Minimal stand-in for the Ollama HTTP API (POST /api/chat), streaming
+    NDJSON chunks like the real server. Lets the LLM client be exercised
+    without a model: set OLLAMA_HOST to server.url.
+    Like Ollama, at most `parallel` requests are generated at once; the rest queue.
+    `reply` (a function of the request body) sets the text generated; by
+    default it is `tokens` filler words.
+    Prompt caching is emulated like a single Ollama slot: only the prompt words
+    after the prefix shared with the previous request are evaluated (and
+    reported as prompt_eval_count), at `prompt_token_delay` seconds each.
+    The first request also waits `load_delay` seconds, like Ollama loading the
+    model into memory.
+    """
+
+    def __init__(
+        self,
+        tokens: int = 200,
+        first_token_delay: float = 0.2,
+        token_delay: float = 0.01,
+        parallel: int = 4,
+        reply=None,
+        prompt_token_delay: float = 0.0,
+        load_delay: float = 0.0,
+    ):
+        self.tokens = tokens
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.prompt_token_delay = prompt_token_delay
+        self.load_delay = load_delay
+        self._loaded = threading.Event()
+        self.requests = 0
+        self.prompt_words = 0   # prompt words received over all requests
+        self._last_prompt: List[str] = []
+        self._slots = threading.Semaphore(parallel)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                with server._slots:
+                    server.respond(self, body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def respond(self, handler, body) -> None:
+        t0 = time.perf_counter()
+        load_s = 0.0
+        if not self._loaded.is_set():
+            load_s = self.load_delay
+            time.sleep(load_s)
+            self._loaded.set()
+        prompt = " ".join(m["content"] for m in body["messages"]).split()
+        reused = 0
+        for a, b in zip(prompt, self._last_prompt):
+            if a != b:
+                break
+            reused += 1
+        self._last_prompt = prompt
+        self.prompt_words += len(prompt)
+        prompt_eval_s = (len(prompt) - reused) * self.prompt_token_delay
+        time.sleep(prompt_eval_s + self.first_token_delay)
+        stream = body.get("stream", False)
+        if self.reply is not None:
+            words = [w + " " for w in self.reply(body).split(" ")]
+        else:
+            words = [f"tok{i} " for i in range(self.tokens)]
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            if stream:
+                self._write(handler, {"model": body["model"], "message": {"role": "assistant", "content": word}, "done": False})
+        final = {
+            "model": body["model"],
+            "message": {"role": "assistant", "content": "" if stream else "".join(words)},
+            "done": True,
+            "prompt_eval_count": len(prompt) - reused,
+            "prompt_eval_duration": int(prompt_eval_s * 1e9),
+            "eval_count": len(words),
+            "eval_duration": int((time.perf_counter() - t0 - load_s - self.first_token_delay - prompt_eval_s) * 1e9),
+            "load_duration": int(load_s * 1e9),
+        }
+        self._write(handler, final)
+
+    @staticmethod
+    def _write(handler, obj) -> None:
+        handler.wfile.write((json.dumps(obj) + "\n").encode("utf-8"))
+        handler.wfile.flush()
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def bench_llm(calls: int = 5) -> None:
+    """
+    Time-to-first-token and tokens/sec of the streaming LLM client, against a
+    fake Ollama endpoint (200 tokens, 200 ms to first token, 10 ms per token).
+    Compares when the first text piece reaches the caller with when the
+    complete, non-streamed answer would be available.
+    """
+    with FakeOllamaServer() as server:
+        import core.models as models
+
+        models.OLLAMA_HOST = server.url
+        models._ollama_client = None
+
+        for _ in range(calls):
+            stats = {}
+            t0 = time.perf_counter()
+            first = None
+            for _piece in models.stream_text("system", "What is the C2f module?", stats=stats):
+                if first is None:
+                    first = time.perf_counter() - t0
+            print(
+                f"[LLM] first piece after {first * 1000:.0f} ms, complete after {stats['total_s'] * 1000:.0f} ms "
+                f"({stats['tokens']} tokens, {stats['tokens_per_s']:.1f} tok/s)"
+            )
+        print(f"[LLM] {models.get_generation_stats()}")
+
+
+def bench_async(questions: int = 32, levels=(1, 2, 4, 8, 16), num_texts: int = 2000) -> None:
+    """
+    Questions/sec of the async RAG pipeline at increasing client concurrency,
+    against a fake Ollama endpoint with 4 parallel slots (50 tokens per answer).
+    Throughput should grow until the LLM slots (LLM_MAX_CONCURRENCY) are full.
+    """
+    import asyncio
+    import shutil
+
+    import core.models as models
+    from core.orchestrator import aanswer_question_with_rag
+    from retrieval.store_registry import get_vector_store, invalidate_vector_store
+
+    index_name = "_benchmark_async"
+    store = get_vector_store(index_name)
+    texts = synthetic_texts(num_texts)
+    store.add_texts(texts, [{"source": "synthetic.pdf", "chunk_id": i} for i in range(num_texts)])
+    question_texts = [" ".join(texts[i].split()[:12]) for i in range(questions)]
+
+    async def run_level(concurrency: int) -> float:
+        pending = asyncio.Queue()
+        for q in question_texts:
+            pending.put_nowait(q)
+
+        async def client():
+            while not pending.empty():
+                await aanswer_question_with_rag(pending.get_nowait(), index_name=index_name)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - t0
+
+    try:
+        with FakeOllamaServer(tokens=50, first_token_delay=0.1, token_delay=0.005, parallel=4) as server:
+            models.OLLAMA_HOST = server.url
+            for concurrency in levels:
+                seconds = asyncio.run(run_level(concurrency))
+                print(
+                    f"[ASYNC] concurrency={concurrency:>3}: {questions / seconds:6.2f} questions/s "
+                    f"({seconds:.2f} s for {questions})"
+                )
+    finally:
+        invalidate_vector_store(index_name)
+        shutil.rmtree(store.index_dir, ignore_errors=True)
+
+
+def bench_prefix(questions: int = 4, num_texts: int = 200) -> None:
+    """
+    Prompt tokens evaluated per agent of the full multi-agent pipeline, against
+    a fake Ollama endpoint that reuses the prompt prefix shared with the previous
+    request (1 ms per evaluated prompt word). The critic and writer prompts
+    start with the searcher's question + context, so they should only evaluate
+    their own inputs.
+    """
+    import shutil
+
+    import core.models as models
+    from core.orchestrator import multi_agent_answer
+    from retrieval.store_registry import get_vector_store, invalidate_vector_store
+
+    index_name = "_benchmark_prefix"
+    store = get_vector_store(index_name)
+    texts = synthetic_texts(num_texts)
+    store.add_texts(texts, [{"source": "synthetic.pdf", "chunk_id": i} for i in range(num_texts)])
+
+    try:
+        with FakeOllamaServer(tokens=50, first_token_delay=0.01, token_delay=0.0, prompt_token_delay=0.001) as server:
+            models.OLLAMA_HOST = server.url
+            models._ollama_client = None
+            for i in range(questions):
+                question = " ".join(texts[i * 7].split()[:12])
+                words_before = server.prompt_words
+                result = multi_agent_answer(question, index_name=index_name, use_cache=False, pipeline="full")
+                generation = result["generation"]
+                evaluated = sum(g["prompt_tokens"] for g in generation.values())
+                print(
+                    f"[PREFIX] evaluated {evaluated} of {server.prompt_words - words_before} prompt words: "
+                    + ", ".join(
+                        f"{stage} {g['prompt_tokens']} ({g['prompt_eval_s'] * 1000:.0f} ms)"
+                        for stage, g in generation.items()
+                    )
+                )
+    finally:
+        invalidate_vector_store(index_name)
+        shutil.rmtree(store.index_dir, ignore_errors=True)
+
+
+def bench_warmup(num_texts: int = 200, load_delay: float = 2.0) -> None:
+    """
+    First-question latency of the RAG pipeline from a cold start vs. after
+    core.warmup.warm_up(), against a fake Ollama endpoint that takes
+    `load_delay` seconds to load its model on the first request. The embedding
+    model is really reloaded; the index is already open in both cases.
+    """
+    import shutil
+
+    import core.models as models
+    from core.orchestrator import answer_question_with_rag
+    from core.warmup import warm_up
+    from retrieval.store_registry import get_vector_store, invalidate_vector_store
+
+    index_name = "_benchmark_warmup"
+    store = get_vector_store(index_name)
+    texts = synthetic_texts(num_texts)
+    store.add_texts(texts, [{"source": "synthetic.pdf", "chunk_id": i} for i in range(num_texts)])
+
+    try:
+        for i, warm in enumerate((False, True)):
+            models._embedding_model = None
+            with FakeOllamaServer(tokens=50, first_token_delay=0.05, token_delay=0.005, load_delay=load_delay) as server:
+                models.OLLAMA_HOST = server.url
+                models._ollama_client = None
+                warmup_s = 0.0
+                if warm:
+                    t0 = time.perf_counter()
+                    warm_up()
+                    warmup_s = time.perf_counter() - t0
+
+                # A new question each time, so the embedding cache does not answer it
+                question = " ".join(texts[i].split()[:12])
+                t0 = time.perf_counter()
+                answer_question_with_rag(question, index_name=index_name, use_cache=False)
+                first_s = time.perf_counter() - t0
+            print(
+                f"[WARMUP] {'warm' if warm else 'cold'}: first question {first_s * 1000:.0f} ms"
+                + (f" (after {warmup_s * 1000:.0f} ms warm-up)" if warm else "")
+            )
+    finally:
+        invalidate_vector_store(index_name)
+        shutil.rmtree(store.index_dir, ignore_errors=True)
+
+
+def bench_trace(num_texts: int = 2000, load_delay: float = 0.5) -> None:
+    """
+    Per-stage breakdown of one full multi-agent question (core.tracing) against
+    a fake Ollama endpoint with a model load on the first request and 1 ms per
+    evaluated prompt word, followed by the Prometheus metrics it produced.
+    """
+    import shutil
+
+    import core.models as models
+    from core.orchestrator import multi_agent_answer
+    from core.tracing import get_trace, prometheus_text, stage_breakdown, stage_totals
+    from retrieval.store_registry import get_vector_store, invalidate_vector_store
+
+    index_name = "_benchmark_trace"
+    store = get_vector_store(index_name)
+    texts = synthetic_texts(num_texts)
+    store.add_texts(texts, [{"source": "synthetic.pdf", "chunk_id": i} for i in range(num_texts)])
+    invalidate_vector_store(index_name)   # so the question also loads the store
+
+    try:
+        with FakeOllamaServer(
+            tokens=50, first_token_delay=0.05, token_delay=0.002, prompt_token_delay=0.001, load_delay=load_delay
+        ) as server:
+            models.OLLAMA_HOST = server.url
+            models._ollama_client = None
+            question = " ".join(texts[3].split()[:12])
+            result = multi_agent_answer(question, index_name=index_name, use_cache=False, pipeline="full")
+
+        trace = get_trace(result["trace_id"])
+        print(f"[TRACE] {trace['name']} {trace['seconds'] * 1000:.0f} ms")
+        for row in stage_breakdown(trace):
+            print(f"[TRACE] {row['stage']:<36} {row['ms']:>9.1f} ms  {row['details']}")
+        print("[TRACE] totals: " + ", ".join(f"{r['stage']} {r['ms']:.0f} ms x{r['calls']}" for r in stage_totals(trace)))
+        print(prometheus_text())
+    finally:
+        invalidate_vector_store(index_name)
+        shutil.rmtree(store.index_dir, ignore_errors=True)
+
+
+def import_time(module: str):
+    """
+    (cumulative import seconds, imported module names) of `module` in a fresh
+    interpreter, from `python -X importtime`.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds = 0.0
+    imported = set()
+    for line in proc.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            seconds = int(cumulative_us) / 1e6
+    return seconds, imported
+
+
+def bench_importtime() -> None:
+    """
+    Import time of the app's backend modules. Fails (exit code 1) if any of
+    them imports one of LAZY_IMPORTS eagerly again.
+    """
+    regressions = []
+    for module in IMPORT_MODULES:
+        seconds, imported = import_time(module)
+        eager = [m for m in LAZY_IMPORTS if m in imported]
+        print(f"[IMPORT] {module}: {seconds * 1000:.0f} ms" + (f", imports {eager} eagerly" if eager else ""))
+        if eager:
+            regressions.append(module)
+
+    if regressions:
+        raise SystemExit(f"[IMPORT] heavy dependencies imported at import time by {regressions}")
+
+
+SCENARIOS = {
+    "ann": bench_ann,
+    "async": bench_async,
+    "exact": bench_exact,
+    "importtime": bench_importtime,
+    "ingest": bench_ingest,
+    "lexical": bench_lexical,
+    "llm": bench_llm,
+    "prefix": bench_prefix,
+    "quant": bench_quant,
+    "stream": bench_stream,
+    "trace": bench_trace,
+    "warmup": bench_warmup,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AutoResearcher micro-benchmarks")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    args = parser.parse_args()
+    SCENARIOS[args.scenario]()
+
+
+if __name__ == "__main__":
+    main()
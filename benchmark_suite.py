@@ -0,0 +1,454 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import zlib
+from datetime import datetime
+from functools import partial
+from itertools import chain
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from benchmark import EMBEDDING_DIM, FakeOllamaServer, synthetic_texts
+from retrieval.chunker import chunk_text
+from config import (
+    ANN_INDEX_TYPE,
+    ANN_MIN_ROWS,
+    EMBEDDING_QUANTIZATION,
+    INGEST_BATCH_SIZE,
+    CONTEXT_TOKEN_BUDGET,
+    VECTOR_DB_DIR,
+)
+
+# Offline benchmark suite: ingestion, retrieval and end-to-end answering over a
+# synthetic corpus, with latency percentiles, throughput and peak RSS (per
+# measurement on Linux, where it can be reset; else only for the whole run),
+# written as JSON. `compare` flags regressions between two result files.
+#
+#   python benchmark_suite.py run --chunks 100000 --output bench.json
+#   python benchmark_suite.py compare baseline.json bench.json
+
+INDEX_NAME = "_benchmark_suite"
+SCENARIOS = ["ingest", "retrieval", "e2e"]
+SEARCH_MODES = ["dense", "lexical", "hybrid"]
+# Metrics compared between runs: name -> True if higher is better
+COMPARED_METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_per_s": True,
+    "peak_rss_mb": False,
+}
+
+
+# ---------- Synthetic corpus ----------
+
+
+def iter_corpus(num_chunks: int, batch_size: int, words_per_chunk: int) -> Iterator[List[str]]:
+    """
+    Synthetic chunk texts in batches, generated on the fly so 10^6 chunks do not
+    have to fit in memory at once. Deterministic for a given batch size.
+    """
+    for start in range(0, num_chunks, batch_size):
+        yield synthetic_texts(min(batch_size, num_chunks - start), words_per_chunk, seed=start)
+
+
+def synthetic_queries(num_queries: int, batch_size: int, words_per_chunk: int, words: int = 12) -> List[str]:
+    """
+    The first `words` words of corpus chunks, so every query has relevant chunks.
+    """
+    first_batch = next(iter_corpus(min(batch_size, max(num_queries, 1)), batch_size, words_per_chunk))
+    return [" ".join(first_batch[i % len(first_batch)].split()[:words]) for i in range(num_queries)]
+
+
+class HashingEmbedder:
+    """
+    Deterministic, offline stand-in for the embedding model that keeps up with
+    10^6 chunks: a text's embedding is the sum of fixed random vectors of its
+    words (hashed into `buckets`), so texts that share words are close.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, buckets: int = 1 << 15, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.table = rng.standard_normal((buckets, dim)).astype(np.float32)
+        self.buckets = buckets
+        self._word_buckets: Dict[str, int] = {}
+
+    def _bucket(self, word: str) -> int:
+        bucket = self._word_buckets.get(word)
+        if bucket is None:
+            bucket = self._word_buckets[word] = zlib.crc32(word.encode("utf-8")) % self.buckets
+        return bucket
+
+    def __call__(self, texts: List[str], use_cache: bool = True, remember: bool = True) -> np.ndarray:
+        ids = [[self._bucket(w) for w in t.lower().split()] or [0] for t in texts]
+        lengths = [len(i) for i in ids]
+        flat = np.fromiter(chain.from_iterable(ids), dtype=np.int64, count=sum(lengths))
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        emb = np.add.reduceat(self.table[flat], starts, axis=0)
+        return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+
+
+def use_embedder(name: str) -> None:
+    """
+    "hash": HashingEmbedder; "model": the configured SentenceTransformer with
+    the embedding cache bypassed (repeated runs would otherwise be cache hits).
+    """
+    import core.models
+    import core.orchestrator
+    import retrieval.vector_store
+
+    embed = HashingEmbedder() if name == "hash" else partial(core.models.embed_texts, use_cache=False)
+    retrieval.vector_store.embed_texts = embed
+    core.orchestrator.embed_texts = embed
+
+
+# ---------- Measurement ----------
+
+
+def process_peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process so far (None where the resource
+    module is unavailable, i.e. Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / 2**20 if sys.platform == "darwin" else rss / 2**10, 1)
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the peak RSS to the current RSS (Linux: VmHWM, via /proc/self/clear_refs),
+    so that measured_peak_rss_mb() covers only what runs from here.
+    False where this is not supported; per-measurement peaks are then not reported.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measured_peak_rss_mb() -> Optional[float]:
+    """
+    Peak RSS since the last successful reset_peak_rss() (None if there was none).
+    """
+    if not _peak_rss_resettable:
+        return None
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 2**10, 1)
+    except OSError:
+        pass
+    return None
+
+
+_peak_rss_resettable = False
+
+
+def start_measurement() -> None:
+    global _peak_rss_resettable
+    _peak_rss_resettable = reset_peak_rss()
+
+
+def summarize(latencies: List[float], items: int, total_s: float, unit: str) -> Dict:
+    """
+    Latency percentiles (ms) of the timed operations, `items` per second, and
+    the peak RSS since start_measurement() (None where it cannot be reset).
+    """
+    result = {"n": len(latencies), "unit": unit}
+    if latencies:
+        ms = np.asarray(latencies) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        result.update({
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(ms.max()), 3),
+        })
+    result["throughput_per_s"] = round(items / total_s, 2) if total_s > 0 else None
+    result["peak_rss_mb"] = measured_peak_rss_mb()
+    return result
+
+
+def timed(fn: Callable, inputs: List, unit: str, items_per_call: int = 1) -> Dict:
+    start_measurement()
+    latencies = []
+    t0 = time.perf_counter()
+    for x in inputs:
+        t = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, len(inputs) * items_per_call, time.perf_counter() - t0, unit)
+
+
+def _print_result(name: str, result: Dict) -> None:
+    parts = [f"{result['throughput_per_s']} {result['unit']}/s"]
+    if "p50_ms" in result:
+        parts.append(f"p50 {result['p50_ms']:.1f} / p95 {result['p95_ms']:.1f} / p99 {result['p99_ms']:.1f} ms")
+    if result["peak_rss_mb"] is not None:
+        parts.append(f"peak RSS {result['peak_rss_mb']} MiB")
+    print(f"[SUITE] {name:<22} " + ", ".join(parts))
+
+
+# ---------- Scenarios ----------
+
+
+def run_ingest(args, results: Dict) -> None:
+    """
+    Chunking of synthetic page text, then embedding + writing the corpus into
+    a fresh index in INGEST_BATCH_SIZE batches (as the indexer does), then compaction.
+    """
+    from retrieval.store_registry import get_vector_store
+
+    # Pages of 5 chunks' worth of words
+    pages = [" ".join(texts) for texts in iter_corpus(min(args.chunks, 2000), 5, args.words)]
+    results["ingest.chunking"] = timed(chunk_text, pages, unit="pages")
+
+    remove_index()
+    store = get_vector_store(INDEX_NAME)
+
+    start_measurement()
+    latencies = []
+    row = 0
+    t0 = time.perf_counter()
+    for texts in iter_corpus(args.chunks, INGEST_BATCH_SIZE, args.words):
+        metadatas = [{"source": f"synthetic_{(row + i) // 500:05d}.pdf", "chunk_id": row + i} for i in range(len(texts))]
+        t = time.perf_counter()
+        store.add_texts(texts, metadatas)
+        latencies.append(time.perf_counter() - t)
+        row += len(texts)
+    results["ingest.add_texts"] = summarize(latencies, row, time.perf_counter() - t0, unit="chunks")
+
+    start_measurement()
+    t = time.perf_counter()
+    store.compact()
+    elapsed = time.perf_counter() - t
+    results["ingest.compact"] = summarize([elapsed], 1, elapsed, unit="compactions")
+
+
+def run_retrieval(args, results: Dict) -> None:
+    """
+    Per-query latency for each search mode, filtered dense search, and
+    batched dense search throughput.
+    """
+    from retrieval.store_registry import get_vector_store
+
+    store = get_vector_store(INDEX_NAME)
+    queries = synthetic_queries(args.queries, INGEST_BATCH_SIZE, args.words)
+    store.similarity_search(queries[0], top_k=args.top_k)  # lazy structures (postings, ANN probes)
+
+    for mode in SEARCH_MODES:
+        results[f"retrieval.{mode}"] = timed(
+            lambda q: store.similarity_search(q, top_k=args.top_k, mode=mode), queries, unit="queries"
+        )
+
+    source = {"source": ["synthetic_00000.pdf"]}
+    results["retrieval.dense_filtered"] = timed(
+        lambda q: store.similarity_search(q, top_k=args.top_k, filters=source), queries, unit="queries"
+    )
+    results["retrieval.dense_batch"] = timed(
+        lambda qs: store.similarity_search_batch(qs, top_k=args.top_k),
+        [queries],
+        unit="queries",
+        items_per_call=len(queries),
+    )
+
+
+def run_e2e(args, results: Dict) -> None:
+    """
+    Simple RAG and each multi-agent pipeline against the stub LLM: a fake
+    Ollama endpoint with a fixed time to first token and per-token delay.
+    Answer and completion caches are bypassed.
+    """
+    import core.models as models
+    from core.orchestrator import answer_question_with_rag, multi_agent_answer
+    from core.pipeline_policy import PIPELINES
+
+    questions = synthetic_queries(args.questions, INGEST_BATCH_SIZE, args.words)
+    with FakeOllamaServer(
+        tokens=args.llm_tokens,
+        first_token_delay=args.llm_first_token_ms / 1000,
+        token_delay=args.llm_token_ms / 1000,
+    ) as server:
+        models.OLLAMA_HOST = server.url
+        models._ollama_client = None
+
+        results["e2e.rag"] = timed(
+            lambda q: answer_question_with_rag(q, index_name=INDEX_NAME, top_k=args.top_k, use_cache=False),
+            questions,
+            unit="questions",
+        )
+        for pipeline in PIPELINES:
+            results[f"e2e.multi_{pipeline}"] = timed(
+                lambda q: multi_agent_answer(
+                    q, index_name=INDEX_NAME, top_k=args.top_k, use_cache=False, pipeline=pipeline
+                ),
+                questions,
+                unit="questions",
+            )
+
+
+def remove_index() -> None:
+    from retrieval.store_registry import invalidate_vector_store
+
+    invalidate_vector_store(INDEX_NAME)
+    shutil.rmtree(os.path.join(VECTOR_DB_DIR, INDEX_NAME), ignore_errors=True)
+
+
+SCENARIO_RUNNERS = {
+    "ingest": run_ingest,
+    "retrieval": run_retrieval,
+    "e2e": run_e2e,
+}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args) -> Dict:
+    """
+    Runs the selected scenarios (the corpus is always ingested first, since the
+    other scenarios search it) and writes the results to args.output.
+    """
+    use_embedder(args.embedder)
+    scenarios = ["ingest"] + [s for s in args.scenarios if s != "ingest"]
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "chunks": args.chunks,
+            "words_per_chunk": args.words,
+            "queries": args.queries,
+            "questions": args.questions,
+            "top_k": args.top_k,
+            "embedder": args.embedder,
+            "llm": {
+                "tokens": args.llm_tokens,
+                "first_token_ms": args.llm_first_token_ms,
+                "token_ms": args.llm_token_ms,
+            },
+            "config": {
+                "ANN_INDEX_TYPE": ANN_INDEX_TYPE,
+                "ANN_MIN_ROWS": ANN_MIN_ROWS,
+                "EMBEDDING_QUANTIZATION": EMBEDDING_QUANTIZATION,
+                "INGEST_BATCH_SIZE": INGEST_BATCH_SIZE,
+                "CONTEXT_TOKEN_BUDGET": CONTEXT_TOKEN_BUDGET,
+            },
+        },
+        "results": {},
+    }
+
+    try:
+        for scenario in scenarios:
+            before = set(report["results"])
+            SCENARIO_RUNNERS[scenario](args, report["results"])
+            for name in report["results"]:
+                if name not in before:
+                    _print_result(name, report["results"][name])
+    finally:
+        if not args.keep_index:
+            remove_index()
+
+    # Resetting the peak between measurements also resets ru_maxrss
+    peaks = [r["peak_rss_mb"] for r in report["results"].values() if r.get("peak_rss_mb") is not None]
+    report["meta"]["peak_rss_mb"] = max(peaks + [process_peak_rss_mb() or 0.0]) or None
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[SUITE] Saved to {args.output}")
+    return report
+
+
+# ---------- Comparison ----------
+
+
+def compare_reports(baseline: Dict, current: Dict, tolerance: float) -> List[str]:
+    """
+    Print every compared metric side by side; returns the regressions (metrics
+    worse than the baseline by more than `tolerance`, relative).
+    """
+    for key in ("chunks", "words_per_chunk", "embedder", "llm", "config"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"[COMPARE] warning: {key} differs ({baseline['meta'].get(key)} vs {current['meta'].get(key)})")
+
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            print(f"[COMPARE] {name:<22} {metric:<17} {old:>10} -> {new:>10} ({change:+.1%}) {flag}")
+            if flag:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AutoResearcher benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and write JSON results")
+    run.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    run.add_argument("--chunks", type=int, default=20_000, help="corpus size (10^5-10^6 for scale tests)")
+    run.add_argument("--words", type=int, default=120, help="words per synthetic chunk")
+    run.add_argument("--queries", type=int, default=200)
+    run.add_argument("--questions", type=int, default=10, help="questions per end-to-end pipeline")
+    run.add_argument("--top-k", type=int, default=5)
+    run.add_argument("--embedder", choices=["hash", "model"], default="hash")
+    run.add_argument("--llm-tokens", type=int, default=100, help="tokens generated per stub LLM call")
+    run.add_argument("--llm-first-token-ms", type=float, default=50.0)
+    run.add_argument("--llm-token-ms", type=float, default=2.0)
+    run.add_argument("--keep-index", action="store_true", help=f"keep the '{INDEX_NAME}' index afterwards")
+    run.add_argument("--output", default="benchmark_results.json")
+
+    compare = commands.add_parser("compare", help="compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run_suite(args)
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare_reports(baseline, current, args.tolerance)
+    if regressions:
+        raise SystemExit(f"[COMPARE] {len(regressions)} regressions: {regressions}")
+    print("[COMPARE] no regressions")
+
+
+if __name__ == "__main__":
+    main()
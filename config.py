@@ -7,6 +7,49 @@ load_dotenv(ENV_PATH)
 
 # Ollama model configuration
 OLLAMA_MODEL_NAME = os.getenv("OLLAMA_MODEL_NAME", "llama3")
+# Ollama server URL (point it at a fake endpoint for tests / benchmarks)
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+# How long Ollama keeps the model (and the KV cache of the last prompts) loaded
+# after a request (a negative duration, e.g. "-1m", pins it); agent calls of a question share a
+# prompt prefix that is only reused while the model stays loaded
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Load the embedding model and the LLM in the background when the app starts
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+# Concurrent generations sent to Ollama by the async pipeline; match the
+# server's parallel slots (OLLAMA_NUM_PARALLEL)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# Opt-in on-disk cache of LLM completions, keyed by model, prompts and sampling options
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join("data", "cache", "completions.sqlite")
+)
+# Completions older than this are regenerated
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024**2)))
+
+# Opt-in semantic answer cache: near-identical questions (same numbers and
+# identifiers) on the same, unchanged index reuse the previous answer instead
+# of running the LLM pipeline again
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "0") == "1"
+# Minimum cosine similarity between question embeddings for a cache hit
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+# Answers remembered per index / answering mode
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Token budget for the retrieved context pasted into a prompt (merged, deduplicated chunks)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# tiktoken encoding used to count context tokens
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")
+
+# Multi-agent pipeline: "full" (Searcher -> Critic -> Writer), "adaptive" (opt-in:
+# skips the critic / writer when they are not needed) or "fused" (one generation)
+MULTI_AGENT_PIPELINE = os.getenv("MULTI_AGENT_PIPELINE", "full")
+# Adaptive: skip the critic when the best (dense) retrieval score is at least this
+# and the searcher summary has at most ADAPTIVE_MAX_SUMMARY_WORDS words
+ADAPTIVE_MIN_SCORE = float(os.getenv("ADAPTIVE_MIN_SCORE", "0.65"))
+ADAPTIVE_MAX_SUMMARY_WORDS = int(os.getenv("ADAPTIVE_MAX_SUMMARY_WORDS", "150"))
 
 # Embedding model configuration
 EMBEDDING_MODEL_NAME = os.getenv(
@@ -19,3 +62,62 @@ VECTOR_DB_DIR = os.getenv(
     "VECTOR_DB_DIR",
     os.path.join("data", "index")
 )
+
+# Approximate nearest-neighbour index for the vector store
+# ("ivf" = inverted file with a trained coarse quantizer, "exact" = brute force only)
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "ivf")
+# Below this many chunks, exact search is fast enough and no ANN index is built
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "20000"))
+# Number of inverted lists probed per query (higher = better recall, slower).
+# On 200k clustered rows (python benchmark.py ann) recall@5 is about 0.92 at 16,
+# 0.97 at 32 and 0.99 at 64, each step costing about 1.7x the search time.
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "32"))
+
+# Upper bound on memory held by loaded vector stores shared across questions (bytes)
+STORE_CACHE_MAX_BYTES = int(os.getenv("STORE_CACHE_MAX_BYTES", str(2 * 1024**3)))
+
+# Persistent embedding cache (keyed by embedding model + text hash)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join("data", "cache", "embeddings.sqlite")
+)
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(1024**3)))
+# Texts per SentenceTransformer encode call for cache misses
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# Worker processes for PDF extraction + chunking during index builds (1 = serial)
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", "1"))
+# Chunks embedded and flushed to the index per batch while ingesting a PDF
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+
+# Persistent queue of index builds run in the background by the app
+INDEX_JOBS_PATH = os.getenv(
+    "INDEX_JOBS_PATH",
+    os.path.join("data", "jobs", "index_jobs.sqlite")
+)
+# Index builds run at once (jobs of the same index always run one at a time)
+INDEX_JOB_WORKERS = int(os.getenv("INDEX_JOB_WORKERS", "2"))
+# How often the app refreshes the progress of index builds (seconds)
+INDEX_JOB_POLL_SECONDS = float(os.getenv("INDEX_JOB_POLL_SECONDS", "2"))
+
+# Compact in-memory copy of the embeddings scanned at query time
+# ("none", "float16" or "int8"); full-precision vectors stay memory-mapped on disk
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "none")
+# Shortlist size for exact rescoring = top_k * this factor
+QUANTIZATION_RESCORE_FACTOR = int(os.getenv("QUANTIZATION_RESCORE_FACTOR", "4"))
+
+# Retrieval mode: "dense" (embeddings), "lexical" (BM25) or "hybrid" (both, fused with RRF)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "dense")
+# Hybrid search fuses the top (top_k * this factor) results of each ranking
+HYBRID_CANDIDATES_FACTOR = int(os.getenv("HYBRID_CANDIDATES_FACTOR", "4"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Per-stage tracing of questions and index builds (see core.tracing)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+# Finished traces kept in memory (shown in the app, exported with export_traces)
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# Optional: append every finished trace to this JSON-lines file ("" = off)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+# Optional: rewrite this Prometheus text metrics file after every trace ("" = off)
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH", "")
@@ -0,0 +1,124 @@
+import re
+import threading
+from typing import Any, Dict, FrozenSet, Hashable, Optional
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][\w.\-]*")
+
+
+def key_terms(question: str) -> FrozenSet[str]:
+    """
+    Numbers and identifiers of a question (tokens with a digit, acronyms,
+    mixed case: "YOLOv8n", "mAP50", "2023", "GPU"), case-folded. Embeddings
+    barely separate questions that differ only in these, so a cache hit
+    requires the same set.
+    """
+    terms = set()
+    for token in _TOKEN_RE.findall(question):
+        token = token.rstrip(".-")
+        if any(c.isdigit() for c in token) or any(c.isupper() for c in token[1:]):
+            terms.add(token.casefold())
+    return frozenset(terms)
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of final answers, looked up by question meaning rather than
+    exact text: a new question hits when its embedding has cosine similarity
+    >= threshold with a previously answered question in the same scope
+    (index + answering mode + retrieval settings) and the same numbers and
+    identifiers (see key_terms).
+
+    Each scope remembers the index signature its answers were produced from;
+    when the index content changes, the whole scope is dropped on next access.
+    """
+
+    def __init__(self, threshold: float, max_entries: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._scopes: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, scope: str, signature: Hashable, question: str, embedding: np.ndarray) -> Optional[Any]:
+        """
+        Return the cached answer of the most similar question with the same
+        key terms, or None.
+        """
+        q = _normalize(embedding)
+        terms = key_terms(question)
+        with self._lock:
+            entry = self._valid_scope(scope, signature)
+            if entry is None or not entry["answers"]:
+                self.misses += 1
+                return None
+
+            sims = entry["embeddings"] @ q
+            sims[[t != terms for t in entry["terms"]]] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry["answers"][best]
+
+    def put(self, scope: str, signature: Hashable, question: str, embedding: np.ndarray, answer: Any) -> None:
+        q = _normalize(embedding)
+        with self._lock:
+            entry = self._valid_scope(scope, signature)
+            if entry is None:
+                entry = self._scopes[scope] = {
+                    "signature": signature,
+                    "embeddings": np.empty((0, q.shape[0]), dtype=np.float32),
+                    "terms": [],
+                    "answers": [],
+                }
+
+            entry["embeddings"] = np.vstack([entry["embeddings"], q[None, :]])
+            entry["terms"].append(key_terms(question))
+            entry["answers"].append(answer)
+
+            # Oldest answers go first
+            overflow = len(entry["answers"]) - self.max_entries
+            if overflow > 0:
+                entry["embeddings"] = entry["embeddings"][overflow:]
+                del entry["terms"][:overflow]
+                del entry["answers"][:overflow]
+
+    def _valid_scope(self, scope: str, signature: Hashable) -> Optional[Dict]:
+        """
+        The scope's entries, or None if absent / produced from older index content.
+        Called with self._lock held.
+        """
+        entry = self._scopes.get(scope)
+        if entry is not None and entry["signature"] != signature:
+            del self._scopes[scope]
+            self.invalidations += 1
+            return None
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scopes.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": sum(len(e["answers"]) for e in self._scopes.values()),
+            }
+
+
+def _normalize(embedding: np.ndarray) -> np.ndarray:
+    v = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm > 0 else v
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+def completion_key(
+    model_name: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """
+    Cache key: hash of everything that determines the completion.
+    """
+    payload = json.dumps(
+        [model_name, system_prompt, user_prompt, float(temperature), int(max_tokens)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    On-disk cache of LLM completions (SQLite).
+    - Entries older than ttl_seconds are treated as misses and removed.
+    - Least-recently-used entries are evicted once the table grows past max_bytes.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_bytes: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions(last_used)"
+            )
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()
+            self._disk_bytes = int(row[0])
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute(
+                "SELECT text, size, created FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            text, size, created = row
+            if now - created > self.ttl_seconds:
+                conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                conn.commit()
+                self._disk_bytes -= size
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            size = len(text.encode("utf-8"))
+            old = conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, text, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, text, size, now, now),
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            if self._disk_bytes > self.max_bytes:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """
+        Drop expired rows, then least-recently-used rows until the table is at
+        90% of max_bytes.
+        """
+        conn.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.ttl_seconds,))
+        target = int(self.max_bytes * 0.9)
+        total = int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0])
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM completions ORDER BY last_used ASC"):
+            if total <= target:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM completions WHERE key = ?", to_delete)
+        self._disk_bytes = total
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "disk_bytes": self._disk_bytes,
+            }
@@ -0,0 +1,247 @@
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_TOKENIZER
+from core.tracing import traced
+
+BLOCK_SEPARATOR = "\n\n---\n\n"
+# A block is only cut to fit when at least this many tokens of budget are left
+MIN_TRUNCATED_TOKENS = 64
+
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+_totals = {"questions": 0, "chunks": 0, "blocks": 0, "naive_tokens": 0, "context_tokens": 0}
+_totals_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    tiktoken encoding, loaded on first use. tiktoken downloads its BPE files
+    on first use, so without network access (or without tiktoken) token
+    counts fall back to an approximation.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(CONTEXT_TOKENIZER)
+                except Exception as e:
+                    print(f"[CONTEXT] tiktoken unavailable ({type(e).__name__}), approximating token counts")
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Words and punctuation marks, ~1.3 per English word like BPE tokenizers
+    return int(len(_APPROX_TOKEN_RE.findall(text)) * 1.3)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    words = text.split()
+    keep = int(max_tokens / 1.3)
+    return text if len(words) <= keep else " ".join(words[:keep])
+
+
+# ---------- Merging ----------
+
+
+def _merge_words(prev: List[str], cur: List[str], overlap: Optional[int]) -> List[str]:
+    """
+    Append cur to prev without the words they share.
+    overlap: number of shared words if known from chunk offsets; otherwise the
+    longest suffix of prev that is a prefix of cur is dropped.
+    """
+    if overlap is None:
+        overlap = 0
+        for k in range(min(len(prev), len(cur)), 0, -1):
+            if prev[-k:] == cur[:k]:
+                overlap = k
+                break
+    return prev + cur[max(overlap, 0):]
+
+
+def merge_chunks(results: List[Dict]) -> List[Dict]:
+    """
+    Merge retrieved chunks of the same source that overlap or are adjacent.
+
+    Chunks indexed with word offsets ("start" / "end" in metadata) are merged
+    by offset; older chunks without them are merged when their chunk_ids are
+    consecutive, using the word overlap found in the texts.
+
+    Returns blocks sorted by best score:
+    {"source": str, "chunk_ids": [int, ...], "score": float, "text": str}
+    """
+    by_source: Dict[str, List[Dict]] = {}
+    for r in results:
+        by_source.setdefault(r["metadata"].get("source", "unknown"), []).append(r)
+
+    blocks: List[Dict] = []
+    for source, items in by_source.items():
+        items.sort(key=lambda r: (r["metadata"].get("start", -1), r["metadata"].get("chunk_id", -1)))
+
+        current = None
+        for r in items:
+            meta = r["metadata"]
+            cid = meta.get("chunk_id", -1)
+            start, end = meta.get("start"), meta.get("end")
+            words = r["text"].split()
+
+            if current is not None:
+                if start is not None and current["end"] is not None:
+                    mergeable = start <= current["end"]
+                    overlap = current["end"] - start
+                else:
+                    mergeable = cid >= 0 and cid == current["chunk_ids"][-1] + 1
+                    overlap = None
+
+                if mergeable:
+                    if end is None or current["end"] is None or end > current["end"]:
+                        current["words"] = _merge_words(current["words"], words, overlap)
+                        current["end"] = end
+                    current["chunk_ids"].append(cid)
+                    current["score"] = max(current["score"], r["score"])
+                    continue
+                blocks.append(current)
+
+            current = {"source": source, "chunk_ids": [cid], "score": r["score"], "end": end, "words": words}
+
+        if current is not None:
+            blocks.append(current)
+
+    blocks.sort(key=lambda b: b["score"], reverse=True)
+    return [
+        {"source": b["source"], "chunk_ids": b["chunk_ids"], "score": b["score"], "text": " ".join(b["words"])}
+        for b in blocks
+    ]
+
+
+def _block_header(block: Dict) -> str:
+    ids = block["chunk_ids"]
+    if len(ids) == 1:
+        return f"[Source: {block['source']}, Chunk: {ids[0]}]"
+    return f"[Source: {block['source']}, Chunks: {ids[0]}-{ids[-1]}]"
+
+
+def _naive_context(results: List[Dict]) -> str:
+    # What the prompt used to contain: every chunk verbatim
+    return BLOCK_SEPARATOR.join(
+        f"[Source: {r['metadata'].get('source', 'unknown')}, Chunk: {r['metadata'].get('chunk_id', -1)}]\n{r['text']}"
+        for r in results
+    )
+
+
+# ---------- Packing ----------
+
+
+@traced("context.build")
+def build_context(results: List[Dict], token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """
+    Context for the LLM prompt from retrieved chunks:
+    - overlapping / adjacent chunks of the same source are merged into one block,
+    - blocks are added best-scoring first until token_budget is reached
+      (the block that crosses the budget is cut if enough room is left).
+
+    Returns (context text, report):
+    {"chunks": int, "blocks": int, "dropped_blocks": int,
+     "naive_tokens": int, "context_tokens": int, "tokens_saved": int}
+    """
+    blocks = merge_chunks(results)
+    separator_tokens = count_tokens(BLOCK_SEPARATOR)
+
+    parts: List[str] = []
+    used = 0
+    dropped = 0
+    for block in blocks:
+        header = _block_header(block)
+        part = f"{header}\n{block['text']}"
+        cost = count_tokens(part) + (separator_tokens if parts else 0)
+
+        if used + cost > token_budget:
+            remaining = token_budget - used - count_tokens(header) - (separator_tokens if parts else 0) - 1
+            if remaining < MIN_TRUNCATED_TOKENS:
+                dropped += 1
+                continue
+            part = f"{header}\n{truncate_to_tokens(block['text'], remaining)}"
+            cost = count_tokens(part) + (separator_tokens if parts else 0)
+
+        parts.append(part)
+        used += cost
+
+    context = BLOCK_SEPARATOR.join(parts)
+    naive_tokens = count_tokens(_naive_context(results))
+    context_tokens = count_tokens(context)
+    report = {
+        "chunks": len(results),
+        "blocks": len(parts),
+        "dropped_blocks": dropped,
+        "naive_tokens": naive_tokens,
+        "context_tokens": context_tokens,
+        "tokens_saved": naive_tokens - context_tokens,
+    }
+
+    with _totals_lock:
+        _totals["questions"] += 1
+        for key in ("chunks", "blocks", "naive_tokens", "context_tokens"):
+            _totals[key] += report[key]
+    return context, report
+
+
+def get_context_stats() -> Dict:
+    """
+    Totals over every context built in this process.
+    """
+    with _totals_lock:
+        stats = dict(_totals)
+    stats["tokens_saved"] = stats["naive_tokens"] - stats["context_tokens"]
+    return stats
+
+
+# ---------- Prompt prefix ----------
+
+
+def format_context_message(question: str, context_text: Optional[str] = None) -> str:
+    """
+    Start of every user prompt for a question: the question and the packed
+    context. It is identical for all agent calls of the question, so the LLM
+    server can reuse the prompt prefix it already evaluated (see core.prompts).
+    """
+    message = f"Question:\n{question}"
+    if context_text is not None:
+        message += f"\n\nContext from papers:\n{context_text}"
+    return message
+
+
+def build_context_message(
+    question: str,
+    results: List[Dict],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+) -> Tuple[str, Dict]:
+    """
+    format_context_message over build_context(results).
+    Returns (message, context report).
+    """
+    context_text, report = build_context(results, token_budget)
+    return format_context_message(question, context_text), report
+
+
+def stage_prompt(context_message: str, *sections: str) -> str:
+    """
+    User prompt of one stage: the shared context message first, then the
+    stage's own inputs and instructions.
+    """
+    return "\n\n".join([context_message, *(s.strip() for s in sections)])
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def text_key(model_name: str, text: str) -> str:
+    """
+    Cache key: embedding model + hash of the whitespace/unicode-normalized text.
+    """
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier, content-addressed embedding cache:
+    - memory: small LRU (mostly repeated query strings)
+    - disk: SQLite table of float32 vectors, evicted least-recently-used
+      once it grows past max_bytes. Lookups do not write: the last-used times
+      of disk hits are buffered and flushed with the next insert (or once
+      touch_batch keys are pending), so recency is approximate.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int, memory_items: int = 2048, touch_batch: int = 4096):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.touch_batch = touch_batch
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # key -> last-used time of disk hits not yet written
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vec BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+            )
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+            self._disk_bytes = int(row[0])
+        return self._conn
+
+    # ---------- Lookup ----------
+
+    def get_many(self, keys: List[str], remember: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Return the cached vectors for the keys that are present.
+        remember=False does not put disk hits in the memory LRU (bulk lookups
+        such as index builds, which would push the query strings out).
+        """
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            disk_keys = []
+            for key in keys:
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vec
+                    self.memory_hits += 1
+                else:
+                    disk_keys.append(key)
+
+            if disk_keys:
+                conn = self._connect()
+                now = time.time()
+                # Stay below SQLite's bound-parameter limit
+                for start in range(0, len(disk_keys), 500):
+                    batch = list(dict.fromkeys(disk_keys[start:start + 500]))
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vec
+                        self._touched[key] = now
+                        if remember:
+                            self._remember(key, vec)
+                if len(self._touched) >= self.touch_batch:
+                    self._flush_touched(conn)
+                    conn.commit()
+
+                for key in disk_keys:
+                    if key in found:
+                        self.disk_hits += 1
+                    else:
+                        self.misses += 1
+        return found
+
+    # ---------- Insert / evict ----------
+
+    def put_many(self, items: Dict[str, np.ndarray], remember: bool = True) -> None:
+        """
+        Store vectors (replacing existing keys). remember=False keeps them out
+        of the memory LRU (see get_many).
+        """
+        if not items:
+            return
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            rows = []
+            for key, vec in items.items():
+                vec = np.asarray(vec, dtype=np.float32)
+                if remember:
+                    self._remember(key, vec)
+                blob = vec.tobytes()
+                rows.append((key, blob, len(blob), now))
+
+            # Replaced rows must not be counted twice in the size total
+            replaced = 0
+            keys = list(items)
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                replaced += int(conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchone()[0])
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec, size, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            for key in items:
+                self._touched.pop(key, None)
+            self._flush_touched(conn)
+            self._disk_bytes += sum(r[2] for r in rows) - replaced
+            if self._disk_bytes > self.max_bytes:
+                self._evict(conn)
+            conn.commit()
+
+    def _flush_touched(self, conn: sqlite3.Connection) -> None:
+        if self._touched:
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(ts, key) for key, ts in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """
+        Drop least-recently-used rows until the table is at 90% of max_bytes.
+        """
+        target = int(self.max_bytes * 0.9)
+        cursor = conn.execute("SELECT key, size FROM embeddings ORDER BY last_used ASC")
+        to_delete = []
+        total = int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0])
+        for key, size in cursor:
+            if total <= target:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", to_delete)
+        self._disk_bytes = total
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "disk_bytes": self._disk_bytes,
+            }
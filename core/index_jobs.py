@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from core.orchestrator import build_index_from_pdfs
+from config import INDEX_JOBS_PATH, INDEX_JOB_WORKERS
+
+class IndexJobQueue:
+    """
+    Persistent queue of index builds (SQLite), run by background worker threads
+    so the app never blocks on build_index_from_pdfs.
+    - Jobs of the same index run one at a time, in submission order; jobs of
+      different indexes run in parallel (up to `workers`).
+    - Progress (documents done, chunks, chunks/sec) and the final report are
+      stored on the job row, so any session can poll them.
+    - Jobs that were running when the worker process stopped are queued again
+      on start(). One process (the app) is expected to run the workers.
+    """
+
+    def __init__(self, db_path: str, workers: int):
+        self.db_path = db_path
+        self.workers = workers
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, index_name TEXT NOT NULL, "
+                "pdf_paths TEXT NOT NULL, options TEXT NOT NULL, state TEXT NOT NULL, "
+                "submitted REAL NOT NULL, started REAL, finished REAL, "
+                "progress TEXT, report TEXT, error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, id)")
+        return self._conn
+
+    def submit(self, index_name: str, pdf_paths: List[str], **options) -> int:
+        """
+        Queue a build_index_from_pdfs(pdf_paths, index_name, **options) run.
+        Returns the job id.
+        """
+        with self._lock:
+            cursor = self._connect().execute(
+                "INSERT INTO jobs (index_name, pdf_paths, options, state, submitted) VALUES (?, ?, ?, 'queued', ?)",
+                (index_name, json.dumps(pdf_paths), json.dumps(options), time.time()),
+            )
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def start(self) -> None:
+        """
+        Start the worker threads (once); queue again the jobs left running.
+        """
+        with self._lock:
+            if self._threads:
+                return
+            requeued = self._connect().execute(
+                "UPDATE jobs SET state = 'queued', started = NULL WHERE state = 'running'"
+            ).rowcount
+            if requeued:
+                print(f"[JOBS] Re-queued {requeued} interrupted index builds")
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"index-jobs-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _claim(self) -> Optional[Dict]:
+        """
+        Mark the oldest queued job whose index has no running job as running.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE state = 'queued' AND index_name NOT IN "
+                    "(SELECT index_name FROM jobs WHERE state = 'running') ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET state = 'running', started = ? WHERE id = ?",
+                        (time.time(), row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return _job_dict(row) if row is not None else None
+
+    def _work(self) -> None:
+        while True:
+            job = self._claim()
+            if job is None:
+                # Woken by submit() / a finished job; the timeout also picks up
+                # jobs queued by other processes
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+            # Another job of the same index may be waiting for this one
+            self._wakeup.set()
+
+    def _run(self, job: Dict) -> None:
+        print(f"[JOBS] Job {job['id']}: building '{job['index_name']}' from {len(job['pdf_paths'])} PDFs")
+        try:
+            report = build_index_from_pdfs(
+                job["pdf_paths"],
+                index_name=job["index_name"],
+                progress=lambda p: self._update(job["id"], progress=json.dumps(p)),
+                **job["options"],
+            )
+        except Exception as e:
+            print(f"[JOBS] Job {job['id']} failed: {type(e).__name__}: {e}")
+            self._update(job["id"], state="failed", finished=time.time(), error=f"{type(e).__name__}: {e}")
+        else:
+            self._update(job["id"], state="done", finished=time.time(), report=json.dumps(report))
+
+    def _update(self, job_id: int, **columns) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        with self._lock:
+            self._connect().execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*columns.values(), job_id),
+            )
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row is not None else None
+
+    def list_jobs(self, index_name: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """
+        Most recent jobs first (optionally of one index only).
+        """
+        query = "SELECT * FROM jobs"
+        params: tuple = ()
+        if index_name is not None:
+            query += " WHERE index_name = ?"
+            params = (index_name,)
+        with self._lock:
+            rows = self._connect().execute(query + " ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def clear_if_idle(self, index_name: str, clear: Callable[[str], None]) -> bool:
+        """
+        Run clear(index_name) unless a job of index_name is queued or running;
+        returns whether it ran. The check and clear() share the transaction
+        _claim() takes, so no job of the index can start in between.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = conn.execute(
+                    "SELECT 1 FROM jobs WHERE index_name = ? AND state IN ('queued', 'running') LIMIT 1",
+                    (index_name,),
+                ).fetchone()
+                if pending is None:
+                    clear(index_name)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return pending is None
+
+
+def _job_dict(row: sqlite3.Row) -> Dict:
+    """
+    {"id", "index_name", "pdf_paths", "options", "state", "submitted",
+     "started", "finished", "progress", "report", "error"}
+    """
+    job = dict(row)
+    for key in ("pdf_paths", "options", "progress", "report"):
+        if job[key] is not None:
+            job[key] = json.loads(job[key])
+    return job
+
+
+_queue: Optional[IndexJobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_index_job_queue() -> IndexJobQueue:
+    """
+    Process-wide job queue; its workers are started on first access.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IndexJobQueue(INDEX_JOBS_PATH, INDEX_JOB_WORKERS)
+            _queue.start()
+        return _queue
@@ -1,11 +1,20 @@
+import asyncio
 import os
 import sys
-from typing import List
+import threading
+import time
+import weakref
+from collections import deque
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Iterator, Optional
 
 import numpy as np
-import torch
-import ollama
-from sentence_transformers import SentenceTransformer
+
+# torch, sentence_transformers and ollama take seconds to import; they are
+# imported on first use so that importing this module (the app, evaluation,
+# index-only scripts) stays cheap. See `python benchmark.py importtime`.
+if TYPE_CHECKING:
+    import ollama
+    from sentence_transformers import SentenceTransformer
 
 # Ensure we can import config
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -13,55 +22,444 @@ PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
-from config import OLLAMA_MODEL_NAME, EMBEDDING_MODEL_NAME  # noqa: E402
+from config import (  # noqa: E402
+    OLLAMA_MODEL_NAME,
+    OLLAMA_HOST,
+    OLLAMA_KEEP_ALIVE,
+    LLM_MAX_CONCURRENCY,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_BYTES,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_BATCH_SIZE,
+)
+from core.embedding_cache import EmbeddingCache, text_key  # noqa: E402
+from core.completion_cache import CompletionCache, completion_key  # noqa: E402
+from core.tracing import count, record_span, span  # noqa: E402
 
 # ---------- LLM CLIENT (Ollama) ----------
 
-def generate_text(
+_ollama_client: Optional["ollama.Client"] = None
+_completion_cache = (
+    CompletionCache(LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES)
+    if LLM_CACHE_ENABLED
+    else None
+)
+# Timing of the most recent generations (see get_generation_stats)
+_generation_log: "deque[Dict]" = deque(maxlen=256)
+
+
+def get_ollama_client() -> "ollama.Client":
+    global _ollama_client
+    if _ollama_client is None:
+        import ollama
+
+        _ollama_client = ollama.Client(host=OLLAMA_HOST)
+    return _ollama_client
+
+
+def stream_text(
     system_prompt: str,
     user_prompt: str,
     temperature: float = 0.3,
     max_tokens: int = 800,
-) -> str:
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+) -> Iterator[str]:
     """
-    Call the local Ollama model with a system + user prompt.
-    Returns the generated text content.
+    Call the local Ollama model with a system + user prompt and yield the
+    generated text piece by piece, as the tokens arrive.
+
+    With LLM_CACHE_ENABLED, a completion cached for the same model, prompts
+    and sampling options is returned as a single piece instead
+    (use_cache=False skips the lookup and does not store the result).
+
+    Once the stream is exhausted, `stats` (if given) is filled with:
+    {
+        "ttft_s": float,          # time to first token
+        "total_s": float,
+        "tokens": int,            # generated tokens (Ollama's eval_count if reported)
+        "tokens_per_s": float,    # decode speed after the first token
+        "prompt_tokens": int,     # prompt tokens evaluated (Ollama's prompt_eval_count);
+                                  # a prefix reused from the server's cache is not counted
+        "prompt_eval_s": float,   # Ollama's prompt_eval_duration
+        "eval_s": float,          # Ollama's eval_duration (decoding)
+        "load_s": float,          # Ollama's load_duration (model load, if it was not loaded)
+        "cached": bool,
+    }
+    Each call is also recorded as an "llm.generate" span (see core.tracing).
     """
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": user_prompt})
+    t0 = time.perf_counter()
+    key = _completion_key(system_prompt, user_prompt, temperature, max_tokens, use_cache)
+    if key is not None:
+        cached = _completion_cache.get(key)
+        if cached is not None:
+            _record_cache_hit(t0, stats)
+            yield cached
+            return
 
-    response = ollama.chat(
+    first_token_at = None
+    parts: List[str] = []
+    final: Dict = {}
+
+    for chunk in get_ollama_client().chat(
         model=OLLAMA_MODEL_NAME,
-        messages=messages,
+        messages=_chat_messages(system_prompt, user_prompt),
         options={
             "temperature": temperature,
             "num_predict": max_tokens,
         },
+        stream=True,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    ):
+        content = chunk["message"]["content"]
+        if content:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(content)
+            yield content
+        if chunk.get("done"):
+            final = chunk
+
+    _record_generation(t0, first_token_at, len(parts), final, stats)
+    if key is not None and parts:
+        _completion_cache.put(key, "".join(parts))
+
+
+def _chat_messages(system_prompt: str, user_prompt: str) -> List[Dict]:
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": user_prompt})
+    return messages
+
+
+def _completion_key(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int,
+    use_cache: bool,
+) -> Optional[str]:
+    if _completion_cache is None or not use_cache:
+        return None
+    return completion_key(OLLAMA_MODEL_NAME, system_prompt, user_prompt, temperature, max_tokens)
+
+
+def _record_cache_hit(t0: float, stats: Optional[Dict]) -> None:
+    # Cache hits are kept out of _generation_log so they do not skew tokens/sec
+    end = time.perf_counter()
+    record_span("llm.generate", t0, end, model=OLLAMA_MODEL_NAME, cached=True)
+    count("autoresearcher_llm_calls_total", cached="true")
+    if stats is not None:
+        elapsed = round(end - t0, 4)
+        stats.update({
+            "ttft_s": elapsed,
+            "total_s": elapsed,
+            "tokens": 0,
+            "tokens_per_s": 0.0,
+            "prompt_tokens": 0,
+            "prompt_eval_s": 0.0,
+            "eval_s": 0.0,
+            "load_s": 0.0,
+            "cached": True,
+        })
+
+
+def _record_generation(
+    t0: float,
+    first_token_at: Optional[float],
+    pieces: int,
+    final: Dict,
+    stats: Optional[Dict],
+) -> None:
+    end = time.perf_counter()
+    first_token_at = first_token_at or end
+    tokens = final.get("eval_count") or pieces
+    if final.get("eval_duration"):
+        tokens_per_s = tokens / (final["eval_duration"] / 1e9)
+    else:
+        decode_s = end - first_token_at
+        tokens_per_s = (tokens - 1) / decode_s if tokens > 1 and decode_s > 0 else 0.0
+
+    record = {
+        "ttft_s": round(first_token_at - t0, 4),
+        "total_s": round(end - t0, 4),
+        "tokens": int(tokens),
+        "tokens_per_s": round(tokens_per_s, 2),
+        "prompt_tokens": int(final.get("prompt_eval_count") or 0),
+        "prompt_eval_s": round((final.get("prompt_eval_duration") or 0) / 1e9, 4),
+        "eval_s": round((final.get("eval_duration") or 0) / 1e9, 4),
+        "load_s": round((final.get("load_duration") or 0) / 1e9, 4),
+        "cached": False,
+    }
+    _generation_log.append(record)
+
+    record_span(
+        "llm.generate", t0, end,
+        model=OLLAMA_MODEL_NAME,
+        ttft_s=record["ttft_s"],
+        eval_count=record["tokens"],
+        eval_duration_s=record["eval_s"],
+        prompt_eval_count=record["prompt_tokens"],
+        prompt_eval_duration_s=record["prompt_eval_s"],
+        load_duration_s=record["load_s"],
+    )
+    count("autoresearcher_llm_calls_total", cached="false")
+    count("autoresearcher_llm_tokens_total", record["prompt_tokens"], kind="prompt")
+    count("autoresearcher_llm_tokens_total", record["tokens"], kind="generated")
+    for phase in ("load", "prompt_eval", "eval"):
+        count("autoresearcher_llm_seconds_total", record[f"{phase}_s"], phase=phase)
+    if stats is not None:
+        stats.update(record)
+
+
+def generate_text(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.3,
+    max_tokens: int = 800,
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Call the local Ollama model with a system + user prompt.
+    Returns the generated text content.
+    The response is streamed internally so that time-to-first-token and
+    tokens/sec are recorded for every call (see stream_text).
+    """
+    return "".join(
+        stream_text(system_prompt, user_prompt, temperature, max_tokens, stats=stats, use_cache=use_cache)
     )
 
-    return response["message"]["content"]
+
+# ---------- Async LLM client ----------
+
+# asyncio primitives and httpx async connections belong to one event loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ollama.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_llm_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_ollama_client() -> "ollama.AsyncClient":
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import ollama
+
+        client = _async_clients[loop] = ollama.AsyncClient(host=OLLAMA_HOST)
+    return client
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    """
+    At most LLM_MAX_CONCURRENCY requests in flight per event loop. Extra
+    requests wait here instead of queueing inside the Ollama server.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_slots.get(loop)
+    if semaphore is None:
+        semaphore = _llm_slots[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
+
+
+async def astream_text(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.3,
+    max_tokens: int = 800,
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Async version of stream_text (ollama.AsyncClient), limited to
+    LLM_MAX_CONCURRENCY concurrent generations.
+    Timings start once a slot is free, so they exclude queueing.
+    Cache hits do not take a slot.
+    """
+    key = _completion_key(system_prompt, user_prompt, temperature, max_tokens, use_cache)
+    if key is not None:
+        t0 = time.perf_counter()
+        cached = await asyncio.to_thread(_completion_cache.get, key)
+        if cached is not None:
+            _record_cache_hit(t0, stats)
+            yield cached
+            return
+
+    async with _llm_semaphore():
+        t0 = time.perf_counter()
+        first_token_at = None
+        parts: List[str] = []
+        final: Dict = {}
+
+        async for chunk in await get_async_ollama_client().chat(
+            model=OLLAMA_MODEL_NAME,
+            messages=_chat_messages(system_prompt, user_prompt),
+            options={
+                "temperature": temperature,
+                "num_predict": max_tokens,
+            },
+            stream=True,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+        ):
+            content = chunk["message"]["content"]
+            if content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(content)
+                yield content
+            if chunk.get("done"):
+                final = chunk
+
+        _record_generation(t0, first_token_at, len(parts), final, stats)
+
+    if key is not None and parts:
+        await asyncio.to_thread(_completion_cache.put, key, "".join(parts))
+
+
+async def agenerate_text(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.3,
+    max_tokens: int = 800,
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Async version of generate_text.
+    """
+    pieces = []
+    async for piece in astream_text(
+        system_prompt, user_prompt, temperature, max_tokens, stats=stats, use_cache=use_cache
+    ):
+        pieces.append(piece)
+    return "".join(pieces)
+
+
+def get_generation_stats() -> Dict:
+    """
+    Averages over the most recent LLM calls (empty dict if there were none).
+    """
+    records = list(_generation_log)
+    if not records:
+        return {}
+    n = len(records)
+    return {
+        "calls": n,
+        "avg_ttft_s": round(sum(r["ttft_s"] for r in records) / n, 4),
+        "avg_total_s": round(sum(r["total_s"] for r in records) / n, 4),
+        "avg_tokens_per_s": round(sum(r["tokens_per_s"] for r in records) / n, 2),
+        "avg_prompt_tokens": round(sum(r["prompt_tokens"] for r in records) / n, 1),
+        "avg_prompt_eval_s": round(sum(r["prompt_eval_s"] for r in records) / n, 4),
+        "avg_eval_s": round(sum(r["eval_s"] for r in records) / n, 4),
+        "total_load_s": round(sum(r["load_s"] for r in records), 4),
+    }
 
 
 # ---------- EMBEDDING MODEL (local, GPU) ----------
 
-_device = "cuda" if torch.cuda.is_available() else "cpu"
-_embedding_model: SentenceTransformer | None = None
+_device: Optional[str] = None
+_embedding_model: Optional["SentenceTransformer"] = None
+# The model can be requested by the background warm-up and a query at once
+_embedding_model_lock = threading.Lock()
+
+
+def get_device() -> str:
+    """
+    "cuda" if a GPU is available, else "cpu". Detected (and torch imported)
+    on first call.
+    """
+    global _device
+    if _device is None:
+        import torch
 
+        _device = "cuda" if torch.cuda.is_available() else "cpu"
+    return _device
 
-def get_embedding_model() -> SentenceTransformer:
+
+def get_embedding_model() -> "SentenceTransformer":
     global _embedding_model
     if _embedding_model is None:
-        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=_device)
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                from sentence_transformers import SentenceTransformer
+
+                _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=get_device())
     return _embedding_model
 
 
-def embed_texts(texts: List[str]) -> np.ndarray:
+_embedding_cache = (
+    EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES)
+    if EMBEDDING_CACHE_ENABLED
+    else None
+)
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    model = get_embedding_model()
+    return model.encode(
+        texts,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+
+
+def embed_texts(texts: List[str], use_cache: bool = True, remember: bool = True) -> np.ndarray:
     """
     Compute embeddings for a list of texts.
     Returns a NumPy array of shape (n_texts, dim).
+
+    Cached embeddings (same model + same normalized text) are reused; only the
+    misses are sent to the model, in batches of EMBEDDING_BATCH_SIZE.
     """
-    model = get_embedding_model()
-    embeddings = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-    return embeddings
+    with span("embed_texts", texts=len(texts)) as s:
+        if _embedding_cache is None or not use_cache or not texts:
+            s.set(encoded=len(texts))
+            return _encode(texts)
+
+        keys = [text_key(EMBEDDING_MODEL_NAME, t) for t in texts]
+        found = _embedding_cache.get_many(keys, remember=remember)
+
+        # Encode each distinct missing text once
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        s.set(encoded=len(missing))
+        if missing:
+            new_embeddings = _encode(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_embeddings))
+            _embedding_cache.put_many(computed, remember=remember)
+            found.update(computed)
+
+        return np.stack([np.asarray(found[k], dtype=np.float32) for k in keys])
+
+
+async def aembed_texts(texts: List[str], use_cache: bool = True) -> np.ndarray:
+    """
+    embed_texts in a worker thread, so encoding does not block the event loop.
+    """
+    return await asyncio.to_thread(embed_texts, texts, use_cache)
+
+
+def get_completion_cache_stats() -> Dict:
+    """
+    Hit/miss counters of the LLM completion cache (empty dict if disabled).
+    """
+    return _completion_cache.stats() if _completion_cache is not None else {}
+
+
+def get_embedding_cache_stats() -> Dict:
+    """
+    Hit/miss counters of the embedding cache (empty dict if disabled).
+    """
+    return _embedding_cache.stats() if _embedding_cache is not None else {}
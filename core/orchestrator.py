@@ -1,93 +1,539 @@
+import asyncio
+import hashlib
+import json
 import os
-from typing import List
+import time
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
 
-from core.models import generate_text
-from retrieval.pdf_loader import load_pdf_text
-from retrieval.chunker import chunk_text
-from retrieval.vector_store import LocalVectorStore
-from agents.searcher import run_searcher_agent
-from agents.critic import run_critic_agent
-from agents.writer import run_writer_agent
+from core.answer_cache import SemanticAnswerCache
+from core.context_builder import build_context_message, stage_prompt
+from core.models import agenerate_text, embed_texts, generate_text, stream_text, get_embedding_cache_stats
+from core.prompts import RAG_INSTRUCTIONS, SHARED_SYSTEM_PROMPT
+from core.tracing import annotate, current_trace_id, span, traced, traced_iter
+from retrieval.ingest import iter_chunked_pdfs, iter_batches
+from retrieval.store_registry import get_vector_store
+from core.pipeline_policy import check_pipeline, critic_skip_reason, writer_skip_reason
+from agents.searcher import (
+    NO_CONTEXT_SUMMARY,
+    arun_searcher_agent,
+    run_searcher_agent,
+    search_context,
+    stream_searcher_agent,
+)
+from agents.critic import arun_critic_agent, run_critic_agent, stream_critic_agent
+from agents.writer import arun_writer_agent, run_writer_agent, stream_writer_agent
+from agents.fused import arun_fused_agent, fused_final_answer, run_fused_agent, stream_fused_agent
+from config import (
+    EMBEDDING_MODEL_NAME,
+    INDEX_WORKERS,
+    INGEST_BATCH_SIZE,
+    SEARCH_MODE,
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_MAX_ENTRIES,
+    MULTI_AGENT_PIPELINE,
+)
 
+_answer_cache = (
+    SemanticAnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_MAX_ENTRIES)
+    if ANSWER_CACHE_ENABLED
+    else None
+)
 
+
+def file_sha256(path: str) -> str:
+    """
+    Content hash of a file, read in 1 MiB blocks.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@traced("index.build", root=True)
 def build_index_from_pdfs(
     pdf_paths: List[str],
     index_name: str = "default_index",
     chunk_size: int = 600,
     chunk_overlap: int = 150,
-) -> None:
+    workers: int = INDEX_WORKERS,
+    progress: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
     """
     Build (or extend) a vector index from a list of PDF files.
     If the index already has data, new chunks are appended.
+
+    Documents are identified by file name and tracked in the index's document
+    manifest (content hash, chunking parameters, embedding model):
+    - unchanged documents are skipped,
+    - changed documents have their old chunks replaced.
+
+    Serially, each PDF is streamed page by page and its chunks are embedded and
+    flushed in batches of INGEST_BATCH_SIZE, so peak memory is bounded by the
+    batch size rather than the document size.
+    With workers > 1, PDF extraction and chunking run in a process pool while
+    this process embeds the documents that are already chunked. Documents are
+    still added in input order.
+
+    progress (optional) is called once the unchanged documents are known and
+    after each indexed document, with:
+    {"documents_total": int, "documents_done": int, "last_document": str | None,
+     "chunks": int, "seconds": float, "chunks_per_s": float}
+
+    Returns a report:
+    {"added": int, "replaced": int, "skipped": int, "chunks": int, "seconds": float,
+     "trace_id": str | None}  # per-stage trace of the build (see core.tracing)
     """
-    store = LocalVectorStore(index_name=index_name)
+    t0 = time.time()
+    annotate(index=index_name, documents=len(pdf_paths))
+    store = get_vector_store(index_name)
+    report = {"added": 0, "replaced": 0, "skipped": 0, "chunks": 0}
 
+    # 1) Decide what to (re)index; hashing is cheap compared to parsing
+    planned: Dict[str, Dict] = {}
     for pdf_path in pdf_paths:
+        source = os.path.basename(pdf_path)
+        document = {
+            "source": source,
+            "sha256": file_sha256(pdf_path),
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "embedding_model": EMBEDDING_MODEL_NAME,
+        }
+
+        existing = store.documents.get(source)
+        if existing is not None and all(existing.get(k) == v for k, v in document.items()):
+            print(f"[INDEX] {source} unchanged, skipping")
+            report["skipped"] += 1
+            continue
+
+        planned[pdf_path] = document
+
+    def report_progress(last_document: Optional[str]) -> None:
+        if progress is not None:
+            elapsed = time.time() - t0
+            progress({
+                "documents_total": len(pdf_paths),
+                "documents_done": report["added"] + report["replaced"] + report["skipped"],
+                "last_document": last_document,
+                "chunks": report["chunks"],
+                "seconds": round(elapsed, 2),
+                "chunks_per_s": round(report["chunks"] / elapsed, 1) if elapsed > 0 else 0.0,
+            })
+
+    report_progress(None)
+
+    # 2) Extract + chunk (possibly in parallel), embed and add in order
+    for pdf_path, chunks in iter_chunked_pdfs(
+        list(planned.keys()),
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        workers=workers,
+    ):
+        document = planned[pdf_path]
+        source = document["source"]
         print(f"[INDEX] Loading PDF: {pdf_path}")
-        doc = load_pdf_text(pdf_path)
-        chunks = chunk_text(doc["full_text"], chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        print(f"[INDEX] {os.path.basename(pdf_path)} -> {len(chunks)} chunks")
 
-        texts = [c["text"] for c in chunks]
-        metadatas = [
-            {
-                "source": os.path.basename(pdf_path),
-                "chunk_id": c["chunk_id"],
-            }
-            for c in chunks
-        ]
+        with span("index.document", source=source) as document_span:
+            if source in store.documents or store.has_source(source):
+                removed = store.delete_source(source)
+                print(f"[INDEX] {source} changed, replacing {removed} old chunks")
+                report["replaced"] += 1
+            else:
+                report["added"] += 1
+
+            n_chunks = _add_document_chunks(store, document, chunks)
+            document_span.set(chunks=n_chunks)
+        print(f"[INDEX] {source} -> {n_chunks} chunks")
+        report["chunks"] += n_chunks
+        report_progress(source)
+
+    # Each PDF was written as its own segment; merge the small ones
+    # and drop the chunks of replaced documents
+    store.compact()
+
+    report["seconds"] = round(time.time() - t0, 2)
+    report["trace_id"] = current_trace_id()
+    print(f"[INDEX] Index building completed: {report}")
+    print(f"[INDEX] Embedding cache: {get_embedding_cache_stats()}")
+    return report
+
+
+def _add_document_chunks(
+    store,
+    document: Dict,
+    chunks,
+    batch_size: int = INGEST_BATCH_SIZE,
+) -> int:
+    """
+    Embed and add a document's chunk stream in fixed-size batches.
+    The document manifest entry is committed with the last batch.
+    """
+    source = document["source"]
+    n_chunks = 0
+    pending = None
+
+    # Chunks are produced lazily, so reading a batch is where the PDF is parsed and chunked
+    for batch in traced_iter("ingest.read_chunks", iter_batches(chunks, batch_size)):
+        # Hold one batch back so the final one can carry the document entry
+        if pending is not None:
+            _add_chunk_batch(store, source, pending)
+        pending = batch
+        n_chunks += len(batch)
+
+    document["chunks"] = n_chunks
+    _add_chunk_batch(store, source, pending or [], document=document)
+    return n_chunks
+
+
+def _add_chunk_batch(store, source: str, batch: List[Dict], document: Dict = None) -> None:
+    texts = [c["text"] for c in batch]
+    metadatas = [
+        {
+            "source": source,
+            "chunk_id": c["chunk_id"],
+            # Word offsets in the document, used to merge overlapping chunks in prompts
+            "start": c["start"],
+            "end": c["end"],
+        }
+        for c in batch
+    ]
+    store.add_texts(texts, metadatas, document=document)
+
+
+NO_RESULTS_ANSWER = "I could not find any relevant information in the current index."
+
+
+@traced("answer_cache.lookup")
+def _lookup_answer(
+    kind: str,
+    question: str,
+    index_name: str,
+    top_k: int,
+    filters: Optional[Dict],
+    search_mode: str,
+    use_cache: bool,
+) -> Tuple[Optional[Any], Optional[Tuple]]:
+    """
+    Semantic answer cache lookup, in front of the LLM pipelines.
+    Returns (cached answer or None, context to pass to _remember_answer).
+    Answers are scoped by index, pipeline kind and retrieval settings, and are
+    only valid for the index content (manifest signature) they came from.
+    """
+    if _answer_cache is None or not use_cache:
+        return None, None
+
+    signature = get_vector_store(index_name).loaded_signature
+    scope = json.dumps(
+        [index_name, kind, top_k, filters, search_mode],
+        sort_keys=True,
+        default=sorted,  # sets in filters
+    )
+    embedding = embed_texts([question])[0]
+    answer = _answer_cache.lookup(scope, signature, question, embedding)
+    annotate(hit=answer is not None)
+    return answer, (scope, signature, question, embedding)
+
+
+def _remember_answer(context: Optional[Tuple], answer: Any) -> None:
+    if context is not None:
+        scope, signature, question, embedding = context
+        _answer_cache.put(scope, signature, question, embedding, answer)
 
-        store.add_texts(texts, metadatas)
 
-    print("[INDEX] Index building completed.")
+def get_answer_cache_stats() -> Dict:
+    """
+    Hit/miss counters of the semantic answer cache (empty dict if disabled).
+    """
+    return _answer_cache.stats() if _answer_cache is not None else {}
 
 
+@traced("question.rag", root=True)
 def answer_question_with_rag(
     question: str,
     index_name: str = "default_index",
     top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+    use_cache: bool = True,
 ) -> str:
     """
     RAG pipeline:
     - Retrieve top_k relevant chunks from the vector store
+      (optionally restricted by metadata filters, e.g. {"source": ["paper.pdf"]};
+      search_mode is "dense", "lexical" or "hybrid")
     - Pass them with the question to the local LLM
     - Return the generated answer
+
+    With ANSWER_CACHE_ENABLED, a previous answer to a near-identical question
+    (same numbers and identifiers) on the same, unchanged index is returned
+    directly from the semantic answer cache.
+    use_cache=False bypasses both the answer cache and the LLM completion cache.
+
+    Every call is traced (root span "question.rag", see core.tracing).
     """
-    store = LocalVectorStore(index_name=index_name)
+    annotate(index=index_name, top_k=top_k, search_mode=search_mode)
+    cached, cache_context = _lookup_answer("rag", question, index_name, top_k, filters, search_mode, use_cache)
+    if cached is not None:
+        return cached
 
-    results = store.similarity_search(question, top_k=top_k)
+    store = get_vector_store(index_name)
+
+    results = store.similarity_search(question, top_k=top_k, filters=filters, mode=search_mode)
     if not results:
-        return "I could not find any relevant information in the current index."
-
-    # Build context from retrieved chunks
-    context_blocks = []
-    for r in results:
-        source = r["metadata"].get("source", "unknown")
-        chunk_id = r["metadata"].get("chunk_id", -1)
-        context_blocks.append(
-            f"[Source: {source}, Chunk: {chunk_id}]\n{r['text']}"
-        )
+        return NO_RESULTS_ANSWER
 
-    context_text = "\n\n---\n\n".join(context_blocks)
+    system_prompt, user_prompt, _ = _build_rag_prompts(question, results)
+    answer = generate_text(system_prompt, user_prompt, temperature=0.2, max_tokens=600, use_cache=use_cache)
+    _remember_answer(cache_context, answer)
+    return answer
 
-    system_prompt = (
-        "You are a research assistant. Use ONLY the provided context from papers. "
-        "If something is not supported by the context, say you are not sure. "
-        "Cite the sources and chunk IDs when you answer."
-    )
 
-    user_prompt = (
-        f"Question:\n{question}\n\n"
-        f"Context from papers:\n{context_text}\n\n"
-        "Now provide a clear, concise answer based only on this context."
+@traced("question.rag", root=True)
+async def aanswer_question_with_rag(
+    question: str,
+    index_name: str = "default_index",
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+    use_cache: bool = True,
+) -> str:
+    """
+    Async version of answer_question_with_rag, for serving many questions
+    from one event loop. Retrieval runs in a worker thread; the LLM call is
+    awaited and bounded by LLM_MAX_CONCURRENCY.
+    """
+    annotate(index=index_name, top_k=top_k, search_mode=search_mode)
+    cached, cache_context = await asyncio.to_thread(
+        _lookup_answer, "rag", question, index_name, top_k, filters, search_mode, use_cache
     )
+    if cached is not None:
+        return cached
 
-    answer = generate_text(system_prompt, user_prompt, temperature=0.2, max_tokens=600)
+    results = await asyncio.to_thread(search_context, question, index_name, top_k, filters, search_mode)
+    if not results:
+        return NO_RESULTS_ANSWER
+
+    system_prompt, user_prompt, _ = _build_rag_prompts(question, results)
+    answer = await agenerate_text(
+        system_prompt, user_prompt, temperature=0.2, max_tokens=600, use_cache=use_cache
+    )
+    _remember_answer(cache_context, answer)
     return answer
+
+
+@traced("question.rag", root=True)
+def stream_answer_with_rag(
+    question: str,
+    index_name: str = "default_index",
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+) -> Iterator[str]:
+    """
+    Same pipeline as answer_question_with_rag, but the answer is yielded as the
+    LLM generates it. `stats` receives the generation timings (see stream_text)
+    and the id of the question's trace under "trace_id".
+    """
+    annotate(index=index_name, top_k=top_k, search_mode=search_mode)
+    if stats is not None:
+        stats["trace_id"] = current_trace_id()
+    cached, cache_context = _lookup_answer("rag", question, index_name, top_k, filters, search_mode, use_cache)
+    if cached is not None:
+        if stats is not None:
+            stats["cached"] = True
+        yield cached
+        return
+
+    store = get_vector_store(index_name)
+
+    results = store.similarity_search(question, top_k=top_k, filters=filters, mode=search_mode)
+    if not results:
+        yield NO_RESULTS_ANSWER
+        return
+
+    system_prompt, user_prompt, context_report = _build_rag_prompts(question, results)
+    if stats is not None:
+        stats["context"] = context_report
+    pieces = []
+    for piece in stream_text(
+        system_prompt, user_prompt, temperature=0.2, max_tokens=600, stats=stats, use_cache=use_cache
+    ):
+        pieces.append(piece)
+        yield piece
+    _remember_answer(cache_context, "".join(pieces))
+
+
+def _build_rag_prompts(question: str, results: List[Dict]) -> Tuple[str, str, Dict]:
+    # Merged, token-budgeted context from retrieved chunks (see build_context),
+    # with the same prompt prefix as the agents (see core.prompts)
+    context_message, context_report = build_context_message(question, results)
+    return SHARED_SYSTEM_PROMPT, stage_prompt(context_message, RAG_INSTRUCTIONS), context_report
+
+
+def _multi_agent_result(
+    question: str,
+    searcher_summary: str,
+    critic_feedback: str,
+    final_answer: str,
+    pipeline: str,
+    skipped: List[str],
+    timings: Dict,
+    t0: float,
+    generation: Dict[str, Dict],
+) -> Dict:
+    timings["total"] = time.perf_counter() - t0
+    timings = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+    print(f"[PIPELINE] {pipeline}: {timings}" + (f", skipped {skipped}" if skipped else ""))
+    prompt_tokens = {stage: s["prompt_tokens"] for stage, s in generation.items() if "prompt_tokens" in s}
+    if prompt_tokens:
+        print(f"[PIPELINE] prompt tokens evaluated: {prompt_tokens}")
+    return {
+        "question": question,
+        "searcher_summary": searcher_summary,
+        "critic_feedback": critic_feedback,
+        "final_answer": final_answer,
+        "pipeline": pipeline,
+        "skipped": skipped,
+        "timings": timings,
+        "generation": generation,
+        "cached": False,
+        "trace_id": current_trace_id(),
+    }
+
+
+def _cached_multi_agent_result(cached: Dict, question: str, t0: float) -> Dict:
+    """
+    A multi-agent answer served by the semantic answer cache: the stored texts,
+    with this call's cost (the cache lookup) instead of the stage timings and
+    generation stats of the run that produced them.
+    """
+    seconds = round(time.perf_counter() - t0, 3)
+    return dict(
+        cached,
+        question=question,
+        skipped=[],
+        timings={"answer_cache": seconds, "total": seconds},
+        generation={},
+        cached=True,
+        trace_id=current_trace_id(),
+    )
+
+
+class _MultiAgentRun:
+    """
+    Stage policy of the multi-agent pipelines, shared by multi_agent_answer,
+    amulti_agent_answer and stream_multi_agent_answer (which only differ in
+    how they call the agents).
+
+    steps() yields (stage, note) in order. With note None the caller runs the
+    stage's agent (stats in generation[stage]) and reports its text with
+    done(); otherwise note is the stage's text (skipped, or no context).
+    timings: "retrieval", each stage that ran, and "total" (see result()).
+    """
+
+    def __init__(
+        self,
+        question: str,
+        retrieved: List[Dict],
+        pipeline: str,
+        search_mode: str,
+        t0: float,
+        generation: Dict[str, Dict],
+    ):
+        self.question = question
+        self.retrieved = retrieved
+        self.pipeline = pipeline
+        self.search_mode = search_mode
+        self.t0 = t0
+        self.generation = generation
+        self.context_message: Optional[str] = None
+        self.texts = {"searcher": "", "critic": "", "writer": ""}
+        self.skipped: List[str] = []
+        self.timings: Dict[str, float] = {"retrieval": time.perf_counter() - t0}
+        self._stage_t0 = 0.0
+
+    def _run(self, stage: str) -> Tuple[str, None]:
+        self.generation[stage] = {}
+        self._stage_t0 = time.perf_counter()
+        return stage, None
+
+    def _note(self, stage: str, text: str) -> Tuple[str, str]:
+        self.texts[stage] = text
+        return stage, text
+
+    def steps(self) -> Iterator[Tuple[str, Optional[str]]]:
+        if self.pipeline == "fused":
+            if self.retrieved:
+                yield self._run("fused")
+            else:
+                yield self._note("searcher", NO_CONTEXT_SUMMARY)
+                yield self._note("writer", NO_RESULTS_ANSWER)
+            return
+
+        # 1) Searcher; its prompt prefix (question + context) is reused by the critic and writer
+        if self.retrieved:
+            stage = self._run("searcher")
+            self.context_message, self.generation["searcher"]["context"] = build_context_message(
+                self.question, self.retrieved
+            )
+            yield stage
+        else:
+            yield self._note("searcher", NO_CONTEXT_SUMMARY)
+
+        # 2) Critic
+        adaptive = self.pipeline == "adaptive"
+        reason = critic_skip_reason(self.retrieved, self.texts["searcher"], self.search_mode) if adaptive else None
+        if reason:
+            self.skipped.append("critic")
+            yield self._note("critic", f"(Critic skipped: {reason})")
+        else:
+            yield self._run("critic")
+
+        # 3) Writer
+        reason = (
+            writer_skip_reason(self.retrieved, None if self.skipped else self.texts["critic"])
+            if adaptive else None
+        )
+        if reason:
+            self.skipped.append("writer")
+            yield self._note("writer", self.texts["searcher"])
+        else:
+            yield self._run("writer")
+
+    def done(self, stage: str, text: str) -> None:
+        self.timings[stage] = time.perf_counter() - self._stage_t0
+        if stage != "fused":
+            self.texts[stage] = text
+
+    def done_fused(self, summary: str, critique: str, final_answer: str) -> None:
+        self.done("fused", "")
+        self.texts.update(searcher=summary, critic=critique, writer=final_answer)
+
+    def result(self) -> Dict:
+        generation = {
+            stage: self.generation[stage]
+            for stage in ("searcher", "critic", "writer", "fused") if stage in self.generation
+        }
+        return _multi_agent_result(
+            self.question, self.texts["searcher"], self.texts["critic"], self.texts["writer"],
+            self.pipeline, self.skipped, self.timings, self.t0, generation,
+        )
+
+
+@traced("question.multi_agent", root=True)
 def multi_agent_answer(
     question: str,
     index_name: str = "default_index",
     top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+    use_cache: bool = True,
+    pipeline: str = MULTI_AGENT_PIPELINE,
 ) -> dict:
     """
     Multi-agent pipeline:
@@ -95,39 +541,204 @@ def multi_agent_answer(
     2) CRITIC agent analyses the summary.
     3) WRITER agent generates final structured answer.
 
+    pipeline:
+    - "full" (default): always runs the three agents.
+    - "adaptive": skips the critic when retrieval is confident and the summary
+      short, and skips the writer when the critic finds the summary sufficient
+      (the summary is then the final answer). See core.pipeline_policy.
+    - "fused": one generation produces summary, critique and final answer.
+
     Returns a dict with:
     {
         "question": str,
         "searcher_summary": str,
         "critic_feedback": str,
         "final_answer": str,
+        "pipeline": str,
+        "skipped": List[str],      # stages not run
+        "timings": Dict[str, float],  # seconds for retrieval, per stage + "total"
+        "generation": Dict[str, Dict],  # generation stats per LLM stage (see stream_text)
+        "cached": bool,           # served by the answer cache: timings only cover the lookup
+        "trace_id": str | None,   # per-stage trace (see core.tracing)
     }
+
+    The agents share one prompt prefix (system prompt, question and context),
+    so the LLM server only evaluates the stage-specific rest of the critic and
+    writer prompts; "prompt_tokens" / "prompt_eval_s" in "generation" show it.
+
+    With ANSWER_CACHE_ENABLED, near-identical questions on the same, unchanged
+    index are answered from the semantic answer cache (see answer_question_with_rag).
     """
-    # 1) Searcher
-    searcher_output = run_searcher_agent(
-        question=question,
-        index_name=index_name,
-        top_k=top_k,
+    check_pipeline(pipeline)
+    t0 = time.perf_counter()
+    annotate(index=index_name, pipeline=pipeline, top_k=top_k, search_mode=search_mode)
+    cached, cache_context = _lookup_answer(
+        f"multi:{pipeline}", question, index_name, top_k, filters, search_mode, use_cache
     )
-    searcher_summary = searcher_output["summary"]
+    if cached is not None:
+        return _cached_multi_agent_result(cached, question, t0)
 
-    # 2) Critic
-    critic_feedback = run_critic_agent(
-        question=question,
-        searcher_summary=searcher_summary,
+    retrieved = search_context(question, index_name, top_k, filters, search_mode)
+    run = _MultiAgentRun(question, retrieved, pipeline, search_mode, t0, {})
+    for stage, note in run.steps():
+        if note is not None:
+            continue
+        stats = run.generation[stage]
+        if stage == "fused":
+            fused = run_fused_agent(question, retrieved, use_cache=use_cache, stats=stats)
+            run.done_fused(fused["summary"], fused["critique"], fused["final_answer"])
+        elif stage == "searcher":
+            run.done(stage, run_searcher_agent(
+                question=question, retrieved=retrieved, context_message=run.context_message,
+                use_cache=use_cache, stats=stats,
+            )["summary"])
+        elif stage == "critic":
+            run.done(stage, run_critic_agent(
+                question=question, searcher_summary=run.texts["searcher"],
+                context_message=run.context_message, use_cache=use_cache, stats=stats,
+            ))
+        else:
+            run.done(stage, run_writer_agent(
+                question=question, searcher_summary=run.texts["searcher"], critic_feedback=run.texts["critic"],
+                context_message=run.context_message, use_cache=use_cache, stats=stats,
+            ))
+
+    result = run.result()
+    _remember_answer(cache_context, result)
+    return result
+
+
+@traced("question.multi_agent", root=True)
+async def amulti_agent_answer(
+    question: str,
+    index_name: str = "default_index",
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+    use_cache: bool = True,
+    pipeline: str = MULTI_AGENT_PIPELINE,
+) -> dict:
+    """
+    Async version of multi_agent_answer. The agents still run one after
+    the other for a question, but other questions proceed while one waits on
+    the LLM.
+    """
+    check_pipeline(pipeline)
+    t0 = time.perf_counter()
+    annotate(index=index_name, pipeline=pipeline, top_k=top_k, search_mode=search_mode)
+    cached, cache_context = await asyncio.to_thread(
+        _lookup_answer, f"multi:{pipeline}", question, index_name, top_k, filters, search_mode, use_cache
     )
+    if cached is not None:
+        return _cached_multi_agent_result(cached, question, t0)
 
-    # 3) Writer
-    final_answer = run_writer_agent(
-        question=question,
-        searcher_summary=searcher_summary,
-        critic_feedback=critic_feedback,
+    retrieved = await asyncio.to_thread(search_context, question, index_name, top_k, filters, search_mode)
+    run = _MultiAgentRun(question, retrieved, pipeline, search_mode, t0, {})
+    for stage, note in run.steps():
+        if note is not None:
+            continue
+        stats = run.generation[stage]
+        if stage == "fused":
+            fused = await arun_fused_agent(question, retrieved, use_cache=use_cache, stats=stats)
+            run.done_fused(fused["summary"], fused["critique"], fused["final_answer"])
+        elif stage == "searcher":
+            run.done(stage, (await arun_searcher_agent(
+                question=question, retrieved=retrieved, context_message=run.context_message,
+                use_cache=use_cache, stats=stats,
+            ))["summary"])
+        elif stage == "critic":
+            run.done(stage, await arun_critic_agent(
+                question=question, searcher_summary=run.texts["searcher"],
+                context_message=run.context_message, use_cache=use_cache, stats=stats,
+            ))
+        else:
+            run.done(stage, await arun_writer_agent(
+                question=question, searcher_summary=run.texts["searcher"], critic_feedback=run.texts["critic"],
+                context_message=run.context_message, use_cache=use_cache, stats=stats,
+            ))
+
+    result = run.result()
+    _remember_answer(cache_context, result)
+    return result
+
+
+@traced("question.multi_agent", root=True)
+def stream_multi_agent_answer(
+    question: str,
+    index_name: str = "default_index",
+    top_k: int = 5,
+    filters: Optional[Dict] = None,
+    search_mode: str = SEARCH_MODE,
+    stats: Optional[Dict] = None,
+    use_cache: bool = True,
+    pipeline: str = MULTI_AGENT_PIPELINE,
+) -> Iterator[Tuple[str, str]]:
+    """
+    Streaming version of multi_agent_answer.
+    Yields (stage, text_piece) pairs as the agents generate, with stage in
+    "searcher", "critic", "writer" (in that order). A skipped critic yields a
+    note with the reason; a skipped writer yields the searcher summary as the
+    final answer.
+    `stats` receives the generation timings of each stage, keyed by stage name,
+    and {"pipeline", "skipped", "timings"} under "pipeline", and the id of the
+    question's trace under "trace_id".
+    """
+    check_pipeline(pipeline)
+    t0 = time.perf_counter()
+    stats = stats if stats is not None else {}
+    stats["trace_id"] = current_trace_id()
+    annotate(index=index_name, pipeline=pipeline, top_k=top_k, search_mode=search_mode)
+
+    cached, cache_context = _lookup_answer(
+        f"multi:{pipeline}", question, index_name, top_k, filters, search_mode, use_cache
     )
+    if cached is not None:
+        result = _cached_multi_agent_result(cached, question, t0)
+        stats["pipeline"] = {key: result[key] for key in ("pipeline", "skipped", "timings")}
+        for stage, key in (("searcher", "searcher_summary"), ("critic", "critic_feedback"), ("writer", "final_answer")):
+            stats[stage] = {"cached": True}
+            yield stage, cached[key]
+        return
 
-    return {
-        "question": question,
-        "searcher_summary": searcher_summary,
-        "critic_feedback": critic_feedback,
-        "final_answer": final_answer,
-    }
+    retrieved = search_context(question, index_name, top_k, filters, search_mode)
+    run = _MultiAgentRun(question, retrieved, pipeline, search_mode, t0, stats)
+    for stage, note in run.steps():
+        if note is not None:
+            yield stage, note
+            continue
+        if stage == "fused":
+            texts = {"searcher": "", "critic": "", "writer": ""}
+            for section, piece in stream_fused_agent(question, retrieved, stats=stats[stage], use_cache=use_cache):
+                texts[section] += piece
+                yield section, piece
+            if not texts["writer"].strip():
+                # No FINAL ANSWER heading: same fallback as run_fused_agent
+                texts["writer"] = fused_final_answer(texts)
+                yield "writer", texts["writer"]
+            run.done_fused(texts["searcher"], texts["critic"], texts["writer"])
+            continue
+
+        if stage == "searcher":
+            pieces = stream_searcher_agent(
+                question, retrieved, stats=stats[stage], use_cache=use_cache,
+                context_message=run.context_message,
+            )
+        elif stage == "critic":
+            pieces = stream_critic_agent(
+                question, run.texts["searcher"], stats=stats[stage], use_cache=use_cache,
+                context_message=run.context_message,
+            )
+        else:
+            pieces = stream_writer_agent(
+                question, run.texts["searcher"], run.texts["critic"], stats=stats[stage], use_cache=use_cache,
+                context_message=run.context_message,
+            )
+        text = ""
+        for piece in pieces:
+            text += piece
+            yield stage, piece
+        run.done(stage, text)
 
+    result = run.result()
+    stats["pipeline"] = {key: result[key] for key in ("pipeline", "skipped", "timings")}
+    _remember_answer(cache_context, result)
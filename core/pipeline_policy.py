@@ -0,0 +1,45 @@
+from typing import Dict, List, Optional
+
+from agents.critic import critic_verdict
+from config import ADAPTIVE_MIN_SCORE, ADAPTIVE_MAX_SUMMARY_WORDS
+
+PIPELINES = ("full", "adaptive", "fused")
+
+
+def check_pipeline(pipeline: str) -> None:
+    """
+    Raise ValueError for a pipeline name not in PIPELINES (e.g. a mistyped
+    MULTI_AGENT_PIPELINE), rather than running another pipeline.
+    """
+    if pipeline not in PIPELINES:
+        raise ValueError(f"Unknown multi-agent pipeline: {pipeline!r} (expected one of {', '.join(PIPELINES)})")
+
+
+def critic_skip_reason(retrieved: List[Dict], summary: str, search_mode: str) -> Optional[str]:
+    """
+    Adaptive pipeline: why the critic stage can be skipped, or None to run it.
+    Only dense (cosine) scores are comparable to ADAPTIVE_MIN_SCORE; BM25 and
+    fused rank scores never skip on confidence.
+    """
+    if not retrieved:
+        return "no context retrieved"
+    if search_mode != "dense":
+        return None
+
+    top_score = max(r["score"] for r in retrieved)
+    n_words = len(summary.split())
+    if top_score >= ADAPTIVE_MIN_SCORE and n_words <= ADAPTIVE_MAX_SUMMARY_WORDS:
+        return f"top retrieval score {top_score:.2f}, {n_words}-word summary"
+    return None
+
+
+def writer_skip_reason(retrieved: List[Dict], critic_feedback: Optional[str]) -> Optional[str]:
+    """
+    Adaptive pipeline: why the writer stage can be skipped (the searcher
+    summary becomes the final answer), or None to run it.
+    """
+    if not retrieved:
+        return "no context retrieved"
+    if critic_feedback is not None and critic_verdict(critic_feedback) == "sufficient":
+        return "critic found the summary sufficient"
+    return None
@@ -0,0 +1,413 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import TRACING_ENABLED, TRACE_BUFFER_SIZE, TRACE_EXPORT_PATH, METRICS_EXPORT_PATH
+
+# Lightweight in-process tracing:
+# - span(name) times a block. Spans opened while another span is active (in
+#   the same thread / task, or a thread started with asyncio.to_thread) become
+#   its children; a span opened with root=True and no active span starts a
+#   trace (one question, one index build).
+# - Finished traces are kept in a ring buffer (get_trace, export_traces) and
+#   optionally appended to TRACE_EXPORT_PATH as JSON lines.
+# - Every span, traced or not, feeds the autoresearcher_span_seconds
+#   histogram; the LLM token / time counters come from core.models.
+#   prometheus_text() renders them in the Prometheus text format.
+
+# Histogram buckets (seconds) of span durations
+SPAN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+COUNTERS = {
+    "autoresearcher_llm_calls_total": "LLM generations, by whether the completion cache answered.",
+    "autoresearcher_llm_tokens_total": "LLM tokens, by kind (prompt = prompt tokens evaluated, generated).",
+    "autoresearcher_llm_seconds_total": "Time reported by Ollama, by phase (load, prompt_eval, eval).",
+}
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "attrs", "start", "seconds", "children", "_t0")
+
+    def __init__(self, name: str, trace_id: Optional[str], attrs: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.start = time.time()
+        self.seconds: Optional[float] = None
+        self.children: List["Span"] = []
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "start": round(self.start, 6),
+            "seconds": round(self.seconds, 6) if self.seconds is not None else None,
+            "attrs": self.attrs,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _NoopSpan:
+    trace_id = None
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current: ContextVar[Optional[Span]] = ContextVar("autoresearcher_span", default=None)
+
+_lock = threading.Lock()
+_traces: "deque[Dict]" = deque(maxlen=TRACE_BUFFER_SIZE)
+# span name -> [count per bucket..., +Inf count, sum]
+_histograms: Dict[str, List[float]] = {}
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+
+# ---------- Spans ----------
+
+def _open_span(name: str, root: bool, attrs: Dict[str, Any]) -> Tuple[Span, Optional[Span]]:
+    parent = _current.get()
+    if parent is not None:
+        trace_id = parent.trace_id
+    else:
+        trace_id = uuid.uuid4().hex[:16] if root else None
+    s = Span(name, trace_id, attrs)
+    if parent is not None:
+        parent.children.append(s)
+    return s, parent
+
+
+def _close_span(s: Span, parent: Optional[Span]) -> None:
+    s.seconds = time.perf_counter() - s._t0
+    _observe(s.name, s.seconds)
+    if parent is None and s.trace_id is not None:
+        _finish_trace(s)
+
+
+@contextmanager
+def span(name: str, root: bool = False, **attrs) -> Iterator[Span]:
+    """
+    Time the enclosed block as a span named `name`; yields the span (use
+    .set(...) to add attributes). Exceptions are recorded as attrs["error"].
+    Outside a trace (no active span and root=False) only the metrics are updated.
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP_SPAN
+        return
+
+    s, parent = _open_span(name, root, attrs)
+    # Restored by value, not with a reset token: a generator holding this span
+    # may be closed from another context
+    _current.set(s)
+    try:
+        yield s
+    except Exception as e:
+        s.attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.set(parent)
+        _close_span(s, parent)
+
+
+def _traced_generator(name: str, root: bool, generator: Iterator) -> Iterator:
+    """
+    Run `generator` in span(name), with the span current only while the
+    generator runs: between items, the consumer (and whatever it traces)
+    stays in its own context.
+    """
+    s, parent = _open_span(name, root, {})
+    try:
+        while True:
+            outer = _current.get()
+            _current.set(s)
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                _current.set(outer)
+            yield item
+    except Exception as e:
+        s.attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        # Closing runs the generator's cleanup, which belongs to the span too
+        outer = _current.get()
+        _current.set(s)
+        try:
+            generator.close()
+        finally:
+            _current.set(outer)
+        _close_span(s, parent)
+
+
+def traced(name: str, root: bool = False) -> Callable:
+    """
+    Decorator: run every call of the function in span(name). Works for plain,
+    generator (the span covers the whole iteration, but is only current while
+    the generator runs) and async functions.
+    """
+    def decorate(fn: Callable) -> Callable:
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                if not TRACING_ENABLED:
+                    yield from fn(*args, **kwargs)
+                    return
+                yield from _traced_generator(name, root, fn(*args, **kwargs))
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, root=root):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, root=root):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def traced_iter(name: str, items: Iterable) -> Iterator:
+    """
+    Iterate over items, timing each step of the underlying iterator as a span
+    (e.g. the PDF parsing and chunking behind a lazy chunk stream).
+    """
+    iterator = iter(items)
+    while True:
+        with span(name) as s:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                s.set(exhausted=True)
+                return
+        yield item
+
+
+def record_span(name: str, t0: float, t1: float, **attrs) -> None:
+    """
+    Record an already finished span (t0 / t1 from time.perf_counter()) under
+    the active span, e.g. an LLM generation timed by the caller.
+    """
+    if not TRACING_ENABLED:
+        return
+    seconds = max(0.0, t1 - t0)
+    parent = _current.get()
+    if parent is not None:
+        s = Span(name, parent.trace_id, attrs)
+        s.start = time.time() - (time.perf_counter() - t0)
+        s.seconds = seconds
+        parent.children.append(s)
+    _observe(name, seconds)
+
+
+def annotate(**attrs) -> None:
+    """
+    Add attributes to the active span (no-op outside a span).
+    """
+    s = _current.get()
+    if s is not None:
+        s.set(**attrs)
+
+
+def current_trace_id() -> Optional[str]:
+    s = _current.get()
+    return s.trace_id if s is not None else None
+
+
+# ---------- Traces ----------
+
+def _finish_trace(root: Span) -> None:
+    trace = dict(root.to_dict(), trace_id=root.trace_id)
+    with _lock:
+        _traces.append(trace)
+    if TRACE_EXPORT_PATH:
+        export_traces(TRACE_EXPORT_PATH, [trace], append=True)
+    if METRICS_EXPORT_PATH:
+        write_metrics(METRICS_EXPORT_PATH)
+
+
+def get_trace(trace_id: str) -> Optional[Dict]:
+    """
+    A finished trace from the ring buffer (None if unknown or evicted):
+    {"trace_id", "name", "start", "seconds", "attrs", "children": [...]}
+    """
+    with _lock:
+        for trace in reversed(_traces):
+            if trace["trace_id"] == trace_id:
+                return trace
+    return None
+
+
+def recent_traces(limit: Optional[int] = None) -> List[Dict]:
+    """
+    Finished traces, most recent first.
+    """
+    with _lock:
+        traces = list(reversed(_traces))
+    return traces[:limit] if limit is not None else traces
+
+
+def export_traces(path: str, traces: Optional[List[Dict]] = None, append: bool = False) -> int:
+    """
+    Write traces (default: the whole ring buffer) as JSON lines.
+    Returns the number of traces written.
+    """
+    traces = recent_traces()[::-1] if traces is None else traces
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _lock, open(path, "a" if append else "w", encoding="utf-8") as f:
+        for trace in traces:
+            f.write(json.dumps(trace, default=str) + "\n")
+    return len(traces)
+
+
+def stage_breakdown(trace: Dict) -> List[Dict]:
+    """
+    Flatten a trace into one row per span, depth first:
+    {"stage": str (indented by depth), "start_ms": float (from the trace start),
+     "ms": float, "share": float (of the trace duration), "details": str}
+    """
+    total = trace["seconds"] or 0.0
+    rows: List[Dict] = []
+
+    def visit(node: Dict, depth: int) -> None:
+        seconds = node["seconds"] or 0.0
+        rows.append({
+            "stage": "  " * depth + node["name"],
+            "start_ms": round((node["start"] - trace["start"]) * 1000, 1),
+            "ms": round(seconds * 1000, 1),
+            "share": round(seconds / total, 3) if total > 0 else 0.0,
+            "details": ", ".join(f"{k}={v}" for k, v in node["attrs"].items()),
+        })
+        for child in node["children"]:
+            visit(child, depth + 1)
+
+    visit(trace, 0)
+    return rows
+
+
+def stage_totals(trace: Dict) -> List[Dict]:
+    """
+    Aggregate a trace by span name, slowest first:
+    {"stage": str, "calls": int, "ms": float, "share": float}
+    Durations are inclusive (a span's time includes its children's).
+    """
+    total = trace["seconds"] or 0.0
+    totals: Dict[str, List[float]] = {}
+
+    def visit(node: Dict) -> None:
+        entry = totals.setdefault(node["name"], [0, 0.0])
+        entry[0] += 1
+        entry[1] += node["seconds"] or 0.0
+        for child in node["children"]:
+            visit(child)
+
+    visit(trace)
+    rows = [
+        {
+            "stage": name,
+            "calls": int(calls),
+            "ms": round(seconds * 1000, 1),
+            "share": round(seconds / total, 3) if total > 0 else 0.0,
+        }
+        for name, (calls, seconds) in totals.items()
+    ]
+    return sorted(rows, key=lambda row: row["ms"], reverse=True)
+
+
+# ---------- Metrics ----------
+
+def _observe(name: str, seconds: float) -> None:
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = [0.0] * (len(SPAN_BUCKETS) + 2)
+        for i, bound in enumerate(SPAN_BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+
+
+def count(metric: str, value: float = 1.0, **labels) -> None:
+    """
+    Increment a counter (one of COUNTERS) for the given label values.
+    """
+    if not TRACING_ENABLED or not value:
+        return
+    key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    escaped = (
+        f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(round(value, 6))
+
+
+def prometheus_text() -> str:
+    """
+    The span histogram and LLM counters in the Prometheus text exposition format.
+    """
+    with _lock:
+        histograms = {name: list(values) for name, values in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP autoresearcher_span_seconds Duration of traced stages.",
+        "# TYPE autoresearcher_span_seconds histogram",
+    ]
+    for name in sorted(histograms):
+        values = histograms[name]
+        for bound, n in zip(SPAN_BUCKETS, values):
+            lines.append(
+                f"autoresearcher_span_seconds_bucket{_labels([('span', name), ('le', str(bound))])} {_number(n)}"
+            )
+        lines.append(f"autoresearcher_span_seconds_bucket{_labels([('span', name), ('le', '+Inf')])} {_number(values[-2])}")
+        lines.append(f"autoresearcher_span_seconds_sum{_labels([('span', name)])} {_number(values[-1])}")
+        lines.append(f"autoresearcher_span_seconds_count{_labels([('span', name)])} {_number(values[-2])}")
+
+    for metric, help_text in COUNTERS.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str) -> None:
+    """
+    Atomically (re)write prometheus_text() to path, e.g. for the node_exporter
+    textfile collector.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
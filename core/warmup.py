@@ -0,0 +1,91 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from core.models import get_embedding_model, get_ollama_client
+from core.prompts import SHARED_SYSTEM_PROMPT
+from config import OLLAMA_MODEL_NAME, OLLAMA_KEEP_ALIVE
+
+COMPONENTS = ("embedding", "llm")
+
+_status: Dict[str, Dict] = {name: {"state": "pending"} for name in COMPONENTS}
+_status_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def warm_up_embedding_model() -> None:
+    """
+    Load the SentenceTransformer and run one tiny encode (first-call kernel
+    setup / allocations), bypassing the embedding cache.
+    """
+    get_embedding_model().encode(["warm-up"], convert_to_numpy=True, show_progress_bar=False)
+
+
+def warm_up_llm() -> None:
+    """
+    Make Ollama load the model and keep it loaded for OLLAMA_KEEP_ALIVE, with a
+    one-token generation over the shared system prompt, so the first real
+    question also finds that prompt prefix already evaluated.
+    """
+    get_ollama_client().chat(
+        model=OLLAMA_MODEL_NAME,
+        messages=[
+            {"role": "system", "content": SHARED_SYSTEM_PROMPT},
+            {"role": "user", "content": "Reply with OK."},
+        ],
+        options={"num_predict": 1},
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+
+
+_WARM_UPS = {
+    "embedding": warm_up_embedding_model,
+    "llm": warm_up_llm,
+}
+
+
+def warm_up() -> Dict[str, Dict]:
+    """
+    Warm up every component in this thread. A failure (e.g. Ollama not
+    running) is recorded in the status and does not stop the others.
+    Returns get_warmup_status().
+    """
+    for name in COMPONENTS:
+        _set_status(name, state="loading")
+        t0 = time.perf_counter()
+        try:
+            _WARM_UPS[name]()
+        except Exception as e:
+            print(f"[WARMUP] {name} failed: {type(e).__name__}: {e}")
+            _set_status(name, state="failed", seconds=round(time.perf_counter() - t0, 2), error=str(e))
+        else:
+            _set_status(name, state="ready", seconds=round(time.perf_counter() - t0, 2))
+    print(f"[WARMUP] {get_warmup_status()}")
+    return get_warmup_status()
+
+
+def start_warmup() -> threading.Thread:
+    """
+    Run warm_up() once per process in a daemon thread; later calls return the
+    same thread (safe to call on every Streamlit rerun).
+    """
+    global _thread
+    with _status_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def _set_status(name: str, **status) -> None:
+    with _status_lock:
+        _status[name] = status
+
+
+def get_warmup_status() -> Dict[str, Dict]:
+    """
+    {component: {"state": "pending" | "loading" | "ready" | "failed",
+                 "seconds": float, "error": str}} for "embedding" and "llm".
+    """
+    with _status_lock:
+        return {name: dict(status) for name, status in _status.items()}
@@ -1,13 +1,42 @@
-import time
+import argparse
 import csv
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
-from core.orchestrator import answer_question_with_rag, multi_agent_answer
-from retrieval.vector_store import LocalVectorStore
+from config import ANSWER_CACHE_ENABLED, LLM_CACHE_ENABLED
+from core.context_builder import get_context_stats
+from core.models import get_completion_cache_stats, get_embedding_cache_stats
+from core.orchestrator import answer_question_with_rag, multi_agent_answer, get_answer_cache_stats
+from core.pipeline_policy import PIPELINES
+from core.tracing import export_traces, write_metrics
+from retrieval.store_registry import get_vector_store, get_store_registry
 
 INDEX_NAME = "edge_ai_paper"   # Or your active index
-MODE = "multi"                # "simple" or "multi"
+MODE = "multi"                # "simple", "multi" or "retrieval"
 OUTPUT_FILE = "evaluation_results.csv"
+# Throughput / latency per concurrency level (CSV), and everything as JSON
+CURVE_FILE = "evaluation_curve.csv"
+JSON_FILE = "evaluation_results.json"
+# Per-stage traces (JSON lines) and Prometheus-style metrics of the run (see core.tracing)
+TRACES_FILE = "evaluation_traces.jsonl"
+METRICS_FILE = "evaluation_metrics.prom"
+TOP_K = 5
+RETRIEVAL_REPEATS = 50        # "retrieval" mode runs QUESTIONS this many times
+# "cold": every answer is generated (completion cache bypassed)
+# "warm": answers are generated once untimed, then timed from the semantic answer
+#         cache / completion cache (ANSWER_CACHE_ENABLED / LLM_CACHE_ENABLED)
+LLM_CACHE_MODE = "cold"
+# Multi-agent pipeline, one of core.pipeline_policy.PIPELINES (see multi_agent_answer)
+PIPELINE = "full"
+# Questions answered at once by the worker pool; one run per level
+# (e.g. [1, 2, 4, 8] for a throughput / latency curve)
+CONCURRENCY_LEVELS = [1]
+STAGES = ["searcher", "critic", "writer", "fused"]
 
 
 QUESTIONS = [
@@ -22,38 +51,292 @@ QUESTIONS = [
 ]
 
 
-def run_eval():
-    rows = []
+def load_questions(path: str) -> List[str]:
+    """
+    Questions from a file: a JSON list (of strings, or of objects with a
+    "question" key), or plain text with one question per line (blank lines
+    and lines starting with "#" are ignored).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            items = json.load(f)
+            return [item["question"] if isinstance(item, dict) else item for item in items]
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
 
-    for q in QUESTIONS:
-        start = time.time()
+def run_retrieval_eval(questions: List[str] = QUESTIONS):
+    """
+    Retrieval-only throughput (no LLM): one similarity_search per question
+    vs. one similarity_search_batch over all questions.
+    """
+    store = get_vector_store(INDEX_NAME)
+    queries = questions * RETRIEVAL_REPEATS
+    print(f"Index '{INDEX_NAME}': {len(store.texts)} chunks, {len(queries)} queries")
 
-        if MODE == "multi":
-            result = multi_agent_answer(q, index_name=INDEX_NAME)
-            answer = result["final_answer"]
-        else:
-            answer = answer_question_with_rag(q, index_name=INDEX_NAME)
+    rows = []
+    date = datetime.now().strftime("%Y-%m-%d")
 
-        total_time = round(time.time() - start, 2)
+    start = time.time()
+    for q in queries:
+        store.similarity_search(q, top_k=TOP_K)
+    single_time = time.time() - start
 
-        rows.append([
-            datetime.now().strftime("%Y-%m-%d"),
-            INDEX_NAME,
-            MODE,
-            q,
-            total_time,
-            len(answer)
-        ])
+    start = time.time()
+    store.similarity_search_batch(queries, top_k=TOP_K)
+    batch_time = time.time() - start
 
-        print("DONE:", q, "→", total_time, "sec")
+    for method, elapsed in (("single", single_time), ("batch", batch_time)):
+        qps = round(len(queries) / elapsed, 1) if elapsed > 0 else float("inf")
+        rows.append([date, INDEX_NAME, "retrieval", method, len(queries), round(elapsed, 3), qps])
+        print(f"{method}: {qps} queries/sec")
 
     with open(OUTPUT_FILE, mode="w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow(["Date", "Index", "Mode", "Question", "Latency(sec)", "AnswerLength"])
+        writer.writerow(["Date", "Index", "Mode", "Method", "Queries", "Total(sec)", "Queries/sec"])
         writer.writerows(rows)
 
     print("\nSaved to:", OUTPUT_FILE)
+    print("Embedding cache:", get_embedding_cache_stats())
+
+
+def answer_question(q: str, use_cache: bool) -> dict:
+    if MODE == "multi":
+        return multi_agent_answer(q, index_name=INDEX_NAME, use_cache=use_cache, pipeline=PIPELINE)
+    answer = answer_question_with_rag(q, index_name=INDEX_NAME, use_cache=use_cache)
+    return {"final_answer": answer}
+
+
+def timed_answer(q: str, use_cache: bool, submitted: float) -> Dict:
+    """
+    Answer one question in a pool worker.
+    queue_s: submission -> a worker picks the question up; service_s: the
+    answer itself. A failing question is recorded, not raised, so one timeout
+    does not abort a whole concurrency level.
+    """
+    started = time.perf_counter()
+    try:
+        result, error = answer_question(q, use_cache=use_cache), ""
+    except Exception as e:
+        result, error = {"final_answer": ""}, f"{type(e).__name__}: {e}"
+    finished = time.perf_counter()
+    return {
+        "question": q,
+        "result": result,
+        "error": error,
+        "queue_s": started - submitted,
+        "service_s": finished - started,
+        "latency_s": finished - submitted,
+    }
+
+
+def _percentiles(values: List[float]) -> Tuple[float, float, float]:
+    mean = float(np.mean(values))
+    p50, p95 = np.percentile(values, [50, 95])
+    return round(mean, 3), round(float(p50), 3), round(float(p95), 3)
+
+
+def run_level(questions: List[str], concurrency: int, use_cache: bool) -> Tuple[List[Dict], Dict]:
+    """
+    Submit all questions at once to a pool of `concurrency` workers (analysts
+    asking at the same time) and wait for every answer.
+
+    The pipelines run in the worker threads and call Ollama directly, so a
+    question waiting for one of the server's parallel slots (OLLAMA_NUM_PARALLEL)
+    counts as service time; queue_s only covers waiting for a worker.
+
+    Returns (one timed_answer() dict per question, in input order, and the summary:
+    {"concurrency", "questions", "errors", "seconds", "throughput_qpm",
+     "latency_{mean,p50,p95}_s", "queue_{mean,p50,p95}_s", "service_{mean,p50,p95}_s"})
+    """
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="eval") as pool:
+        futures = [pool.submit(timed_answer, q, use_cache, time.perf_counter()) for q in questions]
+        answers = [future.result() for future in futures]
+    elapsed = time.perf_counter() - t0
+
+    summary = {
+        "concurrency": concurrency,
+        "questions": len(answers),
+        "errors": sum(1 for a in answers if a["error"]),
+        "seconds": round(elapsed, 3),
+        # questions per minute: answers take seconds, so per-second rates are tiny
+        "throughput_qpm": round(len(answers) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+    }
+    for key in ("latency", "queue", "service"):
+        mean, p50, p95 = _percentiles([a[f"{key}_s"] for a in answers])
+        summary.update({f"{key}_mean_s": mean, f"{key}_p50_s": p50, f"{key}_p95_s": p95})
+    return answers, summary
+
+
+CURVE_COLUMNS = [
+    "concurrency", "questions", "errors", "seconds", "throughput_qpm",
+    "latency_mean_s", "latency_p50_s", "latency_p95_s",
+    "queue_mean_s", "queue_p50_s", "queue_p95_s",
+    "service_mean_s", "service_p50_s", "service_p95_s",
+]
+
+
+def run_eval(questions: List[str] = QUESTIONS, concurrency_levels: Optional[List[int]] = None):
+    if MODE == "retrieval":
+        run_retrieval_eval(questions)
+        return
+
+    concurrency_levels = concurrency_levels or CONCURRENCY_LEVELS
+    rows = []
+    records = []
+    curve = []
+
+    # Load the index once up front; every question reuses the shared store
+    store = get_vector_store(INDEX_NAME)
+    print(f"Index '{INDEX_NAME}': {len(store.texts)} chunks, {len(questions)} questions")
+
+    use_cache = LLM_CACHE_MODE == "warm"
+    if use_cache:
+        if not LLM_CACHE_ENABLED and not ANSWER_CACHE_ENABLED:
+            print("Note: LLM_CACHE_ENABLED and ANSWER_CACHE_ENABLED are off; nothing will be cached.")
+        elif not LLM_CACHE_ENABLED:
+            print("Note: LLM_CACHE_ENABLED is off; only the semantic answer cache is used.")
+        print("Warming the completion cache...")
+        for q in questions:
+            answer_question(q, use_cache=True)
+
+    for concurrency in concurrency_levels:
+        answers, summary = run_level(questions, concurrency, use_cache)
+        curve.append(summary)
+
+        for answer in answers:
+            result = answer["result"]
+            # Per-stage latency of the multi-agent pipeline ("" = stage not run)
+            timings = result.get("timings", {})
+            # Prompt tokens Ollama evaluated per stage; the shared prefix is only
+            # evaluated once, so critic / writer should stay far below the searcher
+            generation = result.get("generation", {})
+            prompt_eval = sum(g.get("prompt_eval_s", 0.0) for g in generation.values())
+            rows.append([
+                datetime.now().strftime("%Y-%m-%d"),
+                INDEX_NAME,
+                MODE,
+                PIPELINE if MODE == "multi" else "",
+                LLM_CACHE_MODE,
+                concurrency,
+                answer["question"],
+                round(answer["latency_s"], 2),
+                round(answer["queue_s"], 2),
+                round(answer["service_s"], 2),
+                *[timings.get(stage, "") for stage in STAGES],
+                *[generation.get(stage, {}).get("prompt_tokens", "") for stage in STAGES],
+                round(prompt_eval, 3),
+                "+".join(result.get("skipped", [])),
+                int(result.get("cached", False)),
+                len(result["final_answer"]),
+                result.get("trace_id") or "",
+                answer["error"],
+            ])
+            records.append({
+                "concurrency": concurrency,
+                "question": answer["question"],
+                "latency_s": round(answer["latency_s"], 3),
+                "queue_s": round(answer["queue_s"], 3),
+                "service_s": round(answer["service_s"], 3),
+                "timings": timings,
+                "generation": generation,
+                "skipped": result.get("skipped", []),
+                "cached": result.get("cached", False),
+                "answer_length": len(result["final_answer"]),
+                "trace_id": result.get("trace_id"),
+                "error": answer["error"],
+            })
+
+        print(
+            f"DONE: concurrency {concurrency} → {summary['throughput_qpm']} questions/min, "
+            f"latency p50 {summary['latency_p50_s']}s / p95 {summary['latency_p95_s']}s "
+            f"(queue {summary['queue_mean_s']}s + service {summary['service_mean_s']}s on average)"
+            + (f", {summary['errors']} errors" if summary["errors"] else "")
+        )
+
+    with open(OUTPUT_FILE, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ["Date", "Index", "Mode", "Pipeline", "LLMCache", "Concurrency", "Question",
+             "Latency(sec)", "Queue(sec)", "Service(sec)"]
+            + [f"{stage.capitalize()}(sec)" for stage in STAGES]
+            + [f"{stage.capitalize()}Prompt(tokens)" for stage in STAGES]
+            + ["PromptEval(sec)"]
+            + ["Skipped", "Cached", "AnswerLength", "TraceId", "Error"]
+        )
+        writer.writerows(rows)
+
+    with open(CURVE_FILE, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CURVE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(curve)
+
+    with open(JSON_FILE, mode="w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "meta": {
+                    "date": datetime.now().isoformat(timespec="seconds"),
+                    "index": INDEX_NAME,
+                    "mode": MODE,
+                    "pipeline": PIPELINE if MODE == "multi" else None,
+                    "llm_cache_mode": LLM_CACHE_MODE,
+                    "top_k": TOP_K,
+                },
+                "curve": curve,
+                "questions": records,
+            },
+            f,
+            indent=2,
+        )
+
+    print("\nConcurrency  Questions/min  Latency p50  Latency p95  Queue mean  Service mean")
+    for point in curve:
+        print(
+            f"{point['concurrency']:>11}  {point['throughput_qpm']:>13}  {point['latency_p50_s']:>11}"
+            f"  {point['latency_p95_s']:>11}  {point['queue_mean_s']:>10}  {point['service_mean_s']:>12}"
+        )
+    print("Saved to:", OUTPUT_FILE, CURVE_FILE, JSON_FILE)
+    print("Store cache:", get_store_registry().stats())
+    print("Embedding cache:", get_embedding_cache_stats())
+    print("Completion cache:", get_completion_cache_stats())
+    print("Answer cache:", get_answer_cache_stats())
+    print("Prompt context:", get_context_stats())
+    write_metrics(METRICS_FILE)
+    print(f"Traces: {export_traces(TRACES_FILE)} saved to {TRACES_FILE}; metrics saved to {METRICS_FILE}")
+
+
+def main():
+    global INDEX_NAME, MODE, PIPELINE, LLM_CACHE_MODE, OUTPUT_FILE, CURVE_FILE, JSON_FILE
+
+    parser = argparse.ArgumentParser(description="AutoResearcher evaluation (defaults: the constants above)")
+    parser.add_argument("--mode", choices=["simple", "multi", "retrieval"], default=MODE)
+    parser.add_argument("--index", default=INDEX_NAME)
+    parser.add_argument("--pipeline", choices=PIPELINES, default=PIPELINE)
+    parser.add_argument("--cache-mode", choices=["cold", "warm"], default=LLM_CACHE_MODE)
+    parser.add_argument(
+        "--concurrency",
+        default=",".join(str(c) for c in CONCURRENCY_LEVELS),
+        help="comma-separated concurrency levels, e.g. 1,2,4,8",
+    )
+    parser.add_argument("--questions", help="question file (.json list or one question per line)")
+    parser.add_argument("--repeat", type=int, default=1, help="ask the question set this many times per level")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="per-question CSV")
+    parser.add_argument("--curve", default=CURVE_FILE, help="per-concurrency-level CSV")
+    parser.add_argument("--json", default=JSON_FILE, help="curve and per-question results as JSON")
+    args = parser.parse_args()
+
+    INDEX_NAME, MODE, PIPELINE, LLM_CACHE_MODE = args.index, args.mode, args.pipeline, args.cache_mode
+    OUTPUT_FILE, CURVE_FILE, JSON_FILE = args.output, args.curve, args.json
+
+    questions = load_questions(args.questions) if args.questions else QUESTIONS
+    if not questions:
+        raise SystemExit(f"No questions in {args.questions}")
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    if not levels or min(levels) < 1:
+        raise SystemExit(f"Invalid concurrency levels: {args.concurrency}")
+    run_eval(questions * args.repeat, levels)
 
 
 if __name__ == "__main__":
-    run_eval()
+    main()
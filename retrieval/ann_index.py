@@ -0,0 +1,242 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+
+
+def normalize_rows(x: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row and cast to float32 (cosine similarity becomes a dot product).
+    """
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-10)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest scores, best first.
+    argpartition selects them in O(n); only those k are then sorted.
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(n)
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def default_nlist(n_rows: int) -> int:
+    """
+    Rule of thumb for the number of inverted lists: ~4 * sqrt(n).
+    """
+    return max(1, int(4 * np.sqrt(n_rows)))
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) approximate nearest-neighbour index:
+    - A coarse quantizer (spherical k-means centroids) is trained on the embeddings.
+    - Every stored row is assigned to the inverted list of its nearest centroid.
+    - A query only scores the rows in its `nprobe` closest lists.
+
+    Persists next to the store's embeddings as ivf_centroids.npy + ivf_assignments.npy.
+    The index only returns candidate row ids; scoring stays in the vector store.
+    """
+
+    ASSIGN_BATCH_SIZE = 16384
+    KMEANS_ITERATIONS = 10
+    KMEANS_SAMPLES_PER_LIST = 64
+
+    def __init__(self, index_dir: str, nprobe: int = 32, nlist: Optional[int] = None):
+        self.index_dir = index_dir
+        self.nprobe = nprobe
+        self.nlist = nlist
+
+        self.centroids_path = os.path.join(index_dir, "ivf_centroids.npy")
+        self.assignments_path = os.path.join(index_dir, "ivf_assignments.npy")
+
+        self.centroids: Optional[np.ndarray] = None    # (nlist, dim), L2-normalized
+        # List id per row, in blocks: add() appends one and the next read
+        # concatenates them, so adding batch after batch does not copy all
+        # existing rows. A single attribute, so concurrent readers never see
+        # a half-merged state.
+        self._blocks: List[np.ndarray] = []
+
+        # CSR view of the inverted lists, rebuilt lazily after adds
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    # ---------- State ----------
+
+    @property
+    def assignments(self) -> Optional[np.ndarray]:
+        blocks = self._blocks
+        if len(blocks) > 1:
+            blocks = [np.concatenate(blocks)]
+            self._blocks = blocks
+        return blocks[0] if blocks else None
+
+    @assignments.setter
+    def assignments(self, assignments: Optional[np.ndarray]) -> None:
+        self._blocks = [] if assignments is None else [assignments]
+
+    @property
+    def num_rows(self) -> int:
+        return sum(int(block.shape[0]) for block in self._blocks)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_retrain(self, n_rows: int) -> bool:
+        """
+        Retrain once the corpus has grown enough that the list count is far
+        below the rule of thumb (lists become long and queries slow down).
+        """
+        if not self.is_trained:
+            return True
+        if self.nlist is not None:
+            return False
+        return default_nlist(n_rows) > 2 * self.centroids.shape[0]
+
+    # ---------- Persistence ----------
+
+    def load(self, n_rows: int) -> bool:
+        """
+        Load the index from disk. Returns False (and leaves the index empty)
+        if it is missing or does not cover exactly n_rows embeddings.
+        """
+        if not (os.path.exists(self.centroids_path) and os.path.exists(self.assignments_path)):
+            return False
+
+        centroids = np.load(self.centroids_path)
+        assignments = np.load(self.assignments_path)
+        if assignments.shape[0] != n_rows:
+            print("[WARN] ANN index is out of date with the embeddings. It will be rebuilt.")
+            return False
+
+        self.centroids = centroids
+        self.assignments = assignments
+        self._invalidate_lists()
+        return True
+
+    def save(self) -> None:
+        if self.centroids is None or self.assignments is None:
+            return
+        np.save(self.centroids_path, self.centroids)
+        np.save(self.assignments_path, self.assignments)
+
+    # ---------- Building ----------
+
+    def train(self, embeddings: np.ndarray, seed: int = 0) -> None:
+        """
+        Train the coarse quantizer on (a sample of) the embeddings and assign all rows.
+        """
+        n = embeddings.shape[0]
+        nlist = min(self.nlist or default_nlist(n), n)
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(n, nlist * self.KMEANS_SAMPLES_PER_LIST)
+        sample_ids = rng.choice(n, size=sample_size, replace=False)
+        sample = normalize_rows(embeddings[np.sort(sample_ids)])
+
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(self.KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty lists with random samples
+            sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        self.centroids = centroids
+        self.assignments = self._assign(embeddings)
+        self._invalidate_lists()
+
+    def add(self, new_embeddings: np.ndarray) -> None:
+        """
+        Assign newly appended rows to their nearest existing lists (no retraining).
+        """
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex.add called before train")
+        self._blocks = [*self._blocks, self._assign(new_embeddings)]
+        self._invalidate_lists()
+
+    def remove_rows(self, keep: np.ndarray) -> None:
+        """
+        Drop rows after the store compacted them away (keep: bool mask over old rows).
+        """
+        if self.assignments is None:
+            return
+        self.assignments = self.assignments[keep]
+        self._invalidate_lists()
+
+    def _assign(self, embeddings: np.ndarray) -> np.ndarray:
+        out = np.empty(embeddings.shape[0], dtype=np.int32)
+        for start in range(0, embeddings.shape[0], self.ASSIGN_BATCH_SIZE):
+            batch = normalize_rows(embeddings[start:start + self.ASSIGN_BATCH_SIZE])
+            out[start:start + batch.shape[0]] = np.argmax(batch @ self.centroids.T, axis=1)
+        return out
+
+    def _invalidate_lists(self) -> None:
+        self._order = None
+        self._offsets = None
+
+    def _build_lists(self) -> None:
+        nlist = self.centroids.shape[0]
+        assignments = self.assignments
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Offsets first: candidates() only checks _order
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._order = order
+
+    # ---------- Search ----------
+
+    def candidates(self, query_emb: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Return the row ids stored in the `nprobe` lists closest to the query.
+        query_emb: (dim,)
+        """
+        if self._order is None:
+            self._build_lists()
+
+        nlist = self.centroids.shape[0]
+        nprobe = min(nprobe or self.nprobe, nlist)
+
+        q = normalize_rows(query_emb.reshape(1, -1))[0]
+        centroid_scores = self.centroids @ q
+        if nprobe < nlist:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(nlist)
+
+        parts = [self._order[self._offsets[c]:self._offsets[c + 1]] for c in probe]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def create_ann_index(index_type: str, index_dir: str, nprobe: int = 32) -> Optional[IVFIndex]:
+    """
+    Factory for the store's ANN index. "exact" (or "none") disables ANN and
+    keeps brute-force search only.
+    """
+    index_type = (index_type or "exact").lower()
+    if index_type in ("exact", "none", "brute"):
+        return None
+    if index_type == "ivf":
+        return IVFIndex(index_dir, nprobe=nprobe)
+    raise ValueError(f"Unknown ANN index type: {index_type}")
+
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """
+    Fraction of the exact top-k ids that the approximate search also returned.
+    """
+    if len(exact_ids) == 0:
+        return 1.0
+    return len(set(np.asarray(approx_ids).tolist()) & set(np.asarray(exact_ids).tolist())) / len(exact_ids)
@@ -0,0 +1,170 @@
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from retrieval.ann_index import top_k_indices
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Very frequent words have huge posting lists and carry no signal for BM25
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has how in is it its of on or "
+    "that the their this to used was were what when which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase alphanumeric tokens, so "C2f", "mAP50" or "YOLOv8" stay single terms.
+    """
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def segment_postings(texts: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Lexical data for one segment, stored next to it as seg_NNNNN_bm25.npz
+    (see save_postings), as flat arrays:
+    {
+        "terms": (n_terms,) str, sorted,
+        "offsets": (n_terms + 1,) int64, postings of terms[i] are [offsets[i], offsets[i + 1]),
+        "rows": int32 local row of each posting,
+        "tfs": int32 term frequency of each posting,
+        "doc_lengths": (n_rows,) int32
+    }
+    """
+    doc_lengths: List[int] = []
+    postings: Dict[str, Tuple[List[int], List[int]]] = {}
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lengths.append(len(tokens))
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, tf in counts.items():
+            rows, tfs = postings.setdefault(term, ([], []))
+            rows.append(row)
+            tfs.append(tf)
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[term][0]) for term in terms])
+    return {
+        "terms": np.asarray(terms, dtype=str),
+        "offsets": offsets,
+        "rows": np.fromiter((r for term in terms for r in postings[term][0]), dtype=np.int32, count=int(offsets[-1])),
+        "tfs": np.fromiter((tf for term in terms for tf in postings[term][1]), dtype=np.int32, count=int(offsets[-1])),
+        "doc_lengths": np.asarray(doc_lengths, dtype=np.int32),
+    }
+
+
+def save_postings(path: str, data: Dict[str, np.ndarray]) -> None:
+    np.savez(path, **data)
+
+
+def load_postings(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path, allow_pickle=False) as f:
+        return {key: f[key] for key in f.files}
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index over the store's rows, assembled from the
+    per-segment posting arrays. A query only touches the posting lists of its
+    terms, not every row.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> [(global rows int64, tfs float32), ...], one entry per segment
+        # containing the term until the first query using it merges them
+        self.postings: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._doc_lengths: List[np.ndarray] = []
+        self.num_rows = 0
+        self.total_length = 0
+
+    def add_segment(self, data: Dict[str, np.ndarray], offset: int) -> None:
+        """
+        Merge one segment's postings, with its rows starting at global row `offset`.
+        """
+        rows = data["rows"].astype(np.int64) + offset
+        tfs = data["tfs"].astype(np.float32)
+        bounds = data["offsets"].tolist()
+        for i, term in enumerate(data["terms"].tolist()):
+            start, end = bounds[i], bounds[i + 1]
+            self.postings.setdefault(term, []).append((rows[start:end], tfs[start:end]))
+        doc_lengths = np.asarray(data["doc_lengths"], dtype=np.float32)
+        self._doc_lengths.append(doc_lengths)
+        self.num_rows += len(doc_lengths)
+        self.total_length += int(doc_lengths.sum())
+
+    def _term_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        parts = self.postings[term]
+        if len(parts) > 1:
+            parts[:] = [(np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]))]
+        return parts[0]
+
+    def _doc_lengths_array(self) -> np.ndarray:
+        if len(self._doc_lengths) > 1:
+            self._doc_lengths = [np.concatenate(self._doc_lengths)]
+        return self._doc_lengths[0]
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (row ids, BM25 scores) of the best top_k rows.
+        allowed: optional bool mask over rows (filters / deletions).
+        """
+        n = self.num_rows
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t in self.postings]
+        if n == 0 or not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        avgdl = self.total_length / n if n else 0.0
+        doc_lengths = self._doc_lengths_array()
+
+        all_rows = []
+        all_scores = []
+        for term in terms:
+            rows, tfs = self._term_postings(term)
+            df = len(rows)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[rows] / max(avgdl, 1e-6))
+            all_rows.append(rows)
+            all_scores.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+        rows = np.concatenate(all_rows)
+        scores = np.concatenate(all_scores)
+        if allowed is not None:
+            keep = allowed[rows]
+            rows, scores = rows[keep], scores[keep]
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Sum contributions per row (only rows that contain a query term)
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores).astype(np.float32)
+
+        top = top_k_indices(totals, top_k)
+        return unique_rows[top], totals[top]
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse several ranked lists of row ids: score(row) = sum 1 / (k + rank).
+    Returns (row ids, fused scores), best first.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank + 1)
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    ids = np.asarray([row for row, _ in ordered], dtype=np.int64)
+    scores = np.asarray([score for _, score in ordered], dtype=np.float32)
+    return ids, scores
@@ -1,4 +1,6 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator
+
+from core.tracing import traced
 
 
 def simple_text_clean(text: str) -> str:
@@ -11,6 +13,7 @@ def simple_text_clean(text: str) -> str:
     return text
 
 
+@traced("pdf.chunk_text")
 def chunk_text(
     text: str,
     chunk_size: int = 600,
@@ -61,3 +64,51 @@ def chunk_text(
         start = max(0, end - chunk_overlap)
 
     return chunks
+
+
+def iter_chunks(
+    texts: Iterable[str],
+    chunk_size: int = 600,
+    chunk_overlap: int = 150,
+) -> Iterator[Dict]:
+    """
+    Streaming version of chunk_text over a sequence of texts (e.g. PDF pages).
+
+    Produces exactly the same chunks as chunk_text on the joined texts, but
+    only keeps the words of the current chunk window in memory. The overlap is
+    carried across text (page) boundaries.
+    """
+    buffer: List[str] = []  # words from global position buffer_start onwards
+    buffer_start = 0
+    start = 0
+    chunk_id = 0
+
+    for text in texts:
+        buffer.extend(simple_text_clean(text).split())
+
+        # Emit a chunk only once a word exists past its end, so the last
+        # chunk of the stream is handled the same way as in chunk_text
+        while len(buffer) - (start - buffer_start) > chunk_size:
+            end = start + chunk_size
+            chunk_words = buffer[start - buffer_start:end - buffer_start]
+            yield {
+                "chunk_id": chunk_id,
+                "start": start,
+                "end": end,
+                "text": " ".join(chunk_words).strip(),
+            }
+            chunk_id += 1
+
+            # move start with overlap, drop words no chunk needs anymore
+            start = max(0, end - chunk_overlap)
+            del buffer[:start - buffer_start]
+            buffer_start = start
+
+    n = buffer_start + len(buffer)
+    if n > start:
+        yield {
+            "chunk_id": chunk_id,
+            "start": start,
+            "end": n,
+            "text": " ".join(buffer[start - buffer_start:]).strip(),
+        }
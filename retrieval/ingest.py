@@ -0,0 +1,78 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from retrieval.pdf_loader import iter_pdf_pages
+from retrieval.chunker import iter_chunks
+
+# Kept free of model imports (torch / sentence-transformers / ollama) so that
+# pool workers start quickly.
+
+
+def extract_and_chunk(pdf_path: str, chunk_size: int, chunk_overlap: int) -> Tuple[str, List[Dict]]:
+    """
+    Load one PDF and split it into chunks. Runs inside pool workers.
+    """
+    return pdf_path, list(iter_pdf_chunks(pdf_path, chunk_size, chunk_overlap))
+
+
+def iter_pdf_chunks(pdf_path: str, chunk_size: int = 600, chunk_overlap: int = 150) -> Iterator[Dict]:
+    """
+    Stream the chunks of one PDF: pages are read lazily and chunked
+    incrementally, so memory does not grow with the document size.
+    """
+    pages = (page["text"] for page in iter_pdf_pages(pdf_path) if page["text"])
+    yield from iter_chunks(pages, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def iter_batches(items: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    """
+    Group a stream into lists of at most batch_size items.
+    """
+    batch: List[Dict] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_chunked_pdfs(
+    pdf_paths: List[str],
+    chunk_size: int = 600,
+    chunk_overlap: int = 150,
+    workers: int = 1,
+) -> Iterator[Tuple[str, Iterable[Dict]]]:
+    """
+    Yield (pdf_path, chunks) for every PDF, always in input order.
+
+    Serially (workers <= 1), chunks is a lazy stream (see iter_pdf_chunks) that
+    must be consumed before the next document is requested.
+
+    With workers > 1, extraction and chunking run in a process pool. Workers
+    keep going while the caller consumes (embeds) earlier documents, so CPU-bound
+    PDF parsing overlaps with embedding in the parent process. At most
+    2 * workers documents are in flight (submitted or parsed but not yet
+    yielded), which bounds the chunks held in memory when embedding is slower.
+    """
+    if workers <= 1 or len(pdf_paths) <= 1:
+        for pdf_path in pdf_paths:
+            yield pdf_path, iter_pdf_chunks(pdf_path, chunk_size, chunk_overlap)
+        return
+
+    workers = min(workers, len(pdf_paths))
+    paths = iter(pdf_paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Futures are consumed in submission order, which keeps chunk order deterministic
+        pending = deque(
+            executor.submit(extract_and_chunk, pdf_path, chunk_size, chunk_overlap)
+            for pdf_path in islice(paths, 2 * workers)
+        )
+        while pending:
+            result = pending.popleft().result()
+            for pdf_path in islice(paths, 1):
+                pending.append(executor.submit(extract_and_chunk, pdf_path, chunk_size, chunk_overlap))
+            yield result
@@ -1,9 +1,29 @@
 import os
-from typing import List, Dict
+from typing import List, Dict, Iterator
 
 import fitz  # PyMuPDF
 
+from core.tracing import traced
 
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[Dict]:
+    """
+    Lazily yield {"page_num": int, "text": str} for each page of a PDF.
+    Only one page's text is held at a time.
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    doc = fitz.open(pdf_path)
+    try:
+        for i in range(len(doc)):
+            text = doc[i].get_text("text").strip()  # plain text
+            yield {"page_num": i + 1, "text": text}
+    finally:
+        doc.close()
+
+
+@traced("pdf.load_text")
 def load_pdf_text(pdf_path: str) -> Dict:
     """
     Load text from a PDF file using PyMuPDF (fitz).
@@ -19,23 +39,13 @@ def load_pdf_text(pdf_path: str) -> Dict:
         "full_text": str
     }
     """
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
-    doc = fitz.open(pdf_path)
-
     pages: List[Dict] = []
     full_text_parts: List[str] = []
 
-    for i in range(len(doc)):
-        page = doc[i]
-        text = page.get_text("text")  # plain text
-        text = text.strip()
-        pages.append({"page_num": i + 1, "text": text})
-        if text:
-            full_text_parts.append(text)
-
-    doc.close()
+    for page in iter_pdf_pages(pdf_path):
+        pages.append(page)
+        if page["text"]:
+            full_text_parts.append(page["text"])
 
     full_text = "\n\n".join(full_text_parts)
 
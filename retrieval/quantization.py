@@ -0,0 +1,165 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+
+
+class ScalarQuantizer:
+    """
+    Compact in-memory copy of the (normalized) embeddings used for a first,
+    approximate scoring pass:
+    - "float16": half-precision copy (2x smaller than float32)
+    - "int8": per-dimension scalar quantization to 256 levels (4x smaller)
+
+    The full-precision vectors stay in the memory-mapped segments on disk and
+    are only read for the shortlist that gets rescored exactly.
+    Persists next to the segments as quant_codes.npy + quant_params.npz.
+
+    Codes of added rows are kept as separate blocks and only concatenated
+    when the codes are read (a search, save), so ingesting batch after batch
+    does not copy all existing codes each time.
+    """
+
+    SCORE_BLOCK_ROWS = 65536
+    TRAIN_SAMPLE_ROWS = 100_000
+
+    def __init__(self, mode: str, index_dir: str):
+        if mode not in ("float16", "int8"):
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.mode = mode
+        self.index_dir = index_dir
+        self.codes_path = os.path.join(index_dir, "quant_codes.npy")
+        self.params_path = os.path.join(index_dir, "quant_params.npz")
+
+        # Code blocks, merged into one by the first read after add(); a single
+        # attribute, so concurrent readers never see a half-merged state
+        self._blocks: List[np.ndarray] = []
+        self.vmin: Optional[np.ndarray] = None   # (dim,) int8 only
+        self.scale: Optional[np.ndarray] = None  # (dim,) int8 only
+
+    # ---------- State ----------
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        blocks = self._blocks
+        if len(blocks) > 1:
+            blocks = [np.concatenate(blocks)]
+            self._blocks = blocks
+        return blocks[0] if blocks else None
+
+    @codes.setter
+    def codes(self, codes: Optional[np.ndarray]) -> None:
+        self._blocks = [] if codes is None else [codes]
+
+    @property
+    def num_rows(self) -> int:
+        return sum(int(block.shape[0]) for block in self._blocks)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(int(block.nbytes) for block in self._blocks)
+
+    # ---------- Persistence ----------
+
+    def load(self, n_rows: int) -> bool:
+        """
+        Load codes from disk. Returns False if missing, written in another mode,
+        or not covering exactly n_rows embeddings.
+        """
+        if not (os.path.exists(self.codes_path) and os.path.exists(self.params_path)):
+            return False
+        params = np.load(self.params_path)
+        if str(params["mode"]) != self.mode:
+            return False
+        codes = np.load(self.codes_path)
+        if codes.shape[0] != n_rows:
+            return False
+
+        self.codes = codes
+        if self.mode == "int8":
+            self.vmin = params["vmin"]
+            self.scale = params["scale"]
+        return True
+
+    def save(self) -> None:
+        if self.codes is None:
+            return
+        np.save(self.codes_path, self.codes)
+        if self.mode == "int8":
+            np.savez(self.params_path, mode=self.mode, vmin=self.vmin, scale=self.scale)
+        else:
+            np.savez(self.params_path, mode=self.mode)
+
+    # ---------- Building ----------
+
+    def build(self, embeddings, seed: int = 0) -> None:
+        """
+        Train on (a sample of) the embeddings and encode all of them, block by block.
+        """
+        n = embeddings.shape[0]
+        if self.mode == "int8":
+            rng = np.random.default_rng(seed)
+            sample_ids = np.sort(rng.choice(n, size=min(n, self.TRAIN_SAMPLE_ROWS), replace=False))
+            sample = np.asarray(embeddings[sample_ids], dtype=np.float32)
+            self.vmin = sample.min(axis=0)
+            self.scale = np.maximum(sample.max(axis=0) - self.vmin, 1e-6) / 255.0
+
+        blocks = [
+            self.encode(np.asarray(embeddings[start:start + self.SCORE_BLOCK_ROWS]))
+            for start in range(0, n, self.SCORE_BLOCK_ROWS)
+        ]
+        self.codes = np.concatenate(blocks)
+
+    def add(self, new_embeddings: np.ndarray) -> None:
+        self._blocks = [*self._blocks, self.encode(new_embeddings)]
+
+    def remove_rows(self, keep: np.ndarray) -> None:
+        if self.codes is not None:
+            self.codes = self.codes[keep]
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        if self.mode == "float16":
+            return embeddings.astype(np.float16)
+        # Values outside the trained range are clipped
+        levels = np.rint((embeddings - self.vmin) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    # ---------- Scoring ----------
+
+    def scores(self, query_emb: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Approximate dot products of every stored row (or only of the given row
+        ids, e.g. the candidates of an ANN probe) with a normalized query (dim,).
+        Codes are upcast one block at a time to keep temporary memory bounded.
+        """
+        q = np.asarray(query_emb, dtype=np.float32)
+        codes = self.codes
+        n = codes.shape[0] if rows is None else len(rows)
+        out = np.empty(n, dtype=np.float32)
+
+        if self.mode == "int8":
+            # x ~= vmin + (code + 128) * scale  =>  x.q = code.(q*scale) + const
+            q_scaled = q * self.scale
+            const = float(self.vmin @ q) + 128.0 * float(q_scaled.sum())
+        else:
+            q_scaled = q
+            const = 0.0
+
+        for start in range(0, n, self.SCORE_BLOCK_ROWS):
+            if rows is None:
+                block = codes[start:start + self.SCORE_BLOCK_ROWS]
+            else:
+                block = codes[rows[start:start + self.SCORE_BLOCK_ROWS]]
+            block = block.astype(np.float32)
+            out[start:start + block.shape[0]] = block @ q_scaled + const
+        return out
+
+
+def create_quantizer(mode: str, index_dir: str) -> Optional[ScalarQuantizer]:
+    """
+    "none" keeps full-precision search only.
+    """
+    mode = (mode or "none").lower()
+    if mode in ("none", "float32"):
+        return None
+    return ScalarQuantizer(mode, index_dir)
@@ -0,0 +1,64 @@
+from typing import List, Union
+
+import numpy as np
+
+
+class SegmentedMatrix:
+    """
+    Read-only row-wise concatenation of several 2-D arrays (usually memory-mapped
+    segment files), used in place of one big embeddings matrix:
+    - `m @ q` scores every segment without copying them together.
+    - `m[ids]` / `m[a:b]` gather rows across segment boundaries.
+    """
+
+    def __init__(self, blocks: List[np.ndarray]):
+        if not blocks:
+            raise ValueError("SegmentedMatrix needs at least one block")
+        self.blocks: List[np.ndarray] = []
+        self.offsets = np.zeros(1, dtype=np.int64)
+        for block in blocks:
+            self.append(block)
+
+    def append(self, block: np.ndarray) -> None:
+        if self.blocks and block.shape[1] != self.blocks[0].shape[1]:
+            raise ValueError("All segments must have the same embedding dimension")
+        self.blocks.append(block)
+        self.offsets = np.append(self.offsets, self.offsets[-1] + block.shape[0])
+
+    @property
+    def shape(self):
+        return (int(self.offsets[-1]), self.blocks[0].shape[1])
+
+    @property
+    def dtype(self):
+        return self.blocks[0].dtype
+
+    @property
+    def nbytes(self) -> int:
+        return sum(b.nbytes for b in self.blocks)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        if len(self.blocks) == 1:
+            return self.blocks[0] @ other
+        return np.concatenate([b @ other for b in self.blocks])
+
+    def __getitem__(self, key: Union[slice, np.ndarray, List[int]]) -> np.ndarray:
+        if isinstance(key, slice):
+            key = np.arange(*key.indices(len(self)))
+        return self.take(np.asarray(key, dtype=np.int64))
+
+    def take(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Gather rows by global row id.
+        """
+        out = np.empty((len(ids), self.shape[1]), dtype=self.dtype)
+        if len(ids) == 0:
+            return out
+        seg = np.searchsorted(self.offsets, ids, side="right") - 1
+        for s in np.unique(seg):
+            mask = seg == s
+            out[mask] = self.blocks[s][ids[mask] - self.offsets[s]]
+        return out
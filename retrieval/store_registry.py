@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+from config import STORE_CACHE_MAX_BYTES
+from retrieval.vector_store import LocalVectorStore
+
+
+class StoreRegistry:
+    """
+    Process-wide cache of loaded LocalVectorStore instances:
+    - One shared store per index name, so questions stop re-reading the index.
+    - A store is reloaded when its manifest on disk changed (another process wrote it).
+    - Least-recently-used stores are evicted once their total size exceeds max_bytes.
+    Thread-safe; each index is loaded by at most one thread at a time.
+    """
+
+    def __init__(self, max_bytes: int = STORE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._stores: "OrderedDict[str, LocalVectorStore]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, index_name: str) -> LocalVectorStore:
+        with self._lock:
+            load_lock = self._load_locks.setdefault(index_name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                store = self._stores.get(index_name)
+                if store is not None:
+                    self._stores.move_to_end(index_name)
+
+            if store is not None and store.loaded_signature == store.disk_signature():
+                with self._lock:
+                    self.hits += 1
+                return store
+
+            store = LocalVectorStore(index_name=index_name)
+
+            with self._lock:
+                self.misses += 1
+                self._stores[index_name] = store
+                self._stores.move_to_end(index_name)
+                self._evict(keep=index_name)
+            return store
+
+    def invalidate(self, index_name: str) -> None:
+        with self._lock:
+            self._stores.pop(index_name, None)
+
+    def _evict(self, keep: str) -> None:
+        """
+        Drop least-recently-used stores until the cache fits in max_bytes.
+        Called with self._lock held. The store just requested is never evicted.
+        """
+        total = sum(s.memory_bytes() for s in self._stores.values())
+        for name in list(self._stores.keys()):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            total -= self._stores.pop(name).memory_bytes()
+            print(f"[INDEX] Evicted '{name}' from the store cache")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "indexes": list(self._stores.keys()),
+                "bytes": sum(s.memory_bytes() for s in self._stores.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_registry = StoreRegistry()
+
+
+def get_vector_store(index_name: str = "default_index") -> LocalVectorStore:
+    """
+    Return the shared, already-loaded store for index_name.
+    """
+    return _registry.get(index_name)
+
+
+def invalidate_vector_store(index_name: str) -> None:
+    """
+    Forget the cached store (e.g. after its directory was deleted).
+    """
+    _registry.invalidate(index_name)
+
+
+def get_store_registry() -> StoreRegistry:
+    return _registry
@@ -1,79 +1,572 @@
+import functools
 import os
 import json
-from typing import List, Dict, Optional, Tuple
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple
 
 import numpy as np
 
 from core.models import embed_texts
-from config import VECTOR_DB_DIR
+from core.tracing import traced
+from config import (
+    VECTOR_DB_DIR,
+    ANN_INDEX_TYPE,
+    ANN_MIN_ROWS,
+    ANN_NPROBE,
+    EMBEDDING_QUANTIZATION,
+    QUANTIZATION_RESCORE_FACTOR,
+    SEARCH_MODE,
+    HYBRID_CANDIDATES_FACTOR,
+    RRF_K,
+)
+from retrieval.ann_index import create_ann_index, normalize_rows, top_k_indices
+from retrieval.bm25 import BM25Index, load_postings, reciprocal_rank_fusion, save_postings, segment_postings
+from retrieval.quantization import create_quantizer
+from retrieval.segments import SegmentedMatrix
+
+# On-disk format version:
+# 1 = raw model embeddings (whatever dtype encode returned) in embeddings.npy
+# 2 = L2-normalized float32 embeddings in embeddings.npy
+# 3 = append-only segments listed in manifest.json
+STORE_FORMAT_VERSION = 3
+
+# compact() merges every segment with fewer rows than this
+COMPACT_MIN_SEGMENT_ROWS = 50_000
+
+# Cap on the (queries x rows) score matrix in similarity_search_batch (~64 MiB of float32)
+SEARCH_BATCH_MAX_SCORES = 16 * 1024 * 1024
+
+
+class ReadWriteLock:
+    """
+    Any number of readers, or one writer. A waiting writer holds off new
+    readers, so a steady stream of searches cannot starve an index build.
+    Not reentrant.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writing or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+def index_exists(index_name: str) -> bool:
+    """
+    Whether an index was written for index_name (segmented or legacy layout).
+    Unlike LocalVectorStore(index_name), never creates the index directory.
+    """
+    index_dir = os.path.join(VECTOR_DB_DIR, index_name)
+    return any(os.path.exists(os.path.join(index_dir, name)) for name in ("manifest.json", "embeddings.npy"))
+
+
+def _reads(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.read():
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+
+def _writes(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.write():
+            return fn(self, *args, **kwargs)
+    return wrapper
 
 
 class LocalVectorStore:
     """
     A simple local vector store:
     - Stores texts, embeddings, and metadata.
-    - Uses cosine similarity for retrieval.
-    - Persists to disk as .npy + .json files.
+    - Keeps embeddings L2-normalized (float32), so cosine similarity is a single dot product.
+    - Optionally keeps an ANN (IVF) index for large stores; exact search is the fallback.
+    - Optionally keeps a compact float16/int8 copy in memory: search scans the codes and
+      rescores a shortlist against the full-precision (memory-mapped) vectors. With both,
+      the ANN index picks the candidate rows and the codes score them before rescoring.
+    - Supports metadata filters, resolved through an inverted index (metadata value -> row ids).
+    - Keeps a BM25 index (per-segment posting arrays) for lexical and hybrid (RRF) search,
+      assembled on the first lexical / hybrid query.
+    - Persists to disk as append-only segments (.npy + .json + _bm25.npz) listed in manifest.json.
+      Each add_texts call writes one new immutable segment; segments are opened
+      memory-mapped, and compact() merges small ones. The ANN index and quantized
+      codes are updated in memory per batch and saved once, by compact() / save_indexes().
+    - Deleted rows are tombstoned in the manifest and physically dropped by compact().
+    - Records a per-document manifest (content hash, chunking, embedding model).
+    - One instance is shared by every thread (see store_registry): searches take
+      `lock` for reading, add_texts / delete_source / compact / save_indexes for
+      writing, so a background build never changes the index under a search.
     """
 
-    def __init__(self, index_name: str = "default_index"):
+    def __init__(
+        self,
+        index_name: str = "default_index",
+        ann_index_type: str = ANN_INDEX_TYPE,
+        ann_min_rows: int = ANN_MIN_ROWS,
+        nprobe: int = ANN_NPROBE,
+        quantization: str = EMBEDDING_QUANTIZATION,
+        rescore_factor: int = QUANTIZATION_RESCORE_FACTOR,
+    ):
         self.index_name = index_name
         self.index_dir = os.path.join(VECTOR_DB_DIR, index_name)
         os.makedirs(self.index_dir, exist_ok=True)
 
-        self.embeddings_path = os.path.join(self.index_dir, "embeddings.npy")
-        self.texts_path = os.path.join(self.index_dir, "texts.json")
-        self.metadata_path = os.path.join(self.index_dir, "metadata.json")
+        self.manifest_path = os.path.join(self.index_dir, "manifest.json")
 
-        self.embeddings: Optional[np.ndarray] = None
+        self.embeddings: Optional[SegmentedMatrix] = None
         self.texts: List[str] = []
         self.metadatas: List[Dict] = []
 
+        self.segments: List[Dict] = []  # [{"name": str, "rows": int, "deleted": [local ids]}, ...]
+        self.next_segment_id = 0
+        self.documents: Dict[str, Dict] = {}  # source -> {"sha256", "chunk_size", ...}
+        # Row ids that were deleted but not yet compacted away (None = no deletions)
+        self.deleted: Optional[np.ndarray] = None
+        # Inverted index over scalar metadata: key -> value -> row ids (built lazily)
+        self._postings: Optional[Dict[str, Dict[Any, List[int]]]] = None
+        # Manifest signature this instance reflects (see disk_signature)
+        self.loaded_signature: Optional[Tuple[int, int]] = None
+
+        self.ann_min_rows = ann_min_rows
+        self.ann = create_ann_index(ann_index_type, self.index_dir, nprobe=nprobe)
+
+        self.quantizer = create_quantizer(quantization, self.index_dir)
+        self.rescore_factor = rescore_factor
+        # The ANN assignments / quantized codes changed since they were last saved
+        self._indexes_dirty = False
+
+        # Assembled from the segments' posting arrays by the first lexical / hybrid query
+        self.bm25 = BM25Index()
+        self._bm25_loaded = False
+        # Searches only hold `lock` for reading: one of them assembles the BM25
+        # index (and writes missing posting files) while the others wait
+        self._bm25_build_lock = threading.Lock()
+
+        self.lock = ReadWriteLock()
         self._load()
 
     # ---------- Persistence ----------
 
-    def _load(self) -> None:
+    def _segment_paths(self, name: str) -> Tuple[str, str, str, str]:
+        base = os.path.join(self.index_dir, name)
+        return f"{base}.npy", f"{base}_texts.json", f"{base}_metadata.json", f"{base}_bm25.npz"
+
+    def disk_signature(self) -> Optional[Tuple[int, int]]:
         """
-        Load existing index from disk if available.
+        (mtime_ns, size) of manifest.json, which changes whenever the index is
+        written. None if the index does not exist on disk.
         """
-        if os.path.exists(self.embeddings_path):
-            self.embeddings = np.load(self.embeddings_path)
+        try:
+            st = os.stat(self.manifest_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
 
-        if os.path.exists(self.texts_path):
-            with open(self.texts_path, "r", encoding="utf-8") as f:
-                self.texts = json.load(f)
-
-        if os.path.exists(self.metadata_path):
-            with open(self.metadata_path, "r", encoding="utf-8") as f:
-                self.metadatas = json.load(f)
+    def memory_bytes(self) -> int:
+        """
+        Approximate memory held by this store (embeddings + texts).
+        With quantization, the scanned codes replace the memory-mapped float32 vectors.
+        """
+        if self._use_quantizer():
+            emb_bytes = self.quantizer.nbytes
+        else:
+            emb_bytes = self.embeddings.nbytes if self.embeddings is not None else 0
+        return emb_bytes + sum(len(t) for t in self.texts)
 
-        # Sanity check
-        if self.embeddings is not None:
-            if len(self.texts) != self.embeddings.shape[0]:
-                print("[WARN] Texts and embeddings count mismatch. Resetting index.")
+    @traced("store.load")
+    def _load(self) -> None:
+        """
+        Load existing index from disk if available.
+        """
+        if not os.path.exists(self.manifest_path):
+            self._migrate_legacy_files()
+        self.loaded_signature = self.disk_signature()
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.segments = manifest.get("segments", [])
+            self.next_segment_id = manifest.get("next_segment_id", len(self.segments))
+            self.documents = manifest.get("documents", {})
+
+        for segment in self.segments:
+            emb_path, texts_path, meta_path, _ = self._segment_paths(segment["name"])
+            block = np.load(emb_path, mmap_mode="r")
+            with open(texts_path, "r", encoding="utf-8") as f:
+                texts = json.load(f)
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadatas = json.load(f)
+
+            # Sanity check
+            if len(texts) != block.shape[0] or len(metadatas) != block.shape[0]:
+                print(f"[WARN] Segment {segment['name']} is inconsistent. Resetting index.")
                 self.embeddings = None
                 self.texts = []
                 self.metadatas = []
+                self.segments = []
+                return
+
+            self._append_block(block)
+            self.texts.extend(texts)
+            self.metadatas.extend(metadatas)
+
+        self._rebuild_deleted_mask()
+
+        if self.ann is not None and self.embeddings is not None:
+            if not self.ann.load(self.embeddings.shape[0]):
+                self._update_ann_index(None)
+                self.ann.save()
+
+        if self.quantizer is not None and self.embeddings is not None:
+            if not self.quantizer.load(self.embeddings.shape[0]):
+                print(f"[INDEX] Building {self.quantizer.mode} codes for '{self.index_name}'...")
+                self.quantizer.build(self.embeddings)
+                self.quantizer.save()
 
-    def _save(self) -> None:
+    @staticmethod
+    def _load_segment_bm25(bm25_path: str, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Read a segment's posting arrays; segments written before them (no
+        postings, or the former _bm25.json) get them built now.
         """
-        Save current index to disk.
+        if os.path.exists(bm25_path):
+            return load_postings(bm25_path)
+        data = segment_postings(texts)
+        save_postings(bm25_path, data)
+        legacy_path = bm25_path[:-len(".npz")] + ".json"
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        return data
+
+    @traced("store.load_bm25")
+    def _ensure_bm25(self) -> None:
+        # Called under the read lock; writers (which also reset or extend the
+        # BM25 index) are excluded, concurrent searches by _bm25_build_lock
+        if self._bm25_loaded:
+            return
+        with self._bm25_build_lock:
+            if self._bm25_loaded:
+                return
+            bm25 = BM25Index()
+            offset = 0
+            for segment in self.segments:
+                bm25_path = self._segment_paths(segment["name"])[3]
+                texts = self.texts[offset:offset + segment["rows"]]
+                bm25.add_segment(self._load_segment_bm25(bm25_path, texts), offset=offset)
+                offset += segment["rows"]
+            self.bm25 = bm25
+            self._bm25_loaded = True
+
+    def _append_block(self, block: np.ndarray) -> None:
+        if self.embeddings is None:
+            self.embeddings = SegmentedMatrix([block])
+        else:
+            self.embeddings.append(block)
+
+    def _rebuild_deleted_mask(self) -> None:
+        if not any(seg.get("deleted") for seg in self.segments):
+            self.deleted = None
+            return
+        mask = np.zeros(len(self.texts), dtype=bool)
+        for i, seg in enumerate(self.segments):
+            if seg.get("deleted"):
+                mask[int(self.embeddings.offsets[i]) + np.asarray(seg["deleted"], dtype=np.int64)] = True
+        self.deleted = mask
+
+    @property
+    def live_count(self) -> int:
         """
-        if self.embeddings is not None:
-            np.save(self.embeddings_path, self.embeddings)
+        Number of rows that have not been deleted.
+        """
+        if self.deleted is None:
+            return len(self.texts)
+        return len(self.texts) - int(self.deleted.sum())
 
-        with open(self.texts_path, "w", encoding="utf-8") as f:
-            json.dump(self.texts, f, ensure_ascii=False, indent=2)
+    def _migrate_legacy_files(self) -> None:
+        """
+        Upgrade a single-file index (embeddings.npy + texts.json + metadata.json,
+        format 1 or 2) into one segment. Format 1 embeddings are normalized on the way.
+        If the files do not match, they are renamed to *.unmigrated rather than
+        deleted, and the index starts empty.
+        """
+        legacy_emb = os.path.join(self.index_dir, "embeddings.npy")
+        legacy_texts = os.path.join(self.index_dir, "texts.json")
+        legacy_meta = os.path.join(self.index_dir, "metadata.json")
+        legacy_info = os.path.join(self.index_dir, "store_info.json")
+        if not os.path.exists(legacy_emb):
+            return
+
+        print(f"[INDEX] Migrating '{self.index_name}' to segmented storage...")
+        embeddings = normalize_rows(np.load(legacy_emb))
+        texts: List[str] = []
+        metadatas: List[Dict] = []
+        if os.path.exists(legacy_texts):
+            with open(legacy_texts, "r", encoding="utf-8") as f:
+                texts = json.load(f)
+        if os.path.exists(legacy_meta):
+            with open(legacy_meta, "r", encoding="utf-8") as f:
+                metadatas = json.load(f)
+        if len(metadatas) != len(texts):
+            metadatas = [{} for _ in texts]
 
-        with open(self.metadata_path, "w", encoding="utf-8") as f:
-            json.dump(self.metadatas, f, ensure_ascii=False, indent=2)
+        migrated = bool(texts) and len(texts) == embeddings.shape[0]
+        if migrated:
+            self.segments.append(self._write_segment(embeddings, texts, metadatas))
+            self._save_manifest()
+        else:
+            print("[WARN] Texts and embeddings count mismatch. Legacy files kept as *.unmigrated; resetting index.")
+
+        for path in (legacy_emb, legacy_texts, legacy_meta, legacy_info):
+            if os.path.exists(path):
+                if migrated:
+                    os.remove(path)
+                else:
+                    os.replace(path, path + ".unmigrated")
+        self.segments = []
+
+    @traced("store.write_segment")
+    def _write_segment(
+        self,
+        embeddings: np.ndarray,
+        texts: List[str],
+        metadatas: List[Dict],
+        bm25_data: Optional[Dict] = None,
+    ) -> Dict:
+        """
+        Write one immutable segment (embeddings, texts, metadata, BM25 postings)
+        and return its manifest entry.
+        The manifest is not touched, so a crash here leaves the index unchanged.
+        """
+        name = f"seg_{self.next_segment_id:05d}"
+        self.next_segment_id += 1
+        emb_path, texts_path, meta_path, bm25_path = self._segment_paths(name)
+
+        np.save(emb_path, np.asarray(embeddings, dtype=np.float32))
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump(texts, f, ensure_ascii=False)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(metadatas, f, ensure_ascii=False)
+        save_postings(bm25_path, bm25_data if bm25_data is not None else segment_postings(texts))
+
+        return {"name": name, "rows": len(texts)}
+
+    @traced("store.save_manifest")
+    def _save_manifest(self) -> None:
+        """
+        Atomically replace manifest.json (the commit point for new segments).
+        """
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format_version": STORE_FORMAT_VERSION,
+                    "next_segment_id": self.next_segment_id,
+                    "segments": self.segments,
+                    "documents": self.documents,
+                },
+                f,
+                indent=2,
+            )
+        os.replace(tmp_path, self.manifest_path)
+        self.loaded_signature = self.disk_signature()
+
+    @traced("store.compact")
+    @_writes
+    def compact(self, min_segment_rows: int = COMPACT_MIN_SEGMENT_ROWS) -> int:
+        """
+        Merge all segments smaller than min_segment_rows into one new segment,
+        and rewrite segments with deleted rows without them.
+        The order of the remaining rows is preserved (the ANN index is remapped).
+        Returns the number of segments that were rewritten.
+        """
+        if self.embeddings is None:
+            return 0
+
+        candidates = [
+            i for i, seg in enumerate(self.segments)
+            if seg["rows"] < min_segment_rows or seg.get("deleted")
+        ]
+        merged = 0
+        # Only contiguous runs are merged, so row order is preserved.
+        # Work backwards so earlier segment positions stay valid.
+        for run in reversed(self._contiguous_runs(candidates)):
+            if len(run) >= 2 or self.segments[run[0]].get("deleted"):
+                merged += self._merge_segments(run[0], run[-1] + 1)
+
+        if merged:
+            self._indexes_dirty = True
+        self._save_indexes()
+        return merged
+
+    @_writes
+    def save_indexes(self) -> None:
+        self._save_indexes()
+
+    def _save_indexes(self) -> None:
+        """
+        Persist the ANN index and quantized codes if they changed. add_texts
+        only updates them in memory (rewriting them per batch would make
+        ingest quadratic); compact() calls this at the end of a build. If they
+        are not saved, the next _load finds them out of date and rebuilds them.
+        """
+        if not self._indexes_dirty:
+            return
+        if self.ann is not None:
+            self.ann.save()
+        if self.quantizer is not None:
+            self.quantizer.save()
+        self._indexes_dirty = False
+
+    @staticmethod
+    def _contiguous_runs(indices: List[int]) -> List[List[int]]:
+        runs: List[List[int]] = []
+        for i in indices:
+            if runs and runs[-1][-1] == i - 1:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+        return runs
+
+    def _merge_segments(self, first: int, last: int) -> int:
+        """
+        Replace segments[first:last] with a single segment holding their live rows.
+        """
+        start = int(self.embeddings.offsets[first])
+        end = int(self.embeddings.offsets[last])
+
+        keep = np.ones(len(self.texts), dtype=bool)
+        if self.deleted is not None:
+            keep[start:end] = ~self.deleted[start:end]
+        live_ids = np.nonzero(keep[start:end])[0]
+
+        kept_texts = [self.texts[start + i] for i in live_ids]
+        kept_metadatas = [self.metadatas[start + i] for i in live_ids]
+
+        old_segments = self.segments[first:last]
+        blocks = self.embeddings.blocks
+        if len(live_ids) > 0:
+            merged_entry = self._write_segment(
+                self.embeddings[start + live_ids],
+                kept_texts,
+                kept_metadatas,
+            )
+            self.segments = self.segments[:first] + [merged_entry] + self.segments[last:]
+            # Re-open blocks so no memory map of the old files stays alive
+            emb_path = self._segment_paths(merged_entry["name"])[0]
+            blocks = blocks[:first] + [np.load(emb_path, mmap_mode="r")] + blocks[last:]
+            merged_name = merged_entry["name"]
+        else:
+            self.segments = self.segments[:first] + self.segments[last:]
+            blocks = blocks[:first] + blocks[last:]
+            merged_name = "(empty)"
+        self._save_manifest()
+
+        self.texts = self.texts[:start] + kept_texts + self.texts[end:]
+        self.metadatas = self.metadatas[:start] + kept_metadatas + self.metadatas[end:]
+        self.embeddings = SegmentedMatrix(blocks) if blocks else None
+        self._rebuild_deleted_mask()
+        self._postings = None  # row ids shifted
+        self.bm25 = BM25Index()
+        self._bm25_loaded = False
+        if self.ann is not None and self.ann.is_trained:
+            self.ann.remove_rows(keep)
+        if self.quantizer is not None:
+            self.quantizer.remove_rows(keep)
+
+        for segment in old_segments:
+            emb_path, texts_path, meta_path, bm25_path = self._segment_paths(segment["name"])
+            legacy_bm25_path = bm25_path[:-len(".npz")] + ".json"
+            for path in (emb_path, texts_path, meta_path, bm25_path, legacy_bm25_path):
+                if not os.path.exists(path):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"[WARN] Could not remove old segment file {path}: {e}")
+
+        print(f"[INDEX] Compacted {len(old_segments)} segments into {merged_name}")
+        return len(old_segments)
 
     # ---------- Indexing ----------
 
-    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None) -> None:
+    @_reads
+    def has_source(self, source: str) -> bool:
+        return len(self._filter_rows({"source": source})) > 0
+
+    @_reads
+    def sources(self) -> List[str]:
+        """
+        Sorted list of sources that still have rows in the index.
+        """
+        self._ensure_postings()
+        return sorted(
+            source for source in self._postings.get("source", {})
+            if len(self._filter_rows({"source": source})) > 0
+        )
+
+    @_writes
+    def delete_source(self, source: str) -> int:
+        """
+        Tombstone every row whose metadata source equals `source` and forget
+        its document entry. Returns the number of rows deleted.
+        """
+        rows_arr = self._filter_rows({"source": source})
+        self.documents.pop(source, None)
+        if len(rows_arr) > 0:
+            seg_ids = np.searchsorted(self.embeddings.offsets, rows_arr, side="right") - 1
+            for seg_idx in np.unique(seg_ids):
+                segment = self.segments[seg_idx]
+                local = rows_arr[seg_ids == seg_idx] - self.embeddings.offsets[seg_idx]
+                segment["deleted"] = sorted(set(segment.get("deleted", [])) | set(local.tolist()))
+            self._rebuild_deleted_mask()
+        self._save_manifest()
+        return len(rows_arr)
+
+    @traced("store.add")
+    def add_texts(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[Dict]] = None,
+        document: Optional[Dict] = None,
+    ) -> None:
         """
         Add a batch of texts with optional metadata to the index.
+        The batch is written as one new segment; existing segments are never rewritten.
+        If `document` is given (must contain "source"), it is recorded in the
+        document manifest in the same commit.
         """
         if metadatas is None:
             metadatas = [{} for _ in texts]
@@ -81,45 +574,166 @@ class LocalVectorStore:
         if len(metadatas) != len(texts):
             raise ValueError("metadatas length must match texts length")
 
-        # Compute embeddings
-        new_embeddings = embed_texts(texts)  # shape: (n, dim)
-
-        # Append
-        if self.embeddings is None:
-            self.embeddings = new_embeddings
-        else:
-            self.embeddings = np.vstack([self.embeddings, new_embeddings])
-
-        self.texts.extend(texts)
-        self.metadatas.extend(metadatas)
-
-        # Save to disk
-        self._save()
+        if not texts:
+            if document is not None:
+                with self.lock.write():
+                    self.documents[document["source"]] = document
+                    self._save_manifest()
+            return
+
+        # Compute embeddings (normalized once here, never again at query time) and
+        # postings before taking the write lock, so searches only wait for the commit.
+        # Chunk texts stay out of the embedding cache's memory LRU, which holds queries
+        new_embeddings = normalize_rows(embed_texts(texts, remember=False))  # shape: (n, dim)
+        bm25_data = segment_postings(texts)
+
+        with self.lock.write():
+            if document is not None:
+                self.documents[document["source"]] = document
+
+            # Persist the new segment, then commit it in the manifest
+            segment = self._write_segment(new_embeddings, texts, metadatas, bm25_data=bm25_data)
+            self.segments.append(segment)
+            self._save_manifest()
+
+            # Append to the in-memory index
+            emb_path = self._segment_paths(segment["name"])[0]
+            if self._bm25_loaded:
+                self.bm25.add_segment(bm25_data, offset=len(self.texts))
+            self.texts.extend(texts)
+            self.metadatas.extend(metadatas)
+            self._append_block(np.load(emb_path, mmap_mode="r"))
+            if self.deleted is not None:
+                self.deleted = np.concatenate([self.deleted, np.zeros(len(texts), dtype=bool)])
+            if self._postings is not None:
+                first_row = len(self.texts) - len(texts)
+                for offset, metadata in enumerate(metadatas):
+                    self._index_metadata(first_row + offset, metadata)
+
+            # Updated in memory only; persisted by save_indexes() / compact()
+            self._update_ann_index(new_embeddings)
+            if self.quantizer is not None:
+                if self.quantizer.num_rows > 0 and self.quantizer.num_rows == len(self.texts) - len(texts):
+                    self.quantizer.add(new_embeddings)
+                else:
+                    self.quantizer.build(self.embeddings)
+            self._indexes_dirty = self.ann is not None or self.quantizer is not None
+
+    def _update_ann_index(self, new_embeddings: Optional[np.ndarray]) -> None:
+        """
+        Keep the ANN index in sync with self.embeddings:
+        - train it once the store reaches ann_min_rows (or has outgrown its lists),
+        - otherwise assign only the newly added rows.
+        """
+        if self.ann is None or self.embeddings is None:
+            return
 
-    # ---------- Retrieval ----------
+        n = self.embeddings.shape[0]
+        if n < self.ann_min_rows:
+            return
 
-    @staticmethod
-    def _cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        if self.ann.needs_retrain(n) or new_embeddings is None or self.ann.num_rows != n - len(new_embeddings):
+            print(f"[INDEX] Training ANN index over {n} embeddings...")
+            self.ann.train(self.embeddings)
+        else:
+            self.ann.add(new_embeddings)
+
+    def _use_ann(self, top_k: int) -> bool:
+        return (
+            self.ann is not None
+            and self.ann.is_trained
+            and self.ann.num_rows == len(self.texts)
+            and len(self.texts) >= self.ann_min_rows
+            and top_k < len(self.texts)
+        )
+
+    def _use_quantizer(self) -> bool:
+        return self.quantizer is not None and self.quantizer.num_rows == len(self.texts) > 0
+
+    # ---------- Metadata filters ----------
+
+    def _ensure_postings(self) -> None:
+        # Built aside and assigned once: concurrent searches may both build it
+        if self._postings is None:
+            postings: Dict[str, Dict[Any, List[int]]] = {}
+            for row, metadata in enumerate(self.metadatas):
+                self._index_metadata(row, metadata, postings)
+            self._postings = postings
+
+    def _index_metadata(self, row: int, metadata: Dict, postings: Optional[Dict] = None) -> None:
+        postings = self._postings if postings is None else postings
+        for key, value in metadata.items():
+            if isinstance(value, (str, int, float, bool)):
+                postings.setdefault(key, {}).setdefault(value, []).append(row)
+
+    def _filter_rows(self, filters: Dict) -> np.ndarray:
         """
-        Compute cosine similarity between each row in a and b.
-        a: (n, d), b: (m, d)
-        Returns: (n, m)
+        Resolve metadata filters to sorted, non-deleted row ids.
+
+        Each filter maps a metadata key to:
+        - a scalar: equality, e.g. {"source": "paper.pdf"}
+        - a list / set / tuple: membership, e.g. {"source": ["a.pdf", "b.pdf"]}
+        - a dict with "min" and/or "max": inclusive range, e.g. {"chunk_id": {"min": 0, "max": 20}}
+        All filters must match.
         """
-        # Normalize
-        a_norm = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-10)
-        b_norm = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-10)
+        self._ensure_postings()
+        result: Optional[np.ndarray] = None
+
+        for key, condition in filters.items():
+            values = self._postings.get(key, {})
+            if isinstance(condition, dict):
+                lo, hi = condition.get("min"), condition.get("max")
+                matched = [
+                    v for v in values
+                    if isinstance(v, (int, float))
+                    and (lo is None or v >= lo)
+                    and (hi is None or v <= hi)
+                ]
+            elif isinstance(condition, (list, tuple, set, frozenset)):
+                matched = [v for v in condition if v in values]
+            else:
+                matched = [condition] if condition in values else []
+
+            if matched:
+                rows = np.unique(np.concatenate([np.asarray(values[v], dtype=np.int64) for v in matched]))
+            else:
+                rows = np.empty(0, dtype=np.int64)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+
+        if result is None:
+            result = np.arange(len(self.texts), dtype=np.int64)
+        if self.deleted is not None:
+            result = result[~self.deleted[result]]
+        return result
 
-        # Similarity = dot product of normalized vectors
-        return np.dot(a_norm, b_norm.T)
+    # ---------- Retrieval ----------
 
+    @traced("store.search")
+    @_reads
     def similarity_search(
         self,
         query: str,
         top_k: int = 5,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        filters: Optional[Dict] = None,
+        mode: str = SEARCH_MODE,
     ) -> List[Dict]:
         """
         Given a query string, returns top_k most similar documents.
 
+        mode:
+        - "dense": cosine similarity of embeddings (score = cosine)
+        - "lexical": BM25 over the posting lists (score = BM25)
+        - "hybrid": reciprocal rank fusion of both rankings (score = fused RRF score)
+
+        Uses the ANN index when available, unless exact=True (brute force over
+        every embedding, which is also the recall baseline). nprobe overrides
+        the number of inverted lists probed for this query.
+
+        filters (see _filter_rows) restrict the search to matching chunks; only
+        those rows of the embedding matrix are scored.
+
         Each result is:
         {
             "text": str,
@@ -127,28 +741,185 @@ class LocalVectorStore:
             "score": float
         }
         """
-        if self.embeddings is None or len(self.texts) == 0:
+        if self.embeddings is None or self.live_count == 0:
             return []
 
-        # Embed query
-        query_emb = embed_texts([query])  # shape: (1, dim)
+        rows = self._filter_rows(filters) if filters else None
+        if rows is not None and len(rows) == 0:
+            return []
 
-        # Compute cosine similarity with all embeddings
-        sims = self._cosine_similarity(query_emb, self.embeddings)  # (1, n)
-        sims = sims[0]  # shape: (n,)
+        # Embed query (lexical search does not need it)
+        query_emb = None
+        if mode != "lexical":
+            query_emb = normalize_rows(embed_texts([query]))[0]  # shape: (dim,)
 
-        # Get top_k indices
-        top_k = min(top_k, len(self.texts))
-        top_indices = np.argsort(sims)[::-1][:top_k]
+        top_indices, top_scores = self._rank(
+            query, query_emb, top_k, mode=mode, exact=exact, nprobe=nprobe, rows=rows
+        )
+        return self._format_results(top_indices, top_scores)
+
+    @traced("store.search_batch")
+    @_reads
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        max_scores: int = SEARCH_BATCH_MAX_SCORES,
+        filters: Optional[Dict] = None,
+        mode: str = SEARCH_MODE,
+    ) -> List[List[Dict]]:
+        """
+        similarity_search for several queries at once.
+
+        All queries are embedded in one model call. Exact search scores a block
+        of queries with one matrix-matrix product; blocks are sized so that a
+        score matrix never exceeds max_scores floats. With an ANN index or
+        quantized codes, each query still goes through _search_embedding.
+
+        Returns one result list per query, in the same order.
+        """
+        if not queries:
+            return []
+        if self.embeddings is None or self.live_count == 0:
+            return [[] for _ in queries]
+
+        rows = self._filter_rows(filters) if filters else None
+        if rows is not None and len(rows) == 0:
+            return [[] for _ in queries]
+
+        top_k = min(top_k, self.live_count)
+        if mode == "lexical":
+            return [
+                self._format_results(*self._rank(q, None, top_k, mode=mode, rows=rows))
+                for q in queries
+            ]
+
+        query_embs = normalize_rows(embed_texts(queries))  # shape: (q, dim)
+
+        if mode != "dense" or rows is not None or (
+            not exact and (self._use_ann(top_k) or self._use_quantizer())
+        ):
+            return [
+                self._format_results(
+                    *self._rank(q, q_emb, top_k, mode=mode, exact=exact, nprobe=nprobe, rows=rows)
+                )
+                for q, q_emb in zip(queries, query_embs)
+            ]
+
+        n = len(self.texts)
+        block = max(1, max_scores // max(n, 1))
+        results: List[List[Dict]] = []
+        for start in range(0, len(queries), block):
+            sims = (self.embeddings @ query_embs[start:start + block].T).T  # (block, n)
+            if self.deleted is not None:
+                sims[:, self.deleted] = -np.inf
+            for row in sims:
+                top_indices = top_k_indices(row, top_k)
+                results.append(self._format_results(top_indices, row[top_indices]))
+        return results
 
+    def _format_results(self, top_indices: np.ndarray, top_scores: np.ndarray) -> List[Dict]:
         results: List[Dict] = []
-        for idx in top_indices:
+        for idx, score in zip(top_indices, top_scores):
             results.append(
                 {
                     "text": self.texts[idx],
                     "metadata": self.metadatas[idx],
-                    "score": float(sims[idx]),
+                    "score": float(score),
                 }
             )
 
         return results
+
+    def _rank(
+        self,
+        query: str,
+        query_emb: Optional[np.ndarray],
+        top_k: int,
+        mode: str = SEARCH_MODE,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        rows: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (row ids, scores) for one query in the given search mode.
+        """
+        if mode == "dense":
+            return self._search_embedding(query_emb, top_k, exact=exact, nprobe=nprobe, rows=rows)
+        if mode not in ("lexical", "hybrid"):
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        allowed = None
+        if rows is not None:
+            allowed = np.zeros(len(self.texts), dtype=bool)
+            allowed[rows] = True
+        elif self.deleted is not None:
+            allowed = ~self.deleted
+
+        self._ensure_bm25()
+        if mode == "lexical":
+            return self.bm25.search(query, top_k, allowed=allowed)
+
+        n_candidates = top_k * HYBRID_CANDIDATES_FACTOR
+        lexical_ids, _ = self.bm25.search(query, n_candidates, allowed=allowed)
+        dense_ids, _ = self._search_embedding(query_emb, n_candidates, exact=exact, nprobe=nprobe, rows=rows)
+        fused_ids, fused_scores = reciprocal_rank_fusion([dense_ids, lexical_ids], k=RRF_K)
+        return fused_ids[:top_k], fused_scores[:top_k]
+
+    def _search_embedding(
+        self,
+        query_emb: np.ndarray,
+        top_k: int,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        rows: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (row ids, scores) of the top_k rows for a normalized query embedding (dim,).
+        If rows is given (filtered, non-deleted row ids), only those rows are scored.
+        Otherwise, unless exact:
+        - with an ANN index, only the rows of the probed lists are candidates;
+        - with quantized codes, the candidates (all live rows without ANN) are
+          scored on the codes and only a shortlist is rescored exactly.
+        """
+        if rows is not None:
+            sims = self.embeddings[rows] @ query_emb
+            order = top_k_indices(sims, top_k)
+            return rows[order], sims[order]
+
+        top_k = min(top_k, self.live_count)
+
+        if not exact and self._use_ann(top_k):
+            candidates = self.ann.candidates(query_emb, nprobe=nprobe)
+            if self.deleted is not None:
+                candidates = candidates[~self.deleted[candidates]]
+            # Too few candidates in the probed lists: fall back to exact search
+            if len(candidates) >= top_k:
+                n_shortlist = top_k * self.rescore_factor
+                if self._use_quantizer() and len(candidates) > n_shortlist:
+                    approx = self.quantizer.scores(query_emb, rows=candidates)
+                    candidates = candidates[top_k_indices(approx, n_shortlist)]
+                sims = self.embeddings[candidates] @ query_emb
+                order = top_k_indices(sims, top_k)
+                return candidates[order], sims[order]
+
+        if not exact and self._use_quantizer():
+            # First pass over the compact codes, then exact rescoring of a shortlist
+            approx = self.quantizer.scores(query_emb)
+            if self.deleted is not None:
+                approx[self.deleted] = -np.inf
+            shortlist = top_k_indices(approx, min(top_k * self.rescore_factor, self.live_count))
+            sims = self.embeddings[shortlist] @ query_emb
+            order = top_k_indices(sims, top_k)
+            return shortlist[order], sims[order]
+
+        # Cosine similarity with all embeddings = one matrix-vector product
+        sims = self.embeddings @ query_emb  # shape: (n,)
+        if self.deleted is not None:
+            sims[self.deleted] = -np.inf
+
+        # Get top_k indices
+        top_indices = top_k_indices(sims, top_k)
+        return top_indices, sims[top_indices]
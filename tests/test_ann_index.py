@@ -0,0 +1,124 @@
+import zlib
+
+import numpy as np
+import pytest
+
+import retrieval.vector_store as vector_store
+from retrieval.ann_index import IVFIndex, normalize_rows, recall_at_k, top_k_indices
+
+DIM = 64
+TOP_K = 5
+MIN_RECALL = 0.9
+
+
+def clustered_embeddings(n: int, seed: int, n_topics: int = 50) -> np.ndarray:
+    # Same shape of data as benchmark.synthetic_embeddings, at test size
+    rng = np.random.default_rng(seed)
+    topics = np.random.default_rng(1234).standard_normal((n_topics, DIM)).astype(np.float32)
+    labels = rng.integers(0, n_topics, size=n)
+    return normalize_rows(topics[labels] + 0.6 * rng.standard_normal((n, DIM)).astype(np.float32))
+
+
+def mean_recall(index: IVFIndex, emb: np.ndarray, queries: np.ndarray, nprobe: int) -> float:
+    recalls = []
+    for q in queries:
+        exact = top_k_indices(emb @ q, TOP_K)
+        candidates = index.candidates(q, nprobe=nprobe)
+        approx = candidates[top_k_indices(emb[candidates] @ q, TOP_K)]
+        recalls.append(recall_at_k(approx, exact))
+    return float(np.mean(recalls))
+
+
+def test_ivf_recall(tmp_path):
+    emb = clustered_embeddings(4000, seed=0)
+    queries = clustered_embeddings(100, seed=1)
+    index = IVFIndex(str(tmp_path))
+    index.train(emb)
+
+    assert index.num_rows == len(emb)
+    # The default nprobe, and a few percent of the lists
+    for nprobe in (index.nprobe, 8):
+        assert mean_recall(index, emb, queries, nprobe=nprobe) >= MIN_RECALL
+    # Probing every list is exact search
+    assert mean_recall(index, emb, queries, nprobe=index.centroids.shape[0]) == 1.0
+
+
+def test_ivf_recall_after_incremental_add(tmp_path):
+    emb = clustered_embeddings(4000, seed=0)
+    queries = clustered_embeddings(100, seed=1)
+    index = IVFIndex(str(tmp_path))
+    index.train(emb[:3000])
+    for start in range(3000, 4000, 250):
+        index.add(emb[start:start + 250])
+
+    assert index.num_rows == len(emb)
+    assert mean_recall(index, emb, queries, nprobe=8) >= MIN_RECALL
+
+    # Saved and reloaded assignments cover the added rows too
+    index.save()
+    reloaded = IVFIndex(str(tmp_path))
+    assert reloaded.load(len(emb))
+    assert np.array_equal(reloaded.assignments, index.assignments)
+
+
+def fake_embed_texts(texts, use_cache=True, remember=True):
+    return np.stack([
+        np.random.default_rng(zlib.crc32(text.encode())).standard_normal(DIM).astype(np.float32)
+        for text in texts
+    ])
+
+
+def test_store_uses_exact_search_below_ann_min_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "VECTOR_DB_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_store, "embed_texts", fake_embed_texts)
+    texts = [f"chunk {i}" for i in range(500)]
+
+    store = vector_store.LocalVectorStore("small", ann_min_rows=1000, quantization="none")
+    store.add_texts(texts)
+    assert not store.ann.is_trained
+    assert not store._use_ann(TOP_K)
+
+    query = fake_embed_texts(["chunk 42 question"])
+    exact = top_k_indices(store.embeddings @ normalize_rows(query)[0], TOP_K)  # rows are stored normalized
+    results = store.similarity_search("chunk 42 question", top_k=TOP_K, mode="dense")
+    assert [r["text"] for r in results] == [texts[i] for i in exact]
+    assert store.similarity_search("chunk 42", top_k=1, mode="dense")[0]["text"] == "chunk 42"
+
+
+def test_store_trains_ann_at_ann_min_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "VECTOR_DB_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_store, "embed_texts", fake_embed_texts)
+
+    store = vector_store.LocalVectorStore("large", ann_min_rows=1000, quantization="none")
+    store.add_texts([f"chunk {i}" for i in range(600)])
+    assert not store.ann.is_trained
+    store.add_texts([f"chunk {i}" for i in range(600, 1200)])
+    assert store.ann.is_trained and store._use_ann(TOP_K)
+
+    for i in (7, 650, 1199):
+        results = store.similarity_search(f"chunk {i}", top_k=1, mode="dense", exact=False)
+        assert results[0]["text"] == f"chunk {i}"
+        assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_store_scores_probed_lists_on_quantized_codes(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "VECTOR_DB_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_store, "embed_texts", fake_embed_texts)
+
+    store = vector_store.LocalVectorStore("quantized", ann_min_rows=1000, quantization="int8", rescore_factor=2)
+    store.add_texts([f"chunk {i}" for i in range(1200)])
+    assert store._use_ann(TOP_K) and store._use_quantizer()
+
+    query = normalize_rows(fake_embed_texts(["chunk 3"]))[0]
+    rows = np.array([3, 10, 700])
+    np.testing.assert_allclose(store.quantizer.scores(query, rows=rows), store.quantizer.scores(query)[rows])
+
+    scored = []
+    scores = store.quantizer.scores
+    monkeypatch.setattr(store.quantizer, "scores", lambda q, rows=None: scored.append(rows) or scores(q, rows=rows))
+    for i in (3, 650, 1199):
+        results = store.similarity_search(f"chunk {i}", top_k=1, mode="dense", exact=False)
+        assert results[0]["text"] == f"chunk {i}"
+        assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    # Only the candidates of the probed lists were scored on the codes
+    assert scored and all(r is not None and len(r) < len(store.texts) for r in scored)
@@ -0,0 +1,40 @@
+import pytest
+
+from agents.fused import parse_fused_output, route_sections
+
+OUTPUTS = [
+    "SUMMARY:\n* point one [Source: a.pdf, Chunk: 0]\n* point two\n"
+    "CRITIQUE:\n*Weak* on X.\n"
+    "FINAL ANSWER:\n1. Direct Answer: **C2f** is a block",
+    "**SUMMARY:**\n- a\n\n**CRITIQUE:**\nok *really*\n\n## FINAL ANSWER:\n* bullet answer",
+    "SUMMARY: **Key** point\nCRITIQUE: none\nFINAL ANSWER: done",
+    "just an answer with *emphasis*",
+    "SUMMARY:\n- s\nCRITIQUE:\nc",
+]
+
+
+def _route(pieces):
+    sections = {"searcher": "", "critic": "", "writer": ""}
+    for stage, piece in route_sections(pieces):
+        sections[stage] += piece
+    return {stage: text.strip() for stage, text in sections.items()}
+
+
+def test_headings_are_removed_and_body_markdown_kept():
+    assert [parse_fused_output(text) for text in OUTPUTS] == [
+        {"summary": "* point one [Source: a.pdf, Chunk: 0]\n* point two", "critique": "*Weak* on X.",
+         "final_answer": "1. Direct Answer: **C2f** is a block"},
+        {"summary": "- a", "critique": "ok *really*", "final_answer": "* bullet answer"},
+        {"summary": "**Key** point", "critique": "none", "final_answer": "done"},
+        # Without a FINAL ANSWER section, the summary is the final answer
+        {"summary": "just an answer with *emphasis*", "critique": "",
+         "final_answer": "just an answer with *emphasis*"},
+        {"summary": "- s", "critique": "c", "final_answer": "- s"},
+    ]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7])
+@pytest.mark.parametrize("text", OUTPUTS)
+def test_streamed_routing_matches_whole_text(text, size):
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+    assert _route(pieces) == _route([text])
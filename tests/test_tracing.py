@@ -0,0 +1,60 @@
+from core.tracing import _current, get_trace, span, traced
+
+
+@traced("test.inner")
+def _inner(n):
+    for i in range(n):
+        with span("test.step", i=i):
+            pass
+        yield i
+
+
+@traced("test.outer", root=True)
+def _outer(n):
+    yield from _inner(n)
+
+
+def test_generator_span_is_only_current_while_it_runs():
+    with span("test.consumer", root=True) as consumer:
+        seen = []
+        for item in _outer(3):
+            # Back in the consumer's context after every yield
+            assert _current.get() is consumer
+            with span("test.render", item=item):
+                pass
+            seen.append(item)
+        assert _current.get() is consumer
+
+    assert seen == [0, 1, 2]
+    trace = get_trace(consumer.trace_id)
+    assert [c["name"] for c in trace["children"]] == ["test.outer"] + ["test.render"] * 3
+    outer = trace["children"][0]
+    assert [c["name"] for c in outer["children"]] == ["test.inner"]
+    assert [c["name"] for c in outer["children"][0]["children"]] == ["test.step"] * 3
+
+
+def test_abandoned_generator_restores_the_span():
+    stream = _outer(5)
+    assert next(stream) == 0
+    assert _current.get() is None
+    stream.close()
+    assert _current.get() is None
+
+
+def test_generator_error_is_recorded():
+    @traced("test.failing", root=True)
+    def failing():
+        yield 1
+        raise ValueError("boom")
+
+    with span("test.consumer", root=True) as consumer:
+        stream = failing()
+        assert next(stream) == 1
+        try:
+            next(stream)
+        except ValueError:
+            pass
+        assert _current.get() is consumer
+
+    trace = get_trace(consumer.trace_id)
+    assert trace["children"][0]["attrs"]["error"] == "ValueError: boom"